@@ -0,0 +1,138 @@
+"""
+ONNX Runtime backend for CLIP image classification (CPU-only deployments).
+
+The CLIP vision tower plus its projection is exported once to ONNX and, if
+requested, dynamically quantized to int8 weights. The candidate-label text
+embeddings are computed with the PyTorch model at export time and stored next
+to the model, so serving needs only onnxruntime and the CLIP image processor:
+no PyTorch model is kept in memory.
+
+Export (needs torch, transformers, onnx and onnxruntime):
+
+    python -m app.clip_onnx --quantize
+
+Serve with CLIP_BACKEND=onnx (CLIP_ONNX_QUANTIZED=1 for the int8 model). If
+the files are missing, image_classifier exports them on first load.
+"""
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+
+MODEL_NAME = "openai/clip-vit-base-patch32"
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to ml-backend-with-image/
+ONNX_DIR = Path(os.getenv("CLIP_ONNX_DIR", str(BASE_DIR / "models" / "clip-onnx")))
+VISION_FILE = "vision.onnx"
+VISION_INT8_FILE = "vision.int8.onnx"
+TEXT_FILE = "text_embeddings.npz"
+
+
+def is_exported(model_dir: Path = ONNX_DIR, quantized: bool = False) -> bool:
+    model_dir = Path(model_dir)
+    return (model_dir / (VISION_INT8_FILE if quantized else VISION_FILE)).exists() and (model_dir / TEXT_FILE).exists()
+
+
+def export(model_dir: Path = ONNX_DIR, quantize: bool = False, label_lists=None) -> Path:
+    """Export the vision tower (and optionally its int8 variant) plus text embeddings for label_lists."""
+    import torch
+    from transformers import CLIPModel, CLIPProcessor
+    from app.image_classifier import DEFAULT_CANDIDATE_LABELS
+
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    model = CLIPModel.from_pretrained(MODEL_NAME).eval()
+    processor = CLIPProcessor.from_pretrained(MODEL_NAME)
+
+    class VisionEmbedder(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.vision_model = clip.vision_model
+            self.visual_projection = clip.visual_projection
+
+        def forward(self, pixel_values):
+            return self.visual_projection(self.vision_model(pixel_values=pixel_values).pooler_output)
+
+    vision_path = model_dir / VISION_FILE
+    with torch.inference_mode():
+        torch.onnx.export(
+            VisionEmbedder(model), (torch.zeros(1, 3, 224, 224),), str(vision_path),
+            input_names=["pixel_values"], output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+            opset_version=17,
+        )
+    print(f"[INIT] Exported CLIP vision tower to {vision_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(str(vision_path), str(model_dir / VISION_INT8_FILE), weight_type=QuantType.QInt8)
+        print(f"[INIT] Wrote int8-quantized model to {model_dir / VISION_INT8_FILE}")
+
+    arrays = {"logit_scale": np.float32(model.logit_scale.exp().item())}
+    for i, labels in enumerate(label_lists or [DEFAULT_CANDIDATE_LABELS]):
+        text_inputs = processor(text=list(labels), return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            embeds = model.get_text_features(**text_inputs)
+            embeds = getattr(embeds, "text_embeds", getattr(embeds, "pooler_output", embeds)).float()
+            embeds = embeds / embeds.norm(dim=-1, keepdim=True)
+        arrays[f"labels_{i}"] = np.array(list(labels))
+        arrays[f"embeddings_{i}"] = embeds.numpy().astype(np.float32)
+    np.savez(model_dir / TEXT_FILE, **arrays)
+    print(f"[INIT] Saved text embeddings for {len(label_lists or [DEFAULT_CANDIDATE_LABELS])} label list(s)")
+    return model_dir
+
+
+class OnnxClipBackend:
+    """CLIP image classification with an exported vision tower and precomputed text embeddings."""
+
+    def __init__(self, model_dir: Path = ONNX_DIR, quantized: bool = False, num_threads: int = 0):
+        import onnxruntime as ort
+
+        model_dir = Path(model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.model_path = model_dir / (VISION_INT8_FILE if quantized else VISION_FILE)
+        self.quantized = quantized
+        self.session = ort.InferenceSession(str(self.model_path), options, providers=["CPUExecutionProvider"])
+
+        stored = np.load(model_dir / TEXT_FILE)
+        self.logit_scale = float(stored["logit_scale"])
+        self._text_embeddings = {}
+        i = 0
+        while f"labels_{i}" in stored.files:
+            self._text_embeddings[tuple(str(label) for label in stored[f"labels_{i}"])] = stored[f"embeddings_{i}"]
+            i += 1
+
+    def text_embeddings(self, candidate_labels) -> np.ndarray:
+        key = tuple(candidate_labels)
+        if key not in self._text_embeddings:
+            raise KeyError(f"No exported text embeddings for this label list ({len(key)} labels); "
+                           f"re-run the export with it in label_lists")
+        return self._text_embeddings[key]
+
+    def image_embeddings(self, pixel_values: np.ndarray) -> np.ndarray:
+        """L2-normalized image embeddings for a (batch, 3, 224, 224) float32 array."""
+        embeds = self.session.run(None, {"pixel_values": np.ascontiguousarray(pixel_values, dtype=np.float32)})[0]
+        return embeds / np.linalg.norm(embeds, axis=-1, keepdims=True)
+
+    def score_batch(self, pixel_values: np.ndarray, candidate_labels) -> np.ndarray:
+        """(batch, num_labels) label probabilities; same scoring as CLIPModel (softmax of scaled cosine similarity)."""
+        text_embeds = self.text_embeddings(candidate_labels)
+        logits = self.logit_scale * self.image_embeddings(pixel_values) @ text_embeds.T
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def classify_batch(self, pixel_values: np.ndarray, candidate_labels) -> list:
+        """Best label per image."""
+        return [candidate_labels[i] for i in self.score_batch(pixel_values, candidate_labels).argmax(axis=1)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the CLIP vision tower to ONNX")
+    parser.add_argument("--output", default=str(ONNX_DIR))
+    parser.add_argument("--quantize", action="store_true", help="also write a dynamically int8-quantized model")
+    args = parser.parse_args()
+    export(Path(args.output), quantize=args.quantize)
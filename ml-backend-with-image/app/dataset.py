@@ -1,6 +1,11 @@
+import atexit
 import json
 from pathlib import Path
+from typing import NamedTuple
 import os
+import threading
+
+from app.group_commit import DURABILITY_MODES, GroupCommitWriter
 
 # Always resolve the dataset path relative to this file so that it works
 # no matter where the application is started from (repo root, service dir, etc.)
@@ -17,15 +22,179 @@ except Exception as e:
     print(f"[ERROR] Failed to create data directory: {str(e)}")
 
 
-def save_report(report_dict: dict):
-    """Append raw report to dataset.jsonl (build dataset dynamically)."""
+# Appends go through one group-commit writer thread (see app/group_commit.py):
+#   batch    - save_report returns once the line is fsynced; concurrent saves share one fsync (default)
+#   interval - save_report returns once the line is written; fsync every DATASET_FSYNC_INTERVAL_MS
+#   none     - save_report returns once the line is written; no fsync
+DATASET_DURABILITY = os.getenv("DATASET_DURABILITY", "batch").lower()
+DATASET_FSYNC_INTERVAL_MS = float(os.getenv("DATASET_FSYNC_INTERVAL_MS", "1000"))
+if DATASET_DURABILITY not in DURABILITY_MODES:
+    print(f"[WARNING] Unknown DATASET_DURABILITY={DATASET_DURABILITY!r}, using 'batch'")
+    DATASET_DURABILITY = "batch"
+# Each group is appended under an flock on the file, so several server processes
+# (uvicorn --workers N) can share the dataset; 0 turns the lock off (single process)
+DATASET_FILE_LOCK = os.getenv("DATASET_FILE_LOCK", "1") == "1"
+_writers = {}  # stream -> GroupCommitWriter
+_writer_lock = threading.Lock()
+
+# Storage layout (see app/segment_log.py):
+#   single    - every report is appended to DATA_FILE (default)
+#   segmented - accepted and rejected reports go to separate, rotated segment streams under DATASET_DIR
+DATASET_LAYOUT = os.getenv("DATASET_LAYOUT", "single").lower()
+DATASET_DIR = Path(os.getenv("DATASET_DIR", str(BASE_DIR / "data" / "segments")))
+DATASET_SEGMENT_MAX_BYTES = int(os.getenv("DATASET_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+DATASET_SEGMENT_MAX_AGE_S = float(os.getenv("DATASET_SEGMENT_MAX_AGE_S", "86400"))
+_segment_log = None
+
+# Storage backend:
+#   jsonl  - JSONL files in the layout above (default)
+#   sqlite - one row per report in a SQLite database in WAL mode with indexes for the
+#            duplicate checks (see app/sqlite_store.py); DATASET_LAYOUT does not apply
+DATASET_BACKEND = os.getenv("DATASET_BACKEND", "jsonl").lower()
+DATASET_SQLITE_PATH = Path(os.getenv("DATASET_SQLITE_PATH", str(BASE_DIR / "data" / "reports.db")))
+if DATASET_BACKEND not in ("jsonl", "sqlite"):
+    print(f"[WARNING] Unknown DATASET_BACKEND={DATASET_BACKEND!r}, using 'jsonl'")
+    DATASET_BACKEND = "jsonl"
+
+
+class WrittenLine(NamedTuple):
+    """Where a saved report landed: byte range [start, end) of the file identified by device/inode."""
+    path: Path
+    device: int
+    inode: int
+    start: int
+    end: int
+
+
+# Callbacks invoked after every successful save as callback(clean_report, written_line).
+# In-memory indexes use this to stay current without re-reading the file.
+_save_listeners = []
+
+
+def add_save_listener(callback):
+    """Register callback(report: dict, line: WrittenLine) to be called after each saved report."""
+    if callback not in _save_listeners:
+        _save_listeners.append(callback)
+
+
+def _notify_saved(report: dict, line: WrittenLine):
+    for callback in list(_save_listeners):
+        try:
+            callback(report, line)
+        except Exception as e:
+            print(f"[WARNING] Dataset save listener failed: {str(e)}")
+
+
+def _on_written(clean_report: dict, path: Path, st, start: int, end: int):
+    """Writer-thread callback, in file order: update listeners (the report index) and log."""
+    _notify_saved(clean_report, WrittenLine(path, st.st_dev, st.st_ino, start, end))
+    print(f"[DEBUG] Report saved to dataset: {clean_report.get('report_id', 'unknown')}")
+    print(f"[DEBUG] Dataset file: {path.absolute()} (size: {st.st_size} bytes)")
+    print(f"[DEBUG] Report status: {clean_report.get('status', 'unknown')}, accept: {clean_report.get('accept', 'unknown')}")
+
+
+def is_accepted(report: dict) -> bool:
+    """Only accepted reports take part in duplicate detection."""
+    return report.get("status") == "accepted" and report.get("accept") is True
+
+
+def get_segment_log():
+    """SegmentLog for DATASET_DIR (segmented layout)."""
+    global _segment_log
+    if _segment_log is None or _segment_log.directory != DATASET_DIR:
+        from app.segment_log import SegmentLog
+        _segment_log = SegmentLog(DATASET_DIR, DATASET_SEGMENT_MAX_BYTES, DATASET_SEGMENT_MAX_AGE_S)
+    return _segment_log
+
+
+def _stream(report: dict) -> str:
+    if DATASET_LAYOUT != "segmented":
+        return "dataset"
+    return "accepted" if is_accepted(report) else "rejected"
+
+
+def _stream_path(stream: str) -> Path:
+    if stream == "dataset":
+        return DATA_FILE
+    return get_segment_log().active_path(stream)
+
+
+def _is_current(stream: str, path: Path) -> bool:
+    """Checked by the writer under the file lock: is path still where stream's appends go?"""
+    if stream == "dataset":
+        return Path(path) == DATA_FILE
+    return get_segment_log().is_active(stream, path)
+
+
+def report_files(stream: str = "accepted") -> list:
+    """Files a reader of `stream` ("accepted" or "rejected") must read, oldest first.
+    Single layout: [DATA_FILE], which holds both streams."""
+    if DATASET_LAYOUT != "segmented":
+        return [DATA_FILE]
+    return get_segment_log().segments(stream)
+
+
+def get_writer(stream: str = "dataset") -> GroupCommitWriter:
+    """The process-wide writer for one stream ("dataset" in the single layout), started on first use."""
+    writer = _writers.get(stream)
+    if writer is None:
+        with _writer_lock:
+            writer = _writers.get(stream)
+            if writer is None:
+                writer = GroupCommitWriter(lambda: _stream_path(stream), _on_written, DATASET_DURABILITY,
+                                           DATASET_FSYNC_INTERVAL_MS, name=f"{stream}-writer",
+                                           lock=DATASET_FILE_LOCK, is_current=lambda path: _is_current(stream, path))
+                _writers[stream] = writer
+    return writer
+
+
+def flush():
+    """Write and fsync every report queued so far (whatever the durability mode)."""
+    for writer in list(_writers.values()):
+        writer.flush()
+
+
+def writer_stats():
+    """Group-commit counters per stream for /health, or None before the first save."""
+    return {stream: writer.stats() for stream, writer in _writers.items()} or None
+
+
+def close_writer():
+    """Flush queued reports and stop the writer threads (server shutdown, interpreter exit)."""
+    with _writer_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+    if DATASET_BACKEND == "sqlite":
+        from app import sqlite_store
+        sqlite_store.close_store()
+
+
+atexit.register(close_writer)
+
+
+def _reset_after_fork():
+    """A forked child has no writer threads; it starts its own on its first save."""
+    global _writers, _writer_lock
+    _writers = {}
+    _writer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def save_report(report_dict: dict, wait: bool = True):
+    """Append raw report to dataset.jsonl (build dataset dynamically), or to the
+    accepted/rejected segment stream in the segmented layout, or insert it into
+    the SQLite database with DATASET_BACKEND=sqlite (always synchronous).
+
+    wait=True returns once the report is committed (fsynced in "batch"
+    durability, written in the other modes) and raises if the write failed.
+    wait=False only queues it; use it for records nothing reads back on the
+    request path (rejected reports).
+    """
     try:
-        # Ensure directory exists
-        DATA_FILE.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Get absolute path for logging
-        abs_path = DATA_FILE.absolute()
-        
         # Clean report_dict - remove non-serializable data
         clean_report = {}
         for key, value in report_dict.items():
@@ -41,21 +210,16 @@ def save_report(report_dict: dict):
                 clean_report[key] = str(value)
                 print(f"[WARNING] Converted non-serializable value for key '{key}' to string")
         
-        # Write to file
-        with DATA_FILE.open("a", encoding="utf8") as f:
-            json_str = json.dumps(clean_report, ensure_ascii=False)
-            f.write(json_str + "\n")
-            f.flush()  # Force write to disk
-            os.fsync(f.fileno())  # Ensure data is written to disk
-        
-        # Verify file was written
-        if DATA_FILE.exists():
-            file_size = DATA_FILE.stat().st_size
-            print(f"[DEBUG] Report saved to dataset: {clean_report.get('report_id', 'unknown')}")
-            print(f"[DEBUG] Dataset file: {abs_path} (size: {file_size} bytes)")
-            print(f"[DEBUG] Report status: {clean_report.get('status', 'unknown')}, accept: {clean_report.get('accept', 'unknown')}")
-        else:
-            print(f"[ERROR] Dataset file does not exist after write: {abs_path}")
+        if DATASET_BACKEND == "sqlite":
+            from app import sqlite_store
+            store = sqlite_store.get_store()
+            row_id = store.save(clean_report, json.dumps(clean_report, ensure_ascii=False))
+            print(f"[DEBUG] Report saved to {store.path}: {clean_report.get('report_id', 'unknown')} (row {row_id})")
+            return
+
+        # Hand the line to the group-commit writer (binary append so the byte range of the new line is known)
+        line = (json.dumps(clean_report, ensure_ascii=False) + "\n").encode("utf8")
+        get_writer(_stream(clean_report)).submit(line, clean_report, wait=wait)
         
     except PermissionError as e:
         print(f"[ERROR] Permission denied writing to dataset file: {str(e)}")
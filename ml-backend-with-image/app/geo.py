@@ -0,0 +1,192 @@
+"""
+Geographic helpers: great-circle distance (scalar and NumPy-vectorized) and a
+spatial grid for radius queries.
+"""
+from math import radians, degrees, cos, sin, asin, sqrt, floor
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000  # Earth radius in meters
+
+# Grid cell edge in degrees (~55 m of latitude). A 50 m duplicate-radius query
+# then touches a 3x3 block of cells at the equator and a few more columns at
+# higher latitudes, where meridians converge.
+GRID_CELL_DEGREES = 0.0005
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Calculate great-circle distance between two lat/lon points in meters."""
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    delta_lat = lat2 - lat1
+    delta_lon = lon2 - lon1
+    a = sin(delta_lat/2)**2 + cos(lat1) * cos(lat2) * sin(delta_lon/2)**2
+    c = 2 * asin(sqrt(a))
+    r = EARTH_RADIUS_M
+    return c * r
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """Vectorized haversine in meters; arguments broadcast like NumPy arrays.
+
+    Computes the same formula as haversine() with float64 arithmetic, so
+    results agree with the scalar version to within floating-point rounding.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0))) * EARTH_RADIUS_M
+
+
+def distances_to(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Distances in meters from one point to every point in (lats, lons)."""
+    return haversine_np(lat, lon, lats, lons)
+
+
+def pairwise_distances(query_lats, query_lons, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """(len(query), len(points)) matrix of distances in meters from each query point to each point."""
+    query_lats = np.asarray(query_lats, dtype=np.float64)[:, None]
+    query_lons = np.asarray(query_lons, dtype=np.float64)[:, None]
+    return haversine_np(query_lats, query_lons, lats[None, :], lons[None, :])
+
+
+class CoordinateArray:
+    """Append-only lat/lon storage in two contiguous float64 arrays (amortized doubling)."""
+
+    def __init__(self, capacity: int = 1024):
+        self._lats = np.empty(capacity, dtype=np.float64)
+        self._lons = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, lat: float, lon: float) -> int:
+        """Store a point and return its position."""
+        if self._size == len(self._lats):
+            capacity = max(2 * len(self._lats), 1024)
+            self._lats = np.resize(self._lats, capacity)
+            self._lons = np.resize(self._lons, capacity)
+        position = self._size
+        self._lats[position] = lat
+        self._lons[position] = lon
+        self._size += 1
+        return position
+
+    @property
+    def lats(self) -> np.ndarray:
+        return self._lats[:self._size]
+
+    @property
+    def lons(self) -> np.ndarray:
+        return self._lons[:self._size]
+
+    def distances_to(self, lat: float, lon: float, positions=None) -> np.ndarray:
+        """Distances from (lat, lon) to all stored points, or only to those at `positions`."""
+        if positions is None:
+            return distances_to(lat, lon, self.lats, self.lons)
+        return distances_to(lat, lon, self._lats[positions], self._lons[positions])
+
+
+def _wrap_longitude(lon: float) -> float:
+    return ((lon + 180.0) % 360.0) - 180.0
+
+
+def cell_of(lat: float, lon: float, cell_degrees: float = GRID_CELL_DEGREES) -> tuple:
+    """(row, column) of the grid cell holding (lat, lon)."""
+    return floor(lat / cell_degrees), floor(_wrap_longitude(lon) / cell_degrees)
+
+
+def cell_ranges(lat: float, lon: float, radius_m: float, cell_degrees: float = GRID_CELL_DEGREES) -> tuple:
+    """(row_lo, row_hi, (col_lo, col_hi) or None) of the grid cells a circle of radius_m around
+    (lat, lon) can touch. Columns are unwrapped (they may run past the antimeridian); None
+    means every column (the circle reaches a pole or is wider than the world)."""
+    angular = radius_m / EARTH_RADIUS_M
+    dlat = degrees(angular)
+    row_lo, row_hi = floor((lat - dlat) / cell_degrees), floor((lat + dlat) / cell_degrees)
+
+    # Widest longitude span of the circle (exact bound for a spherical cap)
+    cos_lat = cos(radians(lat))
+    ratio = sin(min(angular, 1.5707963267948966)) / cos_lat if cos_lat > 1e-12 else 2.0
+    if ratio >= 1.0 or lat + dlat >= 90.0 or lat - dlat <= -90.0:
+        return row_lo, row_hi, None  # circle reaches a pole: every longitude is possible
+    dlon = degrees(asin(ratio)) * 1.000001
+    lon = _wrap_longitude(lon)
+    col_lo, col_hi = floor((lon - dlon) / cell_degrees), floor((lon + dlon) / cell_degrees)
+    if col_hi - col_lo + 1 >= int(round(360.0 / cell_degrees)):
+        return row_lo, row_hi, None
+    return row_lo, row_hi, (col_lo, col_hi)
+
+
+class SpatialGrid:
+    """
+    Uniform lat/lon grid of points for "everything within r meters" queries.
+
+    Points are bucketed into square cells of GRID_CELL_DEGREES. A query turns
+    the radius into a latitude/longitude bounding box (the longitude half-width
+    grows with latitude and covers the full circle near the poles), probes only
+    the cells overlapping it, and keeps the points whose exact haversine
+    distance is within the radius. Coordinates live in a CoordinateArray, so
+    that exact check is one vectorized call over all candidates.
+    """
+
+    def __init__(self, cell_degrees: float = GRID_CELL_DEGREES):
+        self._cell = cell_degrees
+        self._columns = int(round(360.0 / cell_degrees))
+        self._min_column = floor(-180.0 / cell_degrees)
+        self._cells = {}
+        self._coords = CoordinateArray()
+        self._items = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def coordinates(self) -> CoordinateArray:
+        return self._coords
+
+    def _cell_of(self, lat: float, lon: float) -> tuple:
+        return cell_of(lat, lon, self._cell)
+
+    def add(self, lat: float, lon: float, item):
+        """Store item at (lat, lon)."""
+        position = self._coords.append(lat, lon)
+        self._items.append(item)
+        self._cells.setdefault(self._cell_of(lat, lon), []).append(position)
+
+    def _candidate_cells(self, lat: float, lon: float, radius_m: float):
+        row_lo, row_hi, col_range = cell_ranges(lat, lon, radius_m, self._cell)
+
+        probes = (row_hi - row_lo + 1) * ((col_range[1] - col_range[0] + 1) if col_range else self._columns)
+        if probes > len(self._cells):
+            # Fewer occupied cells than cells in the box: filter the occupied ones instead
+            for (row, col), positions in self._cells.items():
+                if row_lo <= row <= row_hi and (col_range is None or self._column_in(col, col_range)):
+                    yield positions
+            return
+
+        for row in range(row_lo, row_hi + 1):
+            if col_range is None:
+                columns = range(self._min_column, self._min_column + self._columns)
+            else:
+                columns = (self._normalize_column(col) for col in range(col_range[0], col_range[1] + 1))
+            for col in columns:
+                positions = self._cells.get((row, col))
+                if positions:
+                    yield positions
+
+    def _normalize_column(self, col: int) -> int:
+        return (col - self._min_column) % self._columns + self._min_column
+
+    def _column_in(self, col: int, col_range: tuple) -> bool:
+        # col_range may extend past the antimeridian; compare in the unwrapped frame
+        return any(col_range[0] <= c <= col_range[1] for c in (col - self._columns, col, col + self._columns))
+
+    def within(self, lat: float, lon: float, radius_m: float) -> list:
+        """[(item, distance_m), ...] for every stored point within radius_m of (lat, lon), nearest first."""
+        cells = list(self._candidate_cells(lat, lon, radius_m))
+        if not cells:
+            return []
+        positions = np.fromiter((p for cell in cells for p in cell), dtype=np.intp)
+        distances = self._coords.distances_to(lat, lon, positions)
+        inside = np.flatnonzero(distances <= radius_m)
+        inside = inside[np.argsort(distances[inside], kind="stable")]
+        return [(self._items[positions[i]], float(distances[i])) for i in inside]
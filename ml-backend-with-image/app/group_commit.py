@@ -0,0 +1,205 @@
+"""
+Group-commit appender for the dataset log.
+
+Callers hand complete lines to a single background writer thread through an
+in-process queue. The writer drains everything that is queued, appends it to
+the file with one write() call and, depending on the durability mode, one
+fsync for the whole group:
+
+  batch     fsync after every group; submit(wait=True) returns once the line
+            is on disk (the old per-save guarantee, one fsync shared by all
+            concurrent savers)
+  interval  fsync at most every fsync_interval_ms; wait=True returns once the
+            line is written to the file (visible to readers), not yet synced
+  none      never fsync; the OS writes the page cache back on its own
+
+Under load, lines arriving while a group is being synced form the next
+group, so throughput grows with concurrency instead of being capped at one
+fsync per request. close() flushes whatever is queued (and syncs it in every
+mode) before returning; dataset.py registers it with atexit and the server's
+shutdown hook.
+
+Several processes (uvicorn --workers N) may append to the same file: with
+lock=True every group is written under an exclusive flock on the file, so
+groups of different processes never interleave, and is_current(path) is
+checked once the lock is held, so a group is never appended to a file that
+another process retired (a rotated segment) while this one waited.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # not on Linux/macOS: O_APPEND single writes only
+    fcntl = None
+
+DURABILITY_MODES = ("batch", "interval", "none")
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Appends lines to get_path() from one thread; on_written(item, path, stat, start, end) runs per line after its group is written."""
+
+    def __init__(self, get_path, on_written=None, durability: str = "batch", fsync_interval_ms: float = 1000,
+                 max_group_size: int = 1024, name: str = "group-commit", lock: bool = False, is_current=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, got {durability!r}")
+        self.get_path = get_path
+        self.on_written = on_written
+        self.lock = lock and fcntl is not None
+        self.is_current = is_current
+        self.durability = durability
+        self.fsync_interval = max(0.0, float(fsync_interval_ms)) / 1000
+        self.max_group_size = max(1, int(max_group_size))
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._last_sync = time.monotonic()
+        self._unsynced = set()  # paths written since their last fsync (interval/none modes)
+        self.groups = 0
+        self.lines = 0
+        self.fsyncs = 0
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, line: bytes, item=None, wait: bool = True):
+        """Queue one line (with an item passed back to on_written). wait=True blocks until the
+        line is committed per the durability mode and re-raises a write failure."""
+        if self._closed:
+            raise RuntimeError(f"{self.name} writer is closed")
+        future = Future()
+        self._queue.put((line, item, future))
+        self._ensure_worker()
+        if wait:
+            return future.result()
+        return future
+
+    def flush(self, timeout: float = None):
+        """Block until everything queued so far is written and synced (in every durability mode)."""
+        if self._closed:
+            return
+        future = Future()
+        self._queue.put((None, None, future))
+        self._ensure_worker()
+        future.result(timeout)
+
+    def close(self, timeout: float = 30):
+        """Flush and stop the writer thread; later submits raise."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put((_STOP, None, None))
+        thread.join(timeout)
+
+    # ------------------------------------
+    # Writer thread
+    # ------------------------------------
+    def _collect(self) -> list:
+        if self.durability == "interval" and self._unsynced:
+            # Wake up in time to sync an idle file within the interval
+            try:
+                group = [self._queue.get(timeout=max(0.0, self._last_sync + self.fsync_interval - time.monotonic()))]
+            except queue.Empty:
+                return []
+        else:
+            group = [self._queue.get()]
+        while len(group) < self.max_group_size:
+            try:
+                group.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        while True:
+            group = self._collect()
+            stop = any(line is _STOP for line, _, _ in group)
+            flushes = [future for line, _, future in group if line is None]
+            entries = [(line, item, future) for line, item, future in group if line is not None and line is not _STOP]
+            if entries:
+                self._write_group(entries)
+            if flushes or stop:
+                self._sync_pending()
+                for future in flushes:
+                    future.set_result(None)
+            elif self.durability == "interval" and time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync_pending()
+            if stop:
+                return
+
+    def _write_group(self, entries: list):
+        self.groups += 1
+        self.lines += len(entries)
+        try:
+            data = b"".join(line for line, _, _ in entries)
+            path, end, st = self._append(data)
+        except Exception as e:
+            print(f"[ERROR] Group commit of {len(entries)} line(s) failed: {str(e)}")
+            for _, _, future in entries:
+                future.set_exception(e)
+            return
+
+        offset = end - len(data)
+        for line, item, future in entries:
+            start, offset = offset, offset + len(line)
+            if self.on_written is not None:
+                try:
+                    self.on_written(item, path, st, start, offset)
+                except Exception as e:
+                    print(f"[WARNING] Group commit callback failed: {str(e)}")
+            future.set_result(None)
+
+    def _append(self, data: bytes, attempts: int = 10) -> tuple:
+        """Append data with one write (under the file lock); returns (path, end offset, stat)."""
+        for _ in range(attempts):
+            path = Path(self.get_path())
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("ab") as f:
+                if self.lock:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                if self.is_current is not None and not self.is_current(path):
+                    continue  # retired while we waited for the lock: resolve the path again
+                f.write(data)
+                f.flush()
+                if self.durability == "batch":
+                    os.fsync(f.fileno())
+                    self.fsyncs += 1
+                else:
+                    self._unsynced.add(path)
+                return path, f.tell(), os.fstat(f.fileno())  # closing the file releases the lock
+        raise RuntimeError(f"{self.name}: no current file to append to after {attempts} attempts")
+
+    def _sync_pending(self):
+        self._last_sync = time.monotonic()
+        paths, self._unsynced = self._unsynced, set()
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                    self.fsyncs += 1
+                finally:
+                    os.close(fd)
+            except Exception as e:
+                print(f"[ERROR] fsync of {path} failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {"durability": self.durability, "queued": self._queue.qsize(), "groups": self.groups,
+                "lines": self.lines, "fsyncs": self.fsyncs,
+                "mean_group_size": round(self.lines / self.groups, 2) if self.groups else 0.0}
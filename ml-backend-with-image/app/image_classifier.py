@@ -1,102 +1,259 @@
 # Lightweight CLIP-based image classifier with safe fallbacks.
 from PIL import Image
-import requests
 import io
+import os
+import hashlib
 import threading
+import time
+from pathlib import Path
+
+from app.micro_batcher import MicroBatcher
+from app.result_cache import ResultCache
 
 _clip_lock = threading.Lock()
 _clip_model = None
 _clip_processor = None
 _available = False
 
-def initialize_clip():
-    global _clip_model, _clip_processor, _available
+# Inference backend: "torch" (transformers CLIPModel) or "onnx" (app/clip_onnx.py, ONNX Runtime)
+CLIP_BACKEND = os.getenv("CLIP_BACKEND", "torch").lower()
+CLIP_ONNX_QUANTIZED = os.getenv("CLIP_ONNX_QUANTIZED", "0") == "1"
+_onnx_backend = None
+
+# Inference runtime settings (see _configure_runtime)
+CLIP_NUM_THREADS = int(os.getenv("CLIP_NUM_THREADS", "0"))  # 0 = leave torch's default
+CLIP_BFLOAT16 = os.getenv("CLIP_BFLOAT16", "0") == "1"  # only applied if the CPU has native bf16
+CLIP_CHANNELS_LAST = os.getenv("CLIP_CHANNELS_LAST", "0") == "1"
+_model_dtype = None
+_channels_last = False
+runtime_info = {}
+
+# Dynamic micro-batching of concurrent image classifications (CLIP_MAX_BATCH_SIZE=1 disables it)
+CLIP_MAX_BATCH_SIZE = int(os.getenv("CLIP_MAX_BATCH_SIZE", "8"))
+CLIP_MAX_BATCH_WAIT_MS = float(os.getenv("CLIP_MAX_BATCH_WAIT_MS", "5"))
+_batcher = None
+_batcher_lock = threading.Lock()
+
+# Content-addressed result cache: image digest + label set -> {"label", "scores"}
+CLIP_CACHE_SIZE = int(os.getenv("CLIP_CACHE_SIZE", "1024"))  # 0 disables the cache
+CLIP_CACHE_TTL = float(os.getenv("CLIP_CACHE_TTL", "86400"))  # seconds
+CLIP_CACHE_PATH = os.getenv("CLIP_CACHE_PATH", "")  # optional JSON file that survives restarts
+_result_cache = None
+_cache_lock = threading.Lock()
+
+# Normalized CLIP text embeddings per candidate label list (tuple(labels) -> tensor)
+_text_embedding_lock = threading.Lock()
+_text_embeddings = {}
+
+# Labels CLIP chooses between (mirrors the keyword lists in text_rules.CATEGORY_KEYWORDS)
+DEFAULT_CANDIDATE_LABELS = [
+    "road", "pothole", "crack", "broken road", "damaged road",
+    "road caved", "road sinking", "uneven road",
+    "traffic", "traffic jam", "congestion",
+    "signal", "traffic signal", "junction", "crossroad",
+    "accident", "collision", "crash", "hit",
+    "speed breaker", "speed bump", "divider",
+    "footpath", "sidewalk", "zebra crossing", "pedestrian",
+    "garbage", "trash", "waste", "dump", "dumping",
+    "garbage pile", "waste pile",
+    "dirty", "filthy", "unclean",
+    "bad smell", "toxic smell", "foul smell",
+    "dustbin", "overflowing bin",
+    "sanitation", "sewage", "sewer", "manhole",
+    "dead", "dead animal", "animal carcass",
+    "dead dog", "dead cat", "dead cow",
+    "dead body",
+    "mosquito", "flies", "infection", "disease",
+    "water", "no water", "low pressure",
+    "drinking water", "contaminated water",
+    "leak", "leakage", "pipe leak",
+    "pipe burst", "broken pipe",
+    "drain", "drainage", "blocked drain",
+    "overflow", "overflowing drain",
+    "flood", "waterlogging", "stagnant water",
+    "sewage water", "rain water",
+    "electricity", "electric", "power",
+    "no power", "power cut", "power outage",
+    "wire", "cable", "pole", "electric pole",
+    "transformer", "meter",
+    "short circuit", "spark",
+    "electrocution", "electric shock",
+    "live wire",
+    "streetlight", "street light", "lamp",
+    "lamp post", "pole light",
+    "not working", "broken light",
+    "flickering", "dim light",
+    "dark", "dark area", "no lighting",
+    "fire", "smoke", "burning",
+    "gas", "gas leak", "cylinder leak",
+    "collapse", "building collapse",
+    "wall collapse", "roof falling",
+    "crime", "theft", "robbery",
+    "violence", "fight", "assault",
+    "hazard", "danger", "unsafe",
+    "emergency", "life risk",
+    "park", "garden", "playground",
+    "children park", "public park",
+    "bench", "swing", "slide",
+    "walking track",
+    "tree", "fallen tree", "tree fallen",
+    "lawn", "grass", "maintenance",
+    "broken fence"
+]
+
+def initialize_clip(warm: bool = True):
+    """Load CLIP. With warm=False only the weights are loaded and no inference runs
+    (used before forking process-pool workers, which call warm_up themselves)."""
+    global _clip_model, _clip_processor, _available, _onnx_backend
+    if CLIP_BACKEND == "onnx":
+        _initialize_onnx()
+        return
     try:
+        _onnx_backend = None
         from transformers import CLIPProcessor, CLIPModel
         _clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
         _clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+        _configure_runtime(_clip_model)
+        _text_embeddings.clear()
         _available = True
+        if warm:
+            warm_up()
     except Exception as e:
         # Failed to load CLIP (no internet or packages). Continue with fallback.
         _available = False
 
+
+def warm_up():
+    """Encode the fixed label set once (so requests only run the vision tower) and run the self-check."""
+    if not _available:
+        return
+    get_text_embeddings(DEFAULT_CANDIDATE_LABELS)
+    try:
+        _self_check()
+    except Exception as e:
+        print(f"[WARNING] CLIP self-check failed: {str(e)}")
+
+
+def _reset_after_fork():
+    """Forked children inherit the weights but not the parent's threads or lock state."""
+    global _batcher, _batcher_lock, _text_embedding_lock, _clip_lock, _cache_lock
+    _batcher = None
+    _batcher_lock = threading.Lock()
+    _cache_lock = threading.Lock()
+    _text_embedding_lock = threading.Lock()
+    _clip_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _initialize_onnx():
+    """Load the ONNX Runtime backend, exporting the model on first use if needed."""
+    global _clip_model, _clip_processor, _available, _onnx_backend
+    try:
+        from transformers import CLIPImageProcessor
+        from app import clip_onnx
+        if not clip_onnx.is_exported(quantized=CLIP_ONNX_QUANTIZED):
+            print(f"[INIT] No exported ONNX model in {clip_onnx.ONNX_DIR}, exporting (one-time)...")
+            clip_onnx.export(quantize=CLIP_ONNX_QUANTIZED)
+        _onnx_backend = clip_onnx.OnnxClipBackend(quantized=CLIP_ONNX_QUANTIZED, num_threads=CLIP_NUM_THREADS)
+        _clip_processor = CLIPImageProcessor.from_pretrained(clip_onnx.MODEL_NAME)
+        _clip_model = None
+        _available = True
+        warm_up()
+    except Exception as e:
+        print(f"[ERROR] ONNX CLIP backend unavailable (will use fallback): {str(e)}")
+        _onnx_backend = None
+        _available = False
+
+
+def _cpu_supports_bf16() -> bool:
+    """True if the CPU advertises native bfloat16 instructions (AVX512-BF16 or AMX)."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        return False
+
+
+def _configure_runtime(model):
+    """Put the model in inference configuration: eval mode, no grads, thread count, optional bf16/channels-last."""
+    global _model_dtype, _channels_last
+    import torch
+    if CLIP_NUM_THREADS > 0:
+        torch.set_num_threads(CLIP_NUM_THREADS)
+    model.eval()
+    model.requires_grad_(False)
+
+    _model_dtype = torch.float32
+    if CLIP_BFLOAT16:
+        if _cpu_supports_bf16():
+            model.to(torch.bfloat16)
+            _model_dtype = torch.bfloat16
+        else:
+            print("[WARNING] CLIP_BFLOAT16=1 ignored: CPU has no native bfloat16 support")
+    _channels_last = CLIP_CHANNELS_LAST
+    if _channels_last:
+        # Only the patch-embedding convolution benefits; linear layers are unaffected
+        model.to(memory_format=torch.channels_last)
+
+
+def _inference_mode():
+    import torch
+    return torch.inference_mode()
+
+
+def _prepare_pixel_values(pixel_values):
+    """Match the pixel tensor to the model's dtype and memory format."""
+    import torch
+    if _model_dtype is not None and pixel_values.dtype != _model_dtype:
+        pixel_values = pixel_values.to(_model_dtype)
+    if _channels_last:
+        pixel_values = pixel_values.contiguous(memory_format=torch.channels_last)
+    return pixel_values
+
+
+def _self_check():
+    """Run one blank image through the model and log the active runtime settings."""
+    start = time.perf_counter()
+    label = classify_pixel_values(preprocess_image(Image.new("RGB", (224, 224))))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if _onnx_backend is not None:
+        runtime_info.update({
+            "backend": "onnx",
+            "model": _onnx_backend.model_path.name,
+            "threads": CLIP_NUM_THREADS or "default",
+            "self_check_ms": round(elapsed_ms, 1),
+        })
+        print(f"[INIT] CLIP runtime: backend=onnx, model={runtime_info['model']}, "
+              f"threads={runtime_info['threads']}, self-check {elapsed_ms:.0f}ms (label={label!r})")
+        return
+
+    import torch
+    runtime_info.update({
+        "backend": "torch",
+        "threads": torch.get_num_threads(),
+        "dtype": str(_model_dtype).replace("torch.", ""),
+        "channels_last": _channels_last,
+        "grad_enabled": any(p.requires_grad for p in _clip_model.parameters()),
+        "training": _clip_model.training,
+        "self_check_ms": round(elapsed_ms, 1),
+    })
+    print(f"[INIT] CLIP runtime: threads={runtime_info['threads']}, dtype={runtime_info['dtype']}, "
+          f"channels_last={_channels_last}, inference_mode=on, grad_enabled={runtime_info['grad_enabled']}, "
+          f"eval={not _clip_model.training}, self-check {elapsed_ms:.0f}ms (label={label!r})")
+
 def classify_image(image_url: str, candidate_labels=None) -> str:
     """Return best matching label from candidate_labels or 'other' on failure.
     CLIP model is loaded lazily (on first use) to save memory.
     DEPRECATED: Use classify_image_from_bytes instead.
     """
     # Lazy load CLIP model if not already loaded
-    global _clip_model, _clip_processor, _available
-    if not _available and _clip_model is None:
-        with _clip_lock:
-            if not _available and _clip_model is None:
-                initialize_clip()
+    _ensure_clip()
     
     if candidate_labels is None:
-        candidate_labels = [
-     "road", "pothole", "crack", "broken road", "damaged road",
-        "road caved", "road sinking", "uneven road",
-        "traffic", "traffic jam", "congestion",
-        "signal", "traffic signal", "junction", "crossroad",
-        "accident", "collision", "crash", "hit",
-        "speed breaker", "speed bump", "divider",
-        "footpath", "sidewalk", "zebra crossing", "pedestrian",
-
-        "garbage", "trash", "waste", "dump", "dumping",
-        "garbage pile", "waste pile",
-        "dirty", "filthy", "unclean",
-        "bad smell", "toxic smell", "foul smell",
-        "dustbin", "overflowing bin",
-        "sanitation", "sewage", "sewer", "manhole",
-
-        # DEAD ANIMAL (strict & safe)
-        "dead", "dead animal", "animal carcass",
-        "dead dog", "dead cat", "dead cow",
-        "dead body",
-
-        "mosquito", "flies", "infection", "disease",
-
-        "water", "no water", "low pressure",
-        "drinking water", "contaminated water",
-        "leak", "leakage", "pipe leak",
-        "pipe burst", "broken pipe",
-        "drain", "drainage", "blocked drain",
-        "overflow", "overflowing drain",
-        "flood", "waterlogging", "stagnant water",
-        "sewage water", "rain water",
-
-        "electricity", "electric", "power",
-        "no power", "power cut", "power outage",
-        "wire", "cable", "pole", "electric pole",
-        "transformer", "meter",
-        "short circuit", "spark",
-        "electrocution", "electric shock",
-        "live wire",
-
-        "streetlight", "street light", "lamp",
-        "lamp post", "pole light",
-        "not working", "broken light",
-        "flickering", "dim light",
-        "dark", "dark area", "no lighting",
-
-         "fire", "smoke", "burning",
-        "gas", "gas leak", "cylinder leak",
-        "collapse", "building collapse",
-        "wall collapse", "roof falling",
-        "crime", "theft", "robbery",
-        "violence", "fight", "assault",
-        "hazard", "danger", "unsafe",
-        "emergency", "life risk",
-
-        "park", "garden", "playground",
-        "children park", "public park",
-        "bench", "swing", "slide",
-        "walking track",
-        "tree", "fallen tree", "tree fallen",
-        "lawn", "grass", "maintenance",
-        "broken fence"
-]
-
+        candidate_labels = DEFAULT_CANDIDATE_LABELS
 
     if not image_url:
         return "other"
@@ -110,105 +267,210 @@ def classify_image(image_url: str, candidate_labels=None) -> str:
         return "other"
 
     try:
+        import requests  # only the deprecated URL path needs it
         resp = requests.get(image_url, timeout=5)
         resp.raise_for_status()
         image = Image.open(io.BytesIO(resp.content)).convert("RGB")
-        inputs = _clip_processor(text=candidate_labels, images=image, return_tensors="pt", padding=True)
-        outputs = _clip_model(**inputs)
-        logits_per_image = outputs.logits_per_image  # shape (1, num_labels)
-        probs = logits_per_image.softmax(dim=1)
-        best = int(probs.argmax().item())
-        return candidate_labels[best]
     except Exception:
         return "other"
+    return classify_pixel_values(preprocess_image(image), candidate_labels)
 
 
-def classify_image_from_bytes(image_bytes: bytes, candidate_labels=None) -> str:
-    """Return best matching label from candidate_labels or 'other' on failure.
-    Works with image bytes directly (no URL required).
-    CLIP model is loaded lazily (on first use) to save memory.
-    """
-    # Lazy load CLIP model if not already loaded
-    global _clip_model, _clip_processor, _available
+def _ensure_clip():
+    """Lazy load CLIP model if not already loaded (first use)."""
     if not _available and _clip_model is None:
         with _clip_lock:
             if not _available and _clip_model is None:
                 initialize_clip()
-    
+
+
+def load_clip() -> bool:
+    """Load and warm CLIP now unless already loaded (safe to race with first requests); returns availability."""
+    _ensure_clip()
+    return _available
+
+
+def _features(output, name: str):
+    """Projected embeddings from get_*_features (a tensor, or a model output in newer transformers)."""
+    if hasattr(output, name):
+        return getattr(output, name)
+    return getattr(output, "pooler_output", output)
+
+
+def get_text_embeddings(candidate_labels):
+    """L2-normalized CLIP text embeddings for candidate_labels, shape (num_labels, dim).
+
+    The text tower runs once per distinct label list; later calls with the
+    same labels return the cached tensor.
+    """
+    if _onnx_backend is not None:
+        return _onnx_backend.text_embeddings(candidate_labels)
+    key = tuple(candidate_labels)
+    embeddings = _text_embeddings.get(key)
+    if embeddings is not None:
+        return embeddings
+    with _text_embedding_lock:
+        embeddings = _text_embeddings.get(key)
+        if embeddings is None:
+            text_inputs = _clip_processor(text=list(key), return_tensors="pt", padding=True)
+            with _inference_mode():
+                embeddings = _features(_clip_model.get_text_features(**text_inputs), "text_embeds").float()
+                embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
+            _text_embeddings[key] = embeddings
+            print(f"[INIT] Cached CLIP text embeddings for {len(key)} labels")
+    return embeddings
+
+
+def preprocess_image(image: Image.Image):
+    """Turn a decoded RGB image into the CLIP pixel tensor, or None if CLIP is unavailable."""
+    _ensure_clip()
+    if not _available:
+        return None
+    return _clip_processor(images=image, return_tensors="np" if _onnx_backend is not None else "pt")["pixel_values"]
+
+
+def _classify_batch(pixel_values_list, candidate_labels) -> list:
+    """(label, scores) for each of a list of (1, 3, H, W) pixel tensors, in one forward pass of the vision tower."""
+    if _onnx_backend is not None:
+        import numpy as np
+        probs = _onnx_backend.score_batch(np.concatenate(pixel_values_list), candidate_labels)
+        return [(candidate_labels[int(row.argmax())], row.tolist()) for row in probs]
+
+    import torch
+    text_embeds = get_text_embeddings(candidate_labels)
+    with _inference_mode():
+        pixel_values = _prepare_pixel_values(torch.cat(pixel_values_list))
+        image_embeds = _features(_clip_model.get_image_features(pixel_values=pixel_values), "image_embeds").float()
+        image_embeds = image_embeds / image_embeds.norm(dim=-1, keepdim=True)
+        # Same logits CLIPModel.forward computes, without re-running the text tower
+        logits_per_image = _clip_model.logit_scale.float().exp() * image_embeds @ text_embeds.t()  # shape (batch, num_labels)
+        probs = logits_per_image.softmax(dim=1)
+        best = probs.argmax(dim=1).tolist()
+        scores = probs.tolist()
+    return [(candidate_labels[i], row) for i, row in zip(best, scores)]
+
+
+def _run_batch(items) -> list:
+    """MicroBatcher callback: items are (pixel_values, labels tuple); one forward pass per distinct label list."""
+    results = [None] * len(items)
+    groups = {}
+    for i, (_, labels) in enumerate(items):
+        groups.setdefault(labels, []).append(i)
+    for labels, indices in groups.items():
+        for i, result in zip(indices, _classify_batch([items[i][0] for i in indices], labels)):
+            results[i] = result
+    return results
+
+
+def _get_batcher():
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(_run_batch, CLIP_MAX_BATCH_SIZE, CLIP_MAX_BATCH_WAIT_MS, name="clip-batcher")
+    return _batcher
+
+
+def configure_batching(max_batch_size: int, max_wait_ms: float):
+    """Change micro-batching limits at runtime (max_batch_size=1 classifies each request on its own)."""
+    global CLIP_MAX_BATCH_SIZE, CLIP_MAX_BATCH_WAIT_MS, _batcher
+    with _batcher_lock:
+        CLIP_MAX_BATCH_SIZE, CLIP_MAX_BATCH_WAIT_MS = max_batch_size, max_wait_ms
+        old, _batcher = _batcher, None
+    if old is not None:
+        old.close()
+
+
+def _classify_with_scores(pixel_values, candidate_labels):
+    """(label, scores) for one preprocessed image, through the micro-batcher when enabled. Raises on failure."""
+    if CLIP_MAX_BATCH_SIZE > 1:
+        return _get_batcher().submit((pixel_values, tuple(candidate_labels)))
+    return _classify_batch([pixel_values], candidate_labels)[0]
+
+
+def classify_pixel_values(pixel_values, candidate_labels=None) -> str:
+    """Return best matching label for a preprocessed image (see preprocess_image) or 'other' on failure.
+    Concurrent callers are batched into one CLIP forward pass (see CLIP_MAX_BATCH_SIZE).
+    """
     if candidate_labels is None:
-        candidate_labels = [
-            "road", "pothole", "crack", "broken road", "damaged road",
-            "road caved", "road sinking", "uneven road",
-            "traffic", "traffic jam", "congestion",
-            "signal", "traffic signal", "junction", "crossroad",
-            "accident", "collision", "crash", "hit",
-            "speed breaker", "speed bump", "divider",
-            "footpath", "sidewalk", "zebra crossing", "pedestrian",
-            "garbage", "trash", "waste", "dump", "dumping",
-            "garbage pile", "waste pile",
-            "dirty", "filthy", "unclean",
-            "bad smell", "toxic smell", "foul smell",
-            "dustbin", "overflowing bin",
-            "sanitation", "sewage", "sewer", "manhole",
-            "dead", "dead animal", "animal carcass",
-            "dead dog", "dead cat", "dead cow",
-            "dead body",
-            "mosquito", "flies", "infection", "disease",
-            "water", "no water", "low pressure",
-            "drinking water", "contaminated water",
-            "leak", "leakage", "pipe leak",
-            "pipe burst", "broken pipe",
-            "drain", "drainage", "blocked drain",
-            "overflow", "overflowing drain",
-            "flood", "waterlogging", "stagnant water",
-            "sewage water", "rain water",
-            "electricity", "electric", "power",
-            "no power", "power cut", "power outage",
-            "wire", "cable", "pole", "electric pole",
-            "transformer", "meter",
-            "short circuit", "spark",
-            "electrocution", "electric shock",
-            "live wire",
-            "streetlight", "street light", "lamp",
-            "lamp post", "pole light",
-            "not working", "broken light",
-            "flickering", "dim light",
-            "dark", "dark area", "no lighting",
-            "fire", "smoke", "burning",
-            "gas", "gas leak", "cylinder leak",
-            "collapse", "building collapse",
-            "wall collapse", "roof falling",
-            "crime", "theft", "robbery",
-            "violence", "fight", "assault",
-            "hazard", "danger", "unsafe",
-            "emergency", "life risk",
-            "park", "garden", "playground",
-            "children park", "public park",
-            "bench", "swing", "slide",
-            "walking track",
-            "tree", "fallen tree", "tree fallen",
-            "lawn", "grass", "maintenance",
-            "broken fence"
-        ]
+        candidate_labels = DEFAULT_CANDIDATE_LABELS
 
-    if not image_bytes:
+    # If CLIP not available, cannot classify (no URL to parse)
+    if pixel_values is None or not _available:
         return "other"
 
-    # If CLIP not available, cannot classify from bytes (no URL to parse)
-    if not _available:
+    try:
+        return _classify_with_scores(pixel_values, candidate_labels)[0]
+    except Exception as e:
+        print(f"[ERROR] Image classification failed: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
         return "other"
 
+
+def image_digest(image_bytes: bytes) -> str:
+    """SHA-256 of the uploaded image bytes, the content address used by the result cache."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def get_result_cache() -> ResultCache:
+    global _result_cache
+    if _result_cache is None:
+        with _cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(CLIP_CACHE_SIZE, CLIP_CACHE_TTL, Path(CLIP_CACHE_PATH) if CLIP_CACHE_PATH else None)
+    return _result_cache
+
+
+def _cache_key(digest: str, candidate_labels) -> str:
+    # Scores depend on the label set and the model variant as well as the image
+    model = CLIP_BACKEND + ("-int8" if CLIP_BACKEND == "onnx" and CLIP_ONNX_QUANTIZED else "")
+    labels = hashlib.sha1("\n".join(candidate_labels).encode("utf8")).hexdigest()[:16]
+    return f"{digest}:{model}:{labels}"
+
+
+def classify_image_cached(digest: str, get_pixel_values, candidate_labels=None) -> str:
+    """Best label for the image with the given digest; get_pixel_values() is only called on a cache miss.
+    Stores the top label and the full score vector. Failures return 'other' and are not cached.
+    """
+    if candidate_labels is None:
+        candidate_labels = DEFAULT_CANDIDATE_LABELS
+    cache = get_result_cache()
+    key = _cache_key(digest, candidate_labels)
+    cached = cache.get(key)
+    if cached is not None:
+        print(f"[DEBUG] CLIP result cache hit: {cached['label']}")
+        return cached["label"]
+
+    _ensure_clip()
+    if not _available:
+        return "other"
     try:
-        # Open image directly from bytes
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        inputs = _clip_processor(text=candidate_labels, images=image, return_tensors="pt", padding=True)
-        outputs = _clip_model(**inputs)
-        logits_per_image = outputs.logits_per_image  # shape (1, num_labels)
-        probs = logits_per_image.softmax(dim=1)
-        best = int(probs.argmax().item())
-        return candidate_labels[best]
+        pixel_values = get_pixel_values()
+        if pixel_values is None:
+            return "other"
+        label, scores = _classify_with_scores(pixel_values, candidate_labels)
     except Exception as e:
         print(f"[ERROR] Image classification failed: {str(e)}")
         import traceback
         print(traceback.format_exc())
         return "other"
+    cache.put(key, {"label": label, "scores": [round(float(score), 6) for score in scores]})
+    return label
+
+
+def classify_image_from_bytes(image_bytes: bytes, candidate_labels=None) -> str:
+    """Return best matching label from candidate_labels or 'other' on failure.
+    Works with image bytes directly (no URL required).
+    CLIP model is loaded lazily (on first use) to save memory.
+    Callers that already hold the decoded image should use preprocess_image/classify_pixel_values.
+    """
+    if not image_bytes:
+        return "other"
+
+    def pixel_values():
+        # Decode directly from bytes at the smallest resolution CLIP can use
+        from app.report_context import decode_image
+        return preprocess_image(decode_image(image_bytes))
+
+    return classify_image_cached(image_digest(image_bytes), pixel_values, candidate_labels)
@@ -1,50 +1,80 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from typing import Optional
 import traceback
 import os
 import sys
 import json
 import base64
+import threading
 
-# CRITICAL FIX: Ensure python-multipart is available before FastAPI initializes
-# FastAPI 0.128.0 checks for it even for JSON-only endpoints
-try:
-    import multipart
-except ImportError:
-    # Install python-multipart if missing (common in Render deployments)
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "python-multipart>=0.0.5", "--quiet"], 
-                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+from app.worker_pool import get_pool, current_pool, shutdown_pool, PipelineBusy, PIPELINE_PROCESSES
+from app import warmup
+
+# python-multipart is installed from requirements.txt; the JSON-only endpoints here do not need it,
+# so nothing is installed at import time.
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Import the ML pipeline and warm the report index and CLIP in the background, so the
+    server binds immediately and no request pays for the model load (see app/warmup.py)."""
+    if PIPELINE_PROCESSES <= 0:
+        get_pool()
+    warmup.start(load_modules=load_ml_modules, process_pool=PIPELINE_PROCESSES > 0)
+    yield
+    shutdown_pool(wait=True)
+    if ml_available:
+        from app import dataset, image_classifier
+        # Everything the pipeline queued (rejected reports, interval/none durability) reaches the disk
+        dataset.close_writer()
+        if PIPELINE_PROCESSES <= 0:
+            # With a process pool every worker keeps and saves its own cache; the parent's stays empty
+            image_classifier.get_result_cache().save()
 
 # Initialize app first - this must work
-app = FastAPI(title="Civic ML Backend API", version="1.0.0")
+app = FastAPI(title="Civic ML Backend API", version="1.0.0", lifespan=lifespan)
+
+from app.models import ReportRequest
 
-# Try to import ML modules - make them optional so app can start even if they fail
+# ML modules (PIL, imagehash, numpy, and transformers/torch on first model use) are imported
+# lazily by the warm-up thread, not here, so importing app.main stays cheap and the port binds fast.
+# They stay optional: if the import fails the API returns default responses.
 classify_report = None
 ml_available = False
+_ml_import_lock = threading.Lock()
+
+
+def load_ml_modules() -> bool:
+    """Import the ML pipeline once (thread-safe); returns whether it is available."""
+    global classify_report, ml_available
+    if classify_report is None:
+        with _ml_import_lock:
+            if classify_report is None:
+                try:
+                    from app.pipeline import classify_report as pipeline_classify_report
+                    classify_report = pipeline_classify_report
+                    ml_available = True
+                    print("✅ ML modules loaded successfully")
+                except Exception as e:
+                    print(f"⚠️ ML modules not available (non-critical): {e}")
+                    print("⚠️ API will return default responses")
+    return ml_available
 
-try:
-    from app.pipeline import classify_report
-    from app.models import ReportRequest
-    ml_available = True
-    print("✅ ML modules loaded successfully")
-except Exception as e:
-    print(f"⚠️ ML modules not available (non-critical): {e}")
-    print("⚠️ API will return default responses")
-    # Import ReportRequest even if ML is not available for endpoint to work
-    try:
-        from app.models import ReportRequest
-    except Exception:
-        pass
+
+def _run_classify_report(report_data: dict):
+    """Pool entry point: imports the pipeline on first use if warm-up has not done so yet."""
+    if classify_report is None:
+        load_ml_modules()
+    return classify_report(report_data)
 
 # Log startup information
 print("=" * 50)
 print("ML Backend API Starting...")
 print(f"Python version: {sys.version}")
 print(f"Working directory: {os.getcwd()}")
-print(f"ML Available: {ml_available}")
+print("ML modules: loading in background")
 print("=" * 50)
 
 # CORS configuration - SIMPLIFIED AND RELIABLE
@@ -68,10 +98,42 @@ print("=" * 50)
 def health():
     return {"status": "ML API running", "version": "1.0.0", "ml_available": ml_available}
 
+def _pipeline_stats():
+    pool = current_pool()
+    return pool.stats() if pool is not None else None
+
+def _clip_cache_stats():
+    if not ml_available or PIPELINE_PROCESSES > 0:
+        return None  # the cache lives in each pipeline worker process
+    from app import image_classifier
+    return image_classifier.get_result_cache().stats()
+
+def _dataset_writer_stats():
+    if not ml_available:
+        return None
+    from app import dataset
+    return dataset.writer_stats()
+
+def _profanity_stats():
+    if not ml_available:
+        return None
+    from app import profanity
+    return profanity.stats()
+
 @app.get("/health")
 def health_check():
     """Health check endpoint for Render"""
-    return {"status": "healthy", "service": "ML Backend", "ml_available": ml_available}
+    return {"status": "healthy", "service": "ML Backend", "ml_available": ml_available,
+            "model": warmup.status()["status"], "pipeline": _pipeline_stats(), "clip_cache": _clip_cache_stats(),
+            "profanity": _profanity_stats(), "dataset_writer": _dataset_writer_stats()}
+
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 503 until warm-up (index load, model load and a dummy inference) has finished"""
+    state = warmup.status()
+    if not warmup.is_ready():
+        return JSONResponse(status_code=503, headers={"Retry-After": "5"}, content=state)
+    return state
 
 @app.options("/submit")
 async def submit_options():
@@ -153,7 +215,12 @@ async def submit_report(request: ReportRequest):
             print(f"Image bytes size: {len(report_data.get('image_bytes'))} bytes")
         
         try:
-            result = classify_report(report_data)
+            # Run the blocking pipeline on the worker pool so the event loop stays responsive
+            pool = current_pool()
+            if pool is None:
+                # Process-pool mode: workers are still being forked and warmed up
+                raise PipelineBusy(retry_after=5)
+            result = await pool.submit(_run_classify_report, report_data)
             print(f"ML classification complete: status={result.get('status')}, category={result.get('category')}, confidence={result.get('confidence')}")
             
             # Ensure result has all required fields
@@ -173,6 +240,20 @@ async def submit_report(request: ReportRequest):
                 result['confidence'] = 0.0
             
             return result
+        except PipelineBusy as busy:
+            print(f"[WARNING] Pipeline queue full, rejecting report {report_id} with 503")
+            return JSONResponse(
+                status_code=503,
+                headers={"Retry-After": str(busy.retry_after)},
+                content={
+                    "report_id": report_id,
+                    "accept": False,
+                    "status": "busy",
+                    "category": "Other",
+                    "confidence": 0.0,
+                    "reason": f"ML service busy, retry after {busy.retry_after}s"
+                }
+            )
         except Exception as ml_error:
             print(f"ERROR in classify_report: {str(ml_error)}")
             print(traceback.format_exc())
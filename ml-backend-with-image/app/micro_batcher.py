@@ -0,0 +1,107 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent callers submit one item each and block on the result. A single
+worker thread collects queued items until it has max_batch_size of them or
+max_wait_ms has passed since the first one arrived, runs them through the
+batch function in one call, and hands each caller its own result (or the
+batch's exception). Requests that arrive while a batch is running queue up
+and form the next batch, so under load batches fill without waiting.
+close() stops the worker once the items queued before it have run.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()  # queue sentinel: the worker exits when it reaches it
+
+
+class MicroBatcher:
+    """Collects items from concurrent submit() calls into batches for process_batch(items) -> results."""
+
+    def __init__(self, process_batch, max_batch_size: int = 8, max_wait_ms: float = 5.0, name: str = "micro-batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, item):
+        """Queue item, block until its batch has run, and return its result."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                # Replaced by configure_batching() after the caller picked this batcher up
+                return self.process_batch([item])[0]
+            self._queue.put((item, future))
+        self._ensure_worker()
+        return future.result()
+
+    def close(self):
+        """Let the worker finish the items already queued, then exit; later submit() calls run unbatched."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                if self._thread is not None:
+                    self._queue.put(_STOP)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size and batch[-1] is not _STOP:
+            try:
+                # Take whatever is already queued without waiting, then wait out the deadline
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch: list):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = list(self.process_batch([item for item, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: process_batch returned {len(results)} results "
+                                   f"for {len(batch)} items")
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
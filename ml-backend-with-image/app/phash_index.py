@@ -0,0 +1,116 @@
+"""
+Hamming-radius search over 64-bit perceptual hashes (multi-index hashing).
+
+imagehash.phash() produces 64-bit hashes rendered as 16 hex characters; two
+images are near-duplicates when the Hamming distance between their hashes is
+small. MultiIndexHash answers "every stored hash within distance r of h"
+without comparing h against every stored hash.
+
+The 64 bits are split into CHUNKS disjoint substrings and each substring gets
+its own hash table. If two hashes differ in at most r bits, then by the
+pigeonhole principle at least one substring differs in at most r // CHUNKS
+bits, so probing each table with the query substring and its variants within
+that many bit flips yields a candidate set that is guaranteed to contain every
+match. Candidates are then verified with an exact popcount.
+"""
+from itertools import combinations
+from typing import Optional
+
+HASH_HEX_LENGTH = 16  # 64-bit pHash (hash_size=8)
+HASH_BITS = 64
+
+# Three substrings of 22/21/21 bits: with ~1M stored hashes each table bucket
+# holds ~0.5 entries, and radius 8 needs at most 2-bit variants per substring.
+CHUNK_WIDTHS = (22, 21, 21)
+
+
+def parse_hash(value) -> Optional[int]:
+    """Return the 64-bit integer for a pHash hex string, or None if it is not one."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    if len(text) != HASH_HEX_LENGTH:
+        return None
+    try:
+        return int(text, 16)
+    except ValueError:
+        return None
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits (equals ImageHash.__sub__ for 64-bit hashes)."""
+    return (a ^ b).bit_count()
+
+
+_variant_masks_cache = {}
+
+
+def _variant_masks(width: int, max_flips: int) -> list:
+    """All masks of `width` bits with at most max_flips bits set (0 first)."""
+    key = (width, max_flips)
+    masks = _variant_masks_cache.get(key)
+    if masks is None:
+        masks = [0]
+        for flips in range(1, max_flips + 1):
+            for bits in combinations(range(width), flips):
+                mask = 0
+                for bit in bits:
+                    mask |= 1 << bit
+                masks.append(mask)
+        _variant_masks_cache[key] = masks
+    return masks
+
+
+class MultiIndexHash:
+    """Set of distinct 64-bit hashes supporting Hamming-radius queries."""
+
+    def __init__(self, chunk_widths=CHUNK_WIDTHS):
+        if sum(chunk_widths) != HASH_BITS:
+            raise ValueError("chunk widths must add up to 64 bits")
+        self._chunks = []
+        shift = HASH_BITS
+        for width in chunk_widths:
+            shift -= width
+            self._chunks.append((shift, (1 << width) - 1, width))
+        self._tables = [{} for _ in self._chunks]
+        self._values = set()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, value: int) -> bool:
+        return value in self._values
+
+    def add(self, value: int) -> bool:
+        """Insert value; returns False if it was already present."""
+        if value in self._values:
+            return False
+        self._values.add(value)
+        for table, (shift, mask, _) in zip(self._tables, self._chunks):
+            table.setdefault((value >> shift) & mask, []).append(value)
+        return True
+
+    def search(self, value: int, radius: int) -> list:
+        """Return [(stored_value, distance), ...] for every stored value within radius bits."""
+        if radius < 0 or not self._values:
+            return []
+        if radius == 0:
+            return [(value, 0)] if value in self._values else []
+
+        max_flips = radius // len(self._chunks)
+        seen = set()
+        matches = []
+        for table, (shift, mask, width) in zip(self._tables, self._chunks):
+            chunk = (value >> shift) & mask
+            for flip in _variant_masks(width, max_flips):
+                bucket = table.get(chunk ^ flip)
+                if not bucket:
+                    continue
+                for candidate in bucket:
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = hamming(value, candidate)
+                    if distance <= radius:
+                        matches.append((candidate, distance))
+        return matches
@@ -1,14 +1,17 @@
+import os
 from app import storage, dataset
 from app import image_classifier as ic
-from app.text_rules import (
-    is_abusive,
-    detect_category,
-    detect_urgency,
-    CATEGORY_KEYWORDS
-)
+from app import profanity
+from app.report_context import ReportContext, duplicate_threshold
+from app.text_rules import CATEGORY_KEYWORDS
 
 # Confidence threshold for category detection
 CATEGORY_CONFIDENCE_THRESHOLD = 0.1  # Minimum confidence to accept category (lowered to reduce false rejections)
+
+# Maximum pHash Hamming distance for two images to count as the same photo.
+# 0 = exact hash match only; 4-8 also catches re-compressed/resized re-uploads.
+# Checks use duplicate_threshold() of it, which allows for hashes stored from full-size decodes.
+IMAGE_DUPLICATE_THRESHOLD = int(os.getenv("IMAGE_DUPLICATE_THRESHOLD", "0"))
 import warnings
 
 warnings.filterwarnings("ignore", category=UserWarning, message=".*pkg_resources.*")
@@ -85,12 +88,13 @@ GENERIC_IMAGE_LABELS = {
 # Model initialization
 # ------------------------------------
 def initialize_models():
-    """Initialize ML models (CLIP for image classification)"""
+    """Initialize ML models (CLIP for image classification, profanity-check for abuse detection)"""
     try:
-        ic.initialize_clip()
+        ic.load_clip()
     except Exception as e:
         print(f"Model initialization failed (will use fallback): {str(e)}")
         pass
+    profanity.load()
 
 
 # ------------------------------------
@@ -102,9 +106,15 @@ def classify_report(report: dict):
         if not description:
             return reject(report, "Description is required", confidence=0.0)
 
+        image_bytes = report.get("image_bytes")
+        # Decode-once context: every stage below shares one decoded image, pHash and CLIP tensor,
+        # and one text analysis (category, abuse flag, urgency, token set) of the description
+        context = ReportContext(image_bytes, description)
+
         # Category detection with confidence scoring
         try:
-            category, confidence = detect_category(description)
+            analysis = context.analysis
+            category, confidence = analysis.category, analysis.confidence
         except Exception as e:
             print(f"[ERROR] Category detection failed: {str(e)}")
             import traceback
@@ -115,13 +125,18 @@ def classify_report(report: dict):
         if category == "Other" or confidence < CATEGORY_CONFIDENCE_THRESHOLD:
             return reject(report, "Unable to determine issue category. Please provide more details.", category, confidence)
 
-        if is_abusive(description):
+        if analysis.abusive:
+            return reject(report, "Abusive language detected", category, confidence)
+
+        # Second stage: the profanity-check model looks at texts the keyword list did not flag
+        if profanity.is_profane(analysis.normalized):
+            print(f"[DEBUG] profanity-check flagged description as abusive")
             return reject(report, "Abusive language detected", category, confidence)
 
         # Check for same user duplicate (same user, same description, same category)
         user_id = report.get("user_id", "anon")
         try:
-            if storage.is_duplicate(user_id, description, category, store=False):
+            if storage.is_duplicate(user_id, analysis.normalized, category, store=False):
                 return reject(report, "You have already submitted this report.", category, confidence)
         except Exception as e:
             print(f"[ERROR] Text duplicate check failed: {str(e)}")
@@ -129,7 +144,6 @@ def classify_report(report: dict):
 
         # STEP 1: Check image validation FIRST (before location duplicate check)
         # This ensures the correct error message is shown when images don't match
-        image_bytes = report.get("image_bytes")
         if image_bytes:
             print(f"[DEBUG] Processing image for category '{category}' (image size: {len(image_bytes)} bytes)")
             
@@ -137,7 +151,7 @@ def classify_report(report: dict):
                 # STEP 1a: Check for duplicate images
                 try:
                     print(f"[DEBUG] Checking for duplicate image")
-                    is_dup = storage.is_duplicate_image_from_bytes(image_bytes, threshold=0, store=False)
+                    is_dup = storage.is_duplicate_image_from_bytes(image_bytes, threshold=duplicate_threshold(IMAGE_DUPLICATE_THRESHOLD), store=False, context=context)
                     
                     if is_dup:
                         print(f"[DEBUG] DUPLICATE IMAGE DETECTED")
@@ -153,7 +167,7 @@ def classify_report(report: dict):
                 
                 # STEP 1b: Check if image matches the category/description
                 try:
-                    image_matches = image_matches_category_from_bytes(image_bytes, category)
+                    image_matches = image_matches_category_from_bytes(image_bytes, category, context=context)
                     
                     if not image_matches:
                         # Image doesn't match the category - reject with correct error message
@@ -198,9 +212,10 @@ def classify_report(report: dict):
                     category=category,
                     lat=latitude,
                     lon=longitude,
-                    image_threshold=0,  # Exact image hash match only
+                    image_threshold=duplicate_threshold(IMAGE_DUPLICATE_THRESHOLD),
                     text_similarity_threshold=0.6,  # 60% text similarity required
-                    location_threshold=50.0  # Check reports within 50m (supporting signal only)
+                    location_threshold=50.0,  # Check reports within 50m (supporting signal only)
+                    context=context
                 )
                 
                 if is_dup:
@@ -212,7 +227,7 @@ def classify_report(report: dict):
                 print(traceback.format_exc())
                 # Continue - don't block on technical errors
 
-        urgency = detect_urgency(description)
+        urgency = analysis.urgency
         
         # Prepare result with all necessary data for duplicate checking
         result = {
@@ -230,16 +245,11 @@ def classify_report(report: dict):
             "longitude": longitude
         }
         
-        # Compute and store image hash if image is provided
+        # Store image hash if image is provided (already computed for the duplicate checks)
         image_bytes = report.get("image_bytes")
         if image_bytes:
             try:
-                from PIL import Image
-                import imagehash
-                import io
-                img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-                img_hash = imagehash.phash(img)
-                result["image_hash"] = str(img_hash)  # Store as string for JSON serialization
+                result["image_hash"] = context.phash  # Store as string for JSON serialization
             except Exception as e:
                 print(f"[WARNING] Failed to compute image hash (non-critical): {str(e)}")
                 # Continue without image hash
@@ -272,15 +282,20 @@ def classify_report(report: dict):
 # ------------------------------------
 # Image validation logic (BALANCED) - FROM BYTES
 # ------------------------------------
-def image_matches_category_from_bytes(image_bytes: bytes, category: str) -> bool:
+def image_matches_category_from_bytes(image_bytes: bytes, category: str, context: ReportContext = None) -> bool:
     """
     Check if image matches the detected category.
-    Works with image bytes directly (no URL required).
+    Works with image bytes directly (no URL required); pass the request's
+    ReportContext to reuse its decoded image and CLIP tensor.
     Returns True if image matches or if classification is uncertain (allow through).
     Returns False ONLY if we can confidently determine the image doesn't match.
     """
     try:
-        image_label = ic.classify_image_from_bytes(image_bytes)
+        if context is not None:
+            # Resubmitted photos hit the result cache and skip preprocessing and CLIP entirely
+            image_label = ic.classify_image_cached(context.image_digest, lambda: context.clip_pixel_values)
+        else:
+            image_label = ic.classify_image_from_bytes(image_bytes)
         image_label = str(image_label).lower().strip() if image_label else "other"
         
         print(f"[DEBUG] Image classified as: '{image_label}' for category '{category}'")
@@ -384,8 +399,9 @@ def reject(report, reason, category="Other", confidence=0.0):
         del report_for_save["image_bytes"]
     
     try:
-        dataset.save_report(report_for_save)
-        print(f"[DEBUG] Successfully saved rejected report to dataset")
+        # Rejected reports never take part in duplicate checks: queue them without waiting for the commit
+        dataset.save_report(report_for_save, wait=False)
+        print(f"[DEBUG] Queued rejected report for the dataset")
     except Exception as e:
         print(f"[ERROR] Failed to save rejected report to dataset (non-critical): {str(e)}")
         import traceback
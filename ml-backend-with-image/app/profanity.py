@@ -0,0 +1,144 @@
+"""
+Second-stage abuse check with the profanity-check model.
+
+text_rules.is_abusive (the ABUSIVE_WORDS list) is the first stage and is
+conclusive when it finds a word. Texts it does not flag are inconclusive and
+go to profanity_check.predict_prob, a linear model over the whole text that
+also catches misspelled or unlisted abuse.
+
+The model is vectorized over lists, so concurrent requests are micro-batched
+into one predict_prob call (PROFANITY_MAX_BATCH_SIZE / _WAIT_MS). Verdicts are
+cached by normalized text (PROFANITY_CACHE_SIZE), so repeated descriptions
+never reach the model. The stage is optional: if profanity-check is not
+installed, fails to load or raises, is_profane() returns None and the keyword
+verdict stands.
+
+The stage is off unless PROFANITY_CHECK=1. On civic complaints the model
+scores plain descriptions such as "clean the garbage here" above 0.5, so
+check the new rejections with benchmarks/check_profanity_rejections.py
+before turning it on. The model comes from alt-profanity-check (same
+profanity_check module); the original profanity-check package no longer
+imports with current scikit-learn.
+"""
+import os
+import threading
+from typing import Optional
+
+from app.micro_batcher import MicroBatcher
+from app.result_cache import ResultCache
+
+PROFANITY_CHECK = os.getenv("PROFANITY_CHECK", "0") == "1"  # 1 enables the second stage
+PROFANITY_THRESHOLD = float(os.getenv("PROFANITY_THRESHOLD", "0.5"))  # predict_prob at or above = abusive
+PROFANITY_MAX_BATCH_SIZE = int(os.getenv("PROFANITY_MAX_BATCH_SIZE", "32"))  # 1 disables batching
+PROFANITY_MAX_BATCH_WAIT_MS = float(os.getenv("PROFANITY_MAX_BATCH_WAIT_MS", "2"))
+PROFANITY_CACHE_SIZE = int(os.getenv("PROFANITY_CACHE_SIZE", "8192"))  # 0 disables the cache
+PROFANITY_CACHE_TTL = 7 * 86400  # verdicts only change with the model, which ships with the image
+
+_predict_prob = None
+_available = None  # None until the import has been attempted
+_load_lock = threading.Lock()
+_batcher = None
+_batcher_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def load() -> bool:
+    """Import profanity-check and load its model once; returns whether the stage is available."""
+    global _predict_prob, _available
+    if _available is None:
+        with _load_lock:
+            if _available is None:
+                if not PROFANITY_CHECK:
+                    _available = False
+                    return _available
+                try:
+                    from profanity_check import predict_prob
+                    predict_prob(["warm up"])
+                    _predict_prob = predict_prob
+                    _available = True
+                    print("[INIT] profanity-check model loaded (second-stage abuse check)")
+                except Exception as e:
+                    _available = False
+                    print(f"[WARNING] profanity-check not available, abuse detection uses the keyword list only: {str(e)}")
+    return _available
+
+
+def _run_batch(texts: list) -> list:
+    """MicroBatcher callback: one predict_prob call for every queued text."""
+    return [float(prob) for prob in _predict_prob(list(texts))]
+
+
+def _get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(_run_batch, PROFANITY_MAX_BATCH_SIZE, PROFANITY_MAX_BATCH_WAIT_MS,
+                                        name="profanity-batcher")
+    return _batcher
+
+
+def configure_batching(max_batch_size: int, max_wait_ms: float):
+    """Change the batching limits at runtime (benchmarks, single-request worker processes)."""
+    global PROFANITY_MAX_BATCH_SIZE, PROFANITY_MAX_BATCH_WAIT_MS, _batcher
+    with _batcher_lock:
+        PROFANITY_MAX_BATCH_SIZE, PROFANITY_MAX_BATCH_WAIT_MS = max_batch_size, max_wait_ms
+        old, _batcher = _batcher, None
+    if old is not None:
+        old.close()
+
+
+def get_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(PROFANITY_CACHE_SIZE, PROFANITY_CACHE_TTL)
+    return _cache
+
+
+def is_profane(normalized_text: str) -> Optional[bool]:
+    """
+    Model verdict for an already normalized text (text_rules.normalize), or
+    None if the stage is disabled, unavailable or fails.
+    """
+    if not normalized_text or not load():
+        return None
+    cache = get_cache()
+    cached = cache.get(normalized_text)
+    if cached is not None:
+        return cached
+    try:
+        if PROFANITY_MAX_BATCH_SIZE > 1:
+            prob = _get_batcher().submit(normalized_text)
+        else:
+            prob = _run_batch([normalized_text])[0]
+    except Exception as e:
+        print(f"[ERROR] profanity-check prediction failed (keeping keyword verdict): {str(e)}")
+        return None
+    verdict = prob >= PROFANITY_THRESHOLD
+    cache.put(normalized_text, verdict)
+    return verdict
+
+
+def stats() -> Optional[dict]:
+    """Cache and batching counters for /health, or None when the stage is not loaded."""
+    if not _available:
+        return None
+    batcher = _batcher
+    return {"cache": get_cache().stats(), "threshold": PROFANITY_THRESHOLD,
+            "batches": batcher.batches if batcher else 0,
+            "mean_batch_size": round(batcher.mean_batch_size, 2) if batcher else 0.0}
+
+
+def _reset_after_fork():
+    """Forked children inherit the loaded model but not the batcher thread or lock state."""
+    global _batcher, _batcher_lock, _load_lock, _cache_lock
+    _batcher = None
+    _batcher_lock = threading.Lock()
+    _load_lock = threading.Lock()
+    _cache_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,126 @@
+"""
+Per-request context that decodes a report's image once.
+
+Several pipeline stages need something derived from the same upload: the
+duplicate checks need its pHash, CLIP needs its pixel tensor, and the saved
+record needs the hash again. ReportContext computes each artifact on first
+access and memoizes it, so one request decodes the image once and hashes it
+once no matter how many stages look at it.
+
+The image is decoded once, at a draft scale: for JPEG, Image.draft picks the
+smallest DCT scale (1/2, 1/4 or 1/8) whose shorter side is still at least
+DECODE_MIN_SIDE, so a 12 MP phone photo decodes at ~500x375; other formats
+decode at full size. Both consumers read that decode: the pHash resizes it to
+its 32x32 thumbnail and CLIP gets it box-reduced towards 224 px.
+
+The scale depends only on the image, so the same upload always gets the same
+hash. Hashes stored from a full-resolution decode (older reports) can differ
+from it by a few bits: benchmarks/check_reduced_decode.py measured 0 bits on
+photo-like JPEGs and at most 6 on high-detail textures. duplicate_threshold()
+widens the image-duplicate threshold by that tolerance (IMAGE_PHASH_TOLERANCE).
+Set IMAGE_REDUCED_DECODE=0 to decode and hash at full size.
+"""
+import io
+import os
+from functools import cached_property
+from typing import Optional
+
+from PIL import Image
+import imagehash
+
+from app import image_classifier as ic
+from app.text_rules import analyze_text, TextAnalysis
+
+# imagehash.phash works on a 32x32 grayscale image (hash_size=8 * highfreq_factor=4)
+PHASH_IMAGE_SIZE = 32
+
+# Smallest image side that still serves every consumer (CLIP's 224 px shortest edge)
+DECODE_MIN_SIDE = 224
+REDUCED_DECODE = os.getenv("IMAGE_REDUCED_DECODE", "1") != "0"
+# Hamming bits by which a draft-scale pHash can differ from the full-decode pHash of the same image
+PHASH_TOLERANCE = int(os.getenv("IMAGE_PHASH_TOLERANCE", "6"))
+
+
+def duplicate_threshold(threshold: int) -> int:
+    """Image-duplicate Hamming threshold for a request pHash: at least PHASH_TOLERANCE with draft-scale
+    decoding, so stored hashes computed from a full decode still match."""
+    return max(threshold, PHASH_TOLERANCE) if REDUCED_DECODE else threshold
+
+
+def reduce_image(img: Image.Image, min_side: int = DECODE_MIN_SIDE) -> Image.Image:
+    """Box-reduce img by the largest integer factor that keeps its shorter side >= min_side."""
+    factor = min(img.size) // min_side
+    return img.reduce(factor) if factor >= 2 else img
+
+
+def draft_decode(image_bytes: bytes, reduced: bool = None, min_side: int = DECODE_MIN_SIDE) -> Image.Image:
+    """Decode image bytes to RGB; with reduced, a JPEG decodes at the smallest DCT scale whose
+    shorter side is still >= min_side (the pHash input, see the module docstring)."""
+    if reduced is None:
+        reduced = REDUCED_DECODE
+    img = Image.open(io.BytesIO(image_bytes))
+    if reduced and img.format == "JPEG":
+        # Decoder-level downscale: only the needed DCT coefficients are decoded
+        img.draft("RGB", (min_side, min_side))
+    return img.convert("RGB")
+
+
+def decode_image(image_bytes: bytes, reduced: bool = None, min_side: int = DECODE_MIN_SIDE) -> Image.Image:
+    """Decode image bytes to RGB for CLIP: the draft decode box-reduced so its shorter side stays >= min_side."""
+    if reduced is None:
+        reduced = REDUCED_DECODE
+    img = draft_decode(image_bytes, reduced, min_side)
+    return reduce_image(img, min_side) if reduced else img
+
+
+class ReportContext:
+    """Lazily computed, memoized artifacts of one report's image and description."""
+
+    def __init__(self, image_bytes: Optional[bytes], description: str = ""):
+        self.image_bytes = image_bytes
+        self.description = description or ""
+
+    @property
+    def has_image(self) -> bool:
+        return bool(self.image_bytes)
+
+    @cached_property
+    def decoded_image(self) -> Image.Image:
+        """The upload decoded once at its draft scale, in RGB (see draft_decode)."""
+        return draft_decode(self.image_bytes)
+
+    @cached_property
+    def image(self) -> Image.Image:
+        """The upload at reduced resolution for CLIP: the draft decode box-reduced."""
+        return reduce_image(self.decoded_image) if REDUCED_DECODE else self.decoded_image
+
+    @cached_property
+    def gray_thumbnail(self) -> Image.Image:
+        """32x32 grayscale image, exactly what imagehash.phash resizes to internally."""
+        return self.decoded_image.convert("L").resize((PHASH_IMAGE_SIZE, PHASH_IMAGE_SIZE), Image.Resampling.LANCZOS)
+
+    @cached_property
+    def phash(self) -> str:
+        """pHash hex string; identical to str(imagehash.phash(draft_decode(image_bytes))), the hash
+        stored for the report and computed by the URL check."""
+        return str(imagehash.phash(self.gray_thumbnail))
+
+    @cached_property
+    def image_digest(self) -> str:
+        """SHA-256 of the upload, the key of the CLIP result cache."""
+        return ic.image_digest(self.image_bytes)
+
+    @cached_property
+    def clip_pixel_values(self):
+        """CLIP input tensor for the image, or None when CLIP is unavailable."""
+        return ic.preprocess_image(self.image)
+
+    @cached_property
+    def analysis(self) -> TextAnalysis:
+        """Category, abuse, urgency and token set of the description (text_rules.analyze_text)."""
+        return analyze_text(self.description)
+
+    @property
+    def normalized_description(self) -> str:
+        """Lower-cased, stripped description (text_rules.normalize)."""
+        return self.analysis.normalized
@@ -0,0 +1,326 @@
+"""
+Process-wide in-memory index of ACCEPTED reports.
+
+The index reads dataset.jsonl once and afterwards only follows the tail of the
+file: every query first checks the file size and parses just the lines that
+were appended since the previous query (by dataset.save_report in this process
+or by any other writer). Duplicate checks therefore never re-read the whole
+dataset on the request path. In the segmented layout the index reads only the
+accepted stream: closed segments once, then the tail of the active one.
+
+With several server processes (uvicorn --workers N) each keeps its own index
+and sees the reports the others accepted on its next query. Setting
+REPORT_INDEX_MAX_STALENESS_MS bounds how old that view may get instead: the
+file is checked at most once per interval, trading up to that much staleness
+for fewer stat() calls. This process's own saves are applied immediately either way.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse, urlunparse
+
+from app import dataset
+from app.geo import SpatialGrid
+from app.phash_index import MultiIndexHash, parse_hash
+
+REPORT_INDEX_MAX_STALENESS_MS = float(os.getenv("REPORT_INDEX_MAX_STALENESS_MS", "0"))
+
+
+class IndexedReport(NamedTuple):
+    """The fields of an accepted report that duplicate detection needs."""
+    report_id: str
+    user_id: str                # lower-cased, "anon" when missing
+    description: str            # stripped and lower-cased
+    category: str               # lower-cased
+    image_hash: Optional[str]
+    image_url: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+
+
+def text_key(user_id, description: str, category: str) -> tuple:
+    """Exact-duplicate key: (normalized user, whitespace-collapsed lower-case description, lower-case category)."""
+    return (
+        str(user_id or "anon").lower(),
+        " ".join((description or "").strip().lower().split()),
+        (category or "").lower(),
+    )
+
+
+def normalize_image_url(image_url: str) -> str:
+    """Drop params, query and fragment so that signed/cache-busted URLs compare equal."""
+    parsed = urlparse(image_url)
+    return urlunparse((parsed.scheme, parsed.netloc, parsed.path, '', '', ''))
+
+
+def _to_float(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_indexed(report: dict) -> IndexedReport:
+    image_hash = report.get("image_hash")
+    return IndexedReport(
+        report_id=str(report.get("report_id", "unknown")),
+        user_id=str(report.get("user_id") or "anon").lower(),
+        description=(report.get("description") or "").strip().lower(),
+        category=sys.intern((report.get("category") or "").lower()),
+        image_hash=str(image_hash).strip() if image_hash is not None else None,
+        image_url=report.get("image_url") or None,
+        latitude=_to_float(report.get("latitude")),
+        longitude=_to_float(report.get("longitude")),
+    )
+
+
+is_accepted = dataset.is_accepted
+
+
+def image_hash_key(image_hash):
+    """Key under which an image hash is indexed: the 64-bit pHash, or for a value that is not
+    16 hex characters (older or foreign hashes) the stripped string, which then matches exactly."""
+    value = parse_hash(image_hash)
+    if value is not None:
+        return value
+    text = str(image_hash).strip() if image_hash is not None else ""
+    return text or None
+
+
+class ReportIndex:
+    """
+    Accepted reports held in memory, kept in sync with the dataset file.
+
+    Reports are stored in insertion order; secondary dictionaries map image
+    hashes and normalized image URLs to the reports that carry them, a
+    multi-index hash over the distinct 64-bit pHashes answers Hamming-radius
+    (near-duplicate) queries, a spatial grid returns the reports within a
+    radius of a point, and a set of text keys answers "same user, same
+    description, same category" in constant time.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_staleness_ms: Optional[float] = None):
+        # path=None follows dataset.DATA_FILE, so the index keeps working if the
+        # dataset location is changed at runtime (tests, scripts).
+        self._path = Path(path) if path is not None else None
+        self._lock = threading.RLock()
+        staleness_ms = REPORT_INDEX_MAX_STALENESS_MS if max_staleness_ms is None else max_staleness_ms
+        self.max_staleness = max(0.0, staleness_ms) / 1000
+        self._checked_at = None
+        self._reset()
+
+    def _reset(self):
+        self._reports = []
+        self._by_image_hash = {}
+        self._phash_index = MultiIndexHash()
+        self._by_image_url = {}
+        self._grid = SpatialGrid()
+        self._text_keys = set()
+        self._files = []  # [path, file_id, offset, done] per file read so far, in order
+
+    @property
+    def path(self) -> Path:
+        """The file appends currently go to."""
+        return self._paths()[-1]
+
+    def _paths(self) -> list:
+        if self._path is not None:
+            return [self._path]
+        return dataset.report_files("accepted") or [dataset.DATA_FILE]
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._reports)
+
+    # ------------------------------------
+    # Keeping up with the dataset file(s)
+    # ------------------------------------
+    def refresh(self, force: bool = False):
+        """Parse lines appended to the dataset since the last call.
+
+        Costs one stat() when nothing changed (plus one for the segment
+        manifest), or nothing within max_staleness of the previous check unless
+        force is set. Files that are no longer the newest (closed segments) are
+        read to the end once and not looked at again. If a file already read
+        was replaced, truncated or removed the index is rebuilt from scratch.
+        """
+        if self.max_staleness and not force and self._checked_at is not None \
+                and time.monotonic() - self._checked_at < self.max_staleness:
+            return
+        with self._lock:
+            self._checked_at = time.monotonic()
+            started = time.perf_counter()
+            initial_load = not self._files
+            paths = self._paths()
+            if [entry[0] for entry in self._files] != paths[:len(self._files)]:
+                self._reset()  # segments were compacted or the dataset location changed
+            for i, path in enumerate(paths):
+                if i < len(self._files):
+                    entry = self._files[i]
+                    if entry[3]:
+                        continue
+                else:
+                    entry = None
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    if entry is not None:
+                        self._reset()
+                    break
+                file_id = (str(path), st.st_dev, st.st_ino)
+                if entry is None:
+                    entry = [path, file_id, 0, False]
+                    self._files.append(entry)
+                elif file_id != entry[1] or st.st_size < entry[2]:
+                    # Replaced or truncated: rebuild (the second pass starts with no files read)
+                    self._reset()
+                    return self.refresh(force=True)
+                if st.st_size > entry[2]:
+                    self._read_tail(entry)
+                entry[3] = i < len(paths) - 1
+
+            if initial_load and self._files:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                print(f"[INIT] Report index loaded {len(self._reports)} accepted reports from "
+                      f"{len(self._files)} file(s) ending in {self._files[-1][0]} in {elapsed_ms:.1f}ms")
+
+    def _read_tail(self, entry: list):
+        path, _, offset, _ = entry
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Partially written line - pick it up on the next refresh
+                    break
+                offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    report = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Skip invalid JSON lines
+                if isinstance(report, dict) and is_accepted(report):
+                    self._add(_to_indexed(report))
+        entry[2] = offset
+
+    def on_report_saved(self, report: dict, line):
+        """dataset.save_report listener: apply our own appends without reading them back.
+
+        When the new line starts exactly where the index stopped reading the
+        newest file, the record is added directly and the read offset moves
+        past it. Rejected lines in another file (the rejected stream) are
+        ignored. Otherwise (another writer appended in between, a segment
+        rotated, or the file was swapped) the regular tail read picks
+        everything up.
+        """
+        with self._lock:
+            current = self._files[-1] if self._files else None
+            if current is None or current[1] != (str(line.path), line.device, line.inode) or line.start != current[2]:
+                if is_accepted(report) or (current is not None and str(line.path) == current[1][0]):
+                    self.refresh(force=True)
+                return
+            current[2] = line.end
+            if is_accepted(report):
+                self._add(_to_indexed(report))
+
+    def _add(self, record: IndexedReport):
+        self._reports.append(record)
+        key = (record.user_id, " ".join(record.description.split()), record.category)
+        if key[1] == record.description:
+            key = (record.user_id, record.description, record.category)  # share the string
+        self._text_keys.add(key)
+        image_hash = image_hash_key(record.image_hash)
+        if image_hash is not None:
+            self._by_image_hash.setdefault(image_hash, []).append(record)
+            if isinstance(image_hash, int):
+                self._phash_index.add(image_hash)
+        if record.latitude is not None and record.longitude is not None:
+            self._grid.add(record.latitude, record.longitude, record)
+        if record.image_url:
+            try:
+                url_key = normalize_image_url(record.image_url)
+            except Exception:
+                url_key = None
+            if url_key:
+                self._by_image_url.setdefault(url_key, []).append(record)
+
+    # ------------------------------------
+    # Queries
+    # ------------------------------------
+    def reports(self) -> list:
+        """All accepted reports, oldest first (do not mutate the returned list)."""
+        self.refresh()
+        return self._reports
+
+    def nearby(self, lat: float, lon: float, radius_m: float) -> list:
+        """[(report, distance_m), ...] for accepted reports within radius_m of (lat, lon), nearest first."""
+        self.refresh()
+        with self._lock:
+            return self._grid.within(lat, lon, radius_m)
+
+    def has_text_duplicate(self, user_id, description: str, category: str) -> bool:
+        """True if this user already has an accepted report with the same description and category."""
+        self.refresh()
+        return text_key(user_id, description, category) in self._text_keys
+
+    def find_by_image_hash(self, image_hash: str) -> list:
+        """Accepted reports whose stored pHash equals image_hash (hex string)."""
+        self.refresh()
+        return list(self._by_image_hash.get(image_hash_key(image_hash), ()))
+
+    def find_similar_images(self, image_hash: str, max_distance: int) -> list:
+        """[(report, hamming_distance), ...] for accepted reports whose pHash is within max_distance bits.
+        A hash that is not a 64-bit pHash only matches the same string (distance 0)."""
+        value = parse_hash(image_hash)
+        if value is None:
+            return [(report, 0) for report in self.find_by_image_hash(image_hash)]
+        self.refresh()
+        if max_distance <= 0:
+            return [(report, 0) for report in self._by_image_hash.get(value, ())]
+        with self._lock:
+            matches = self._phash_index.search(value, max_distance)
+            return [
+                (report, distance)
+                for stored, distance in sorted(matches, key=lambda match: match[1])
+                for report in self._by_image_hash[stored]
+            ]
+
+    def find_by_image_url(self, image_url: str) -> list:
+        """Accepted reports whose normalized image URL equals that of image_url."""
+        self.refresh()
+        return list(self._by_image_url.get(normalize_image_url(image_url), ()))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> ReportIndex:
+    """Return the process-wide report index, creating it on first use.
+    With DATASET_BACKEND=sqlite this is the SQLite store, which answers the same queries."""
+    if dataset.DATASET_BACKEND == "sqlite":
+        from app.sqlite_store import get_store
+        return get_store()
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = ReportIndex()
+                # Keep the index current with this process's own saves
+                dataset.add_save_listener(index.on_report_saved)
+                _index = index
+    return _index
+
+
+def load_index() -> ReportIndex:
+    """Load the dataset into the index now (call at startup to keep it off the request path)."""
+    index = get_index()
+    index.refresh()
+    return index
@@ -0,0 +1,366 @@
+"""
+Compact, memory-mapped binary store of the dedup-critical fields of accepted reports.
+
+Every accepted report becomes one fixed-width 48-byte record:
+
+    phash     uint64   64-bit pHash (0 with HAS_PHASH unset when there is none)
+    user      uint64   fingerprint of the lower-cased user id
+    text      uint64   fingerprint of the whitespace-collapsed, lower-cased description
+    lat, lon  float64  NaN when missing
+    category  uint32   CRC-32 of the lower-cased category
+    flags     uint32   HAS_PHASH
+
+The file is a 64-byte header followed by the records. It is append-only,
+memory-mapped as a NumPy structured array and queried with vectorized scans,
+so it needs no JSON parsing or Python object per report: a million reports
+take 48 MB of page cache that several processes share.
+
+The store is derived from the dataset. The header records how far it has read
+(device, inode and offset of the last dataset file). open()/sync() catch up
+from there across the accepted files (single or segmented layout) and rebuild
+it if those files were replaced. on_report_saved() can be registered as a
+dataset save listener to append reports as they are saved. Records are
+written and fsynced before the header, so after a crash the surplus records
+past the header count are truncated and read again.
+
+Several processes can share one store: changes are made under an flock on
+<path>.lock after re-reading the header, and every query reads the header
+first, so each process sees the records any of them appended.
+
+With REPORT_STORE=1 (JSONL backend; path: REPORT_STORE_PATH, default
+data/reports.bin) warm-up opens the store, catches it up and registers
+on_report_saved, and the exact-text and image-hash duplicate checks in
+app.storage read it instead of the report index. Pipeline worker processes
+open it in their initializer and map the same file, so a report saved by one
+worker is seen by the next check in any other without a dataset re-read.
+The location and comprehensive checks still need report bodies and use the
+index. One-time conversion of an existing dataset:
+
+    python -m app.report_store convert
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app import dataset
+from app.geo import distances_to
+from app.phash_index import parse_hash
+
+try:
+    import fcntl
+except ImportError:  # not on Linux/macOS: in-process locking only
+    fcntl = None
+
+REPORT_STORE = os.getenv("REPORT_STORE", "0") == "1"
+REPORT_STORE_PATH = Path(os.getenv("REPORT_STORE_PATH", str(dataset.BASE_DIR / "data" / "reports.bin")))
+
+RECORD_DTYPE = np.dtype([
+    ("phash", "<u8"), ("user", "<u8"), ("text", "<u8"),
+    ("lat", "<f8"), ("lon", "<f8"),
+    ("category", "<u4"), ("flags", "<u4"),
+])
+RECORD = struct.Struct("<QQQddII")  # same layout as RECORD_DTYPE, for encoding single records
+HAS_PHASH = 1
+
+MAGIC = b"CCRSTORE"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQQQQ")  # magic, version, record size, reserved, count, source dev, inode, offset
+HEADER_SIZE = 64
+
+
+def fingerprint(text: str) -> int:
+    """64-bit fingerprint of a string (BLAKE2b); collisions are negligible at dataset sizes."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf8"), digest_size=8).digest(), "little")
+
+
+def user_fingerprint(user_id) -> int:
+    return fingerprint(str(user_id or "anon").lower())
+
+
+def text_fingerprint(description: str) -> int:
+    return fingerprint(" ".join((description or "").strip().lower().split()))
+
+
+def category_code(category: str) -> int:
+    return zlib.crc32((category or "").lower().encode("utf8"))
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value) if value is not None else float("nan")
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def encode(report: dict) -> bytes:
+    """The fixed-width record for one accepted report."""
+    phash = parse_hash(report.get("image_hash"))
+    return RECORD.pack(phash or 0, user_fingerprint(report.get("user_id")), text_fingerprint(report.get("description")),
+                       _to_float(report.get("latitude")), _to_float(report.get("longitude")),
+                       category_code(report.get("category")), HAS_PHASH if phash is not None else 0)
+
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:  # NumPy < 2.0
+    _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return _BYTE_POPCOUNT[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class ReportStore:
+    """Append-only file of RECORD_DTYPE records mirroring the accepted reports of the dataset."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._count = 0
+        self._source = (0, 0, 0)  # (device, inode, offset) read up to in the newest dataset file
+        self._inode = None  # inode of the store file the state above describes
+        self._records = None  # memmap of the first len(self._records) records
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._locked():
+            pass  # creates, repairs or loads the file
+
+    # ------------------------------------
+    # File handling
+    # ------------------------------------
+    @contextmanager
+    def _locked(self):
+        """Hold the store for a change: in-process lock plus, with fcntl, an flock shared by
+        every process using the store. Re-reads the header (another process may have appended)."""
+        with self._lock:
+            if self._lock_depth:  # nested (on_report_saved -> sync): the flock is already held
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with open(self.lock_path, "a+b") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    self._load_header(repair=True)
+                    yield
+                finally:
+                    self._lock_depth = 0
+
+    def _load_header(self, repair: bool = False) -> bool:
+        """Pick up the count and source of the file on disk; returns False if it is not a store
+        yet. With repair (under the lock) also creates, rebuilds or truncates it."""
+        try:
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                header = f.read(HEADER.size)
+        except FileNotFoundError:
+            header, st = b"", None
+        if len(header) < HEADER.size:
+            if repair:
+                self._create()
+            return False
+        magic, version, record_size, _, count, dev, ino, offset = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            if repair:
+                print(f"[WARNING] {self.path} is not a version {VERSION} report store, rebuilding it")
+                self._create()
+            return False
+        expected = HEADER_SIZE + count * RECORD_DTYPE.itemsize
+        if repair and st.st_size != expected:
+            # Records appended after the last header update (crash): drop them, the catch-up re-reads them
+            os.truncate(self.path, expected)
+        if st.st_ino != self._inode:
+            self._inode, self._records = st.st_ino, None  # rebuilt by another process
+        self._count = count
+        self._source = (dev, ino, offset)
+        return True
+
+    def _create(self):
+        """Start an empty store. Replaces the file, so processes still mapping the old one keep valid pages."""
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(self._header(0, (0, 0, 0)))
+        os.replace(tmp, self.path)
+        self._inode = os.stat(self.path).st_ino
+        self._count = 0
+        self._source = (0, 0, 0)
+        self._records = None
+
+    @staticmethod
+    def _header(count: int, source: tuple) -> bytes:
+        return HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, 0, count, *source).ljust(HEADER_SIZE, b"\0")
+
+    def _append(self, data: bytes, added: int, source: tuple):
+        """Write and fsync the records, then the header that makes them count (caller holds _locked)."""
+        with open(self.path, "r+b") as f:
+            if data:
+                f.seek(HEADER_SIZE + self._count * RECORD_DTYPE.itemsize)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())  # a header must never count records that are not on disk
+            f.seek(0)
+            f.write(self._header(self._count + added, source))
+        self._count += added
+        self._source = source
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load_header()
+            return self._count
+
+    def records(self) -> np.ndarray:
+        """Structured array (memory-mapped, read-only) of all records, including those other
+        processes appended: one header read per call, no lock (records precede their header)."""
+        with self._lock:
+            self._load_header()
+            if self._count == 0:
+                return np.zeros(0, dtype=RECORD_DTYPE)
+            if self._records is None or len(self._records) != self._count:
+                self._records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE,
+                                          shape=(self._count,))
+            return self._records
+
+    # ------------------------------------
+    # Keeping up with the dataset
+    # ------------------------------------
+    def sync(self, paths: Optional[list] = None) -> int:
+        """Append the accepted reports written since the last sync; returns how many were added.
+        Rebuilds the store if the file it last read is no longer among `paths`."""
+        with self._locked():
+            paths = paths if paths is not None else dataset.report_files("accepted")
+            stats = []
+            for path in paths:
+                try:
+                    stats.append((path, os.stat(path)))
+                except FileNotFoundError:
+                    continue
+            if not stats:
+                return 0
+            dev, ino, offset = self._source
+            start = next((i for i, (_, st) in enumerate(stats) if (st.st_dev, st.st_ino) == (dev, ino)), None)
+            if start is None or stats[start][1].st_size < offset:
+                if self._count:
+                    print(f"[WARNING] Dataset files changed since {self.path} was written, rebuilding it")
+                self._create()
+                start, offset = 0, 0
+            added = 0
+            for i, (path, st) in enumerate(stats[start:], start):
+                chunk, position = [], offset if i == start else 0
+                with open(path, "rb") as f:
+                    f.seek(position)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # partially written line: next sync
+                        position += len(line)
+                        try:
+                            report = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if isinstance(report, dict) and dataset.is_accepted(report):
+                            chunk.append(encode(report))
+                self._append(b"".join(chunk), len(chunk), (st.st_dev, st.st_ino, position))
+                added += len(chunk)
+            return added
+
+    def on_report_saved(self, report: dict, line):
+        """dataset.save_report listener: append our own saves directly when they continue where we
+        stopped; otherwise (another process appended in between, or already synced past us) catch up."""
+        with self._locked():
+            dev, ino, offset = self._source
+            if (line.device, line.inode) == (dev, ino) and line.start == offset:
+                if dataset.is_accepted(report):
+                    self._append(encode(report), 1, (dev, ino, line.end))
+                else:
+                    self._append(b"", 0, (dev, ino, line.end))
+            elif dataset.is_accepted(report):
+                self.sync()
+
+    # ------------------------------------
+    # Vectorized queries (return record positions)
+    # ------------------------------------
+    def find_text(self, user_id, description: str, category: str) -> np.ndarray:
+        records = self.records()
+        return np.flatnonzero((records["user"] == user_fingerprint(user_id))
+                              & (records["text"] == text_fingerprint(description))
+                              & (records["category"] == category_code(category)))
+
+    def similar_images(self, image_hash: str, max_distance: int = 0) -> tuple:
+        """(positions, distances) of records whose pHash is within max_distance bits, nearest first."""
+        value = parse_hash(image_hash)
+        records = self.records()
+        if value is None or not len(records):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+        distances = _popcount(records["phash"] ^ np.uint64(value))
+        positions = np.flatnonzero(((records["flags"] & HAS_PHASH) != 0) & (distances <= max_distance))
+        order = np.argsort(distances[positions], kind="stable")
+        return positions[order], distances[positions][order]
+
+    def nearby(self, lat: float, lon: float, radius_m: float, category: Optional[str] = None) -> tuple:
+        """(positions, distances_m) of records within radius_m of (lat, lon), nearest first."""
+        records = self.records()
+        if not len(records):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        distances = distances_to(lat, lon, records["lat"], records["lon"])
+        mask = distances <= radius_m  # NaN coordinates compare False
+        if category is not None:
+            mask &= records["category"] == category_code(category)
+        positions = np.flatnonzero(mask)
+        order = np.argsort(distances[positions], kind="stable")
+        return positions[order], distances[positions][order]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[ReportStore]:
+    """The process-wide store at REPORT_STORE_PATH, synced and following this process's saves;
+    None unless REPORT_STORE=1 (and with DATASET_BACKEND=sqlite, which has no JSONL files to follow)."""
+    global _store
+    if not REPORT_STORE or dataset.DATASET_BACKEND == "sqlite":
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = ReportStore(REPORT_STORE_PATH)
+                added = store.sync()
+                dataset.add_save_listener(store.on_report_saved)
+                print(f"[INIT] Report store {REPORT_STORE_PATH}: {len(store)} records ({added} added on open)")
+                _store = store
+    return _store
+
+
+def _reset_after_fork():
+    """A forked child keeps the store and its save listener, not locks held by the parent's threads."""
+    global _store_lock
+    _store_lock = threading.Lock()
+    if _store is not None:
+        _store._lock = threading.RLock()
+        _store._lock_depth = 0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the binary report store from the dataset")
+    parser.add_argument("command", choices=["convert"])
+    parser.add_argument("--output", default=str(REPORT_STORE_PATH))
+    args = parser.parse_args()
+    store = ReportStore(Path(args.output))
+    added = store.sync()
+    print(f"{args.output}: {len(store)} records ({added} added), {os.path.getsize(args.output)} bytes")
@@ -0,0 +1,95 @@
+"""
+Re-score stored or imported report descriptions with the current text rules.
+
+Reads a JSONL file of reports (data/dataset.jsonl by default, or any export
+with a "description" field), runs text_rules.analyze_batch over all
+descriptions and reports throughput plus how many stored categories and
+urgencies the current rules would change. With --output, writes every record
+back out with the re-scored text fields added:
+
+    text_category, text_confidence, text_urgency, text_abusive
+
+The input file is never modified. Stored "category"/"confidence" may include
+the CLIP image adjustment, so a differing text_category is not necessarily a
+change in the final decision.
+
+    python -m app.rescore
+    python -m app.rescore exports/history.jsonl --processes 4 --output rescored.jsonl
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+from app.text_rules import BATCH_CHUNK_SIZE, iter_analyze_batch
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to ml-backend-with-image/
+DEFAULT_INPUT = BASE_DIR / "data" / "dataset.jsonl"
+
+
+def read_records(path: Path) -> list:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"[WARNING] Skipping malformed line {line_number} of {path}")
+    return records
+
+
+def rescore(records: list, processes: int = 0, chunk_size: int = BATCH_CHUNK_SIZE) -> dict:
+    """Add text_* fields to every record in place; returns counts and timing."""
+    start = time.perf_counter()
+    descriptions = (record.get("description") or "" for record in records)
+    category_changed = urgency_changed = abusive = 0
+    for record, analysis in zip(records, iter_analyze_batch(descriptions, processes, chunk_size)):
+        record["text_category"] = analysis.category
+        record["text_confidence"] = round(analysis.confidence, 2)
+        record["text_urgency"] = analysis.urgency
+        record["text_abusive"] = analysis.abusive
+        category_changed += "category" in record and record["category"] != analysis.category
+        urgency_changed += "urgency" in record and record["urgency"] != analysis.urgency
+        abusive += analysis.abusive
+    elapsed = time.perf_counter() - start
+    return {
+        "records": len(records),
+        "seconds": elapsed,
+        "per_second": len(records) / elapsed if elapsed > 0 else float("inf"),
+        "category_changed": category_changed,
+        "urgency_changed": urgency_changed,
+        "abusive": abusive,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", default=str(DEFAULT_INPUT), help="JSONL file of reports")
+    parser.add_argument("--output", help="write re-scored records to this JSONL file")
+    parser.add_argument("--processes", type=int, default=0, help="worker processes (0: analyze in this process)")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    records = read_records(Path(args.input))
+    stats = rescore(records, processes=args.processes, chunk_size=args.chunk_size)
+    print(f"Re-scored {stats['records']} descriptions in {stats['seconds']:.2f}s "
+          f"({stats['per_second']:,.0f}/s, processes={args.processes})")
+    print(f"  category differs from stored: {stats['category_changed']}")
+    print(f"  urgency differs from stored:  {stats['urgency_changed']}")
+    print(f"  abusive:                      {stats['abusive']}")
+
+    if args.output:
+        tmp_path = f"{args.output}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, args.output)
+        print(f"Wrote {len(records)} records to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Bounded LRU cache with per-entry TTL, counters and optional JSON persistence.
+
+Used by image_classifier to remember CLIP results per image digest, so a
+photo that is resubmitted (after a rejection or an edit) skips decoding and
+the forward pass. Entries are stamped with wall-clock time so the TTL still
+holds after a reload from disk. Values must be JSON-serializable when
+persistence is enabled.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+class ResultCache:
+    """Thread-safe LRU mapping str -> value, with at most max_entries entries each living ttl_seconds."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400, path: Optional[Path] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = Path(path) if path else None
+        self._entries = OrderedDict()  # key -> (stored_at, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if self.path is not None:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str):
+        """Cached value for key, or None on a miss (absent or expired)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "expirations": self.expirations, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+    def save(self):
+        """Write unexpired entries to self.path (atomically, via a temp file and rename)."""
+        if self.path is None:
+            return
+        with self._lock:
+            now = time.time()
+            rows = [[key, stored_at, value] for key, (stored_at, value) in self._entries.items()
+                    if now - stored_at <= self.ttl_seconds]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf8") as f:
+                json.dump(rows, f)
+            os.replace(tmp, self.path)
+            print(f"[DEBUG] Saved {len(rows)} cache entries to {self.path}")
+        except Exception as e:
+            print(f"[ERROR] Failed to save cache to {self.path}: {str(e)}")
+
+    def load(self):
+        """Load unexpired entries from self.path (missing or unreadable files leave the cache empty)."""
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, encoding="utf8") as f:
+                rows = json.load(f)
+        except Exception as e:
+            print(f"[WARNING] Ignoring unreadable cache file {self.path}: {str(e)}")
+            return
+        now = time.time()
+        with self._lock:
+            # Rows are saved least recently used first; keep only the newest max_entries
+            for key, stored_at, value in rows[-self.max_entries:] if self.max_entries > 0 else []:
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries[key] = (stored_at, value)
+        print(f"[INIT] Loaded {len(self._entries)} cache entries from {self.path}")
@@ -0,0 +1,334 @@
+"""
+Segmented report log: separate accepted/rejected streams, rotation and compaction.
+
+With DATASET_LAYOUT=segmented, dataset.save_report appends accepted and
+rejected reports to two streams under DATASET_DIR instead of one
+dataset.jsonl. Each stream is a sequence of JSONL segment files:
+
+    data/segments/
+        manifest.json
+        accepted-000001.jsonl      closed
+        accepted-000002.jsonl      active (receives appends)
+        rejected-000001.jsonl      active
+
+The active segment of a stream is closed and a new one started once it
+reaches DATASET_SEGMENT_MAX_BYTES or is DATASET_SEGMENT_MAX_AGE_S old (checked
+on the next append). Closed segments are never written again. manifest.json
+lists every stream's segments in order and is replaced atomically; changes
+are serialized with an flock on manifest.lock, so the compaction tool and
+several server processes can share the directory. Writers append under an
+flock on the segment itself and closing a segment takes that lock too, so no
+process appends to a segment after another one closed it.
+
+Readers only open what they need: the report index reads the accepted stream
+and never sees a rejected line.
+
+Compaction merges a stream's closed segments into one. For the accepted
+stream it also keeps only DEDUP_FIELDS by default, the fields duplicate
+detection reads.
+
+    python -m app.segment_log import data/dataset.jsonl     # split an existing single-file dataset
+    python -m app.segment_log status
+    python -m app.segment_log compact accepted
+    python -m app.segment_log compact rejected --all-fields
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # not on Linux/macOS: in-process locking only
+    fcntl = None
+
+STREAMS = ("accepted", "rejected")
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "manifest.lock"
+
+# What report_index reads from an accepted report (see report_index._to_indexed and is_accepted)
+DEDUP_FIELDS = ("report_id", "user_id", "description", "category", "image_hash", "image_url",
+                "latitude", "longitude", "status", "accept")
+
+
+def _empty_manifest() -> dict:
+    return {"version": 1, "next_seq": {stream: 1 for stream in STREAMS}, "streams": {stream: [] for stream in STREAMS}}
+
+
+class SegmentLog:
+    """Segment files and manifest of one log directory."""
+
+    def __init__(self, directory: Path, max_bytes: int = 64 * 1024 * 1024, max_age_s: float = 86400):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.manifest_path = self.directory / MANIFEST_FILE
+        self._lock = threading.RLock()
+        self._manifest = None
+        self._signature = None
+
+    # ------------------------------------
+    # Manifest
+    # ------------------------------------
+    @contextmanager
+    def _locked(self):
+        """Serialize manifest changes within this process and, with fcntl, across processes."""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(self.directory / LOCK_FILE, "a+b") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def signature(self):
+        """Changes whenever the manifest file is replaced (one stat)."""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def manifest(self) -> dict:
+        """Current manifest, re-read only when the file changed."""
+        with self._lock:
+            signature = self.signature()
+            if self._manifest is None or signature != self._signature:
+                if signature is None:
+                    self._manifest = _empty_manifest()
+                else:
+                    with open(self.manifest_path, encoding="utf8") as f:
+                        self._manifest = json.load(f)
+                self._signature = signature
+            return self._manifest
+
+    def _write_manifest(self, manifest: dict):
+        tmp = self.manifest_path.with_name(f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf8") as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_path)
+        self._manifest = manifest
+        self._signature = self.signature()
+
+    def segments(self, stream: str) -> list:
+        """Segment paths of a stream, oldest first (the last one may be active)."""
+        return [self.directory / entry["name"] for entry in self.manifest()["streams"][stream]]
+
+    # ------------------------------------
+    # Appends and rotation
+    # ------------------------------------
+    def _needs_rotation(self, entry: dict) -> bool:
+        try:
+            size = os.stat(self.directory / entry["name"]).st_size
+        except FileNotFoundError:
+            return False
+        if size == 0:
+            return False
+        return size >= self.max_bytes or time.time() - entry["created_at"] >= self.max_age_s
+
+    def active_path(self, stream: str) -> Path:
+        """Segment that appends to stream should go to, starting a new one if the active
+        segment is full or too old. Called by the dataset writer before every group."""
+        entries = self.manifest()["streams"][stream]
+        if entries and entries[-1].get("closed_at") is None and not self._needs_rotation(entries[-1]):
+            return self.directory / entries[-1]["name"]
+        with self._locked(), ExitStack() as stack:
+            manifest = self.manifest()  # re-read under the lock: another process may have rotated
+            entries = manifest["streams"][stream]
+            if entries and entries[-1].get("closed_at") is None:
+                if not self._needs_rotation(entries[-1]):
+                    return self.directory / entries[-1]["name"]
+                self._close(entries[-1], stack)
+            seq = manifest["next_seq"][stream]
+            manifest["next_seq"][stream] = seq + 1
+            name = f"{stream}-{seq:06d}.jsonl"
+            entries.append({"name": name, "first_seq": seq, "last_seq": seq, "created_at": time.time(),
+                            "closed_at": None, "bytes": None, "compacted": False})
+            (self.directory / name).touch()
+            self._write_manifest(manifest)
+            if len(entries) > 1:
+                print(f"[DEBUG] Rotated {stream} stream to {name}")
+            return self.directory / name
+
+    def is_active(self, stream: str, path: Path) -> bool:
+        """True if path is still the active segment of stream (one stat of the manifest).
+        Writers check this while holding the segment's lock, after which it cannot change."""
+        # Not through manifest(): its in-process lock is held by a rotation that waits for our segment lock
+        manifest = self._manifest
+        if manifest is None or self.signature() != self._signature:
+            try:
+                with open(self.manifest_path, encoding="utf8") as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                return False
+        entries = manifest["streams"][stream]
+        return bool(entries) and entries[-1].get("closed_at") is None and entries[-1]["name"] == Path(path).name
+
+    def _close(self, entry: dict, stack: ExitStack):
+        """Mark entry closed. Takes the segment's append lock (released by `stack` after the
+        manifest is written), so no writer of another process appends to it afterwards."""
+        path = self.directory / entry["name"]
+        if fcntl is not None and path.exists():
+            segment = stack.enter_context(open(path, "ab"))
+            fcntl.flock(segment.fileno(), fcntl.LOCK_EX)
+        entry["closed_at"] = time.time()
+        try:
+            entry["bytes"] = os.stat(path).st_size
+        except FileNotFoundError:
+            entry["bytes"] = 0
+
+    def rotate(self, stream: str):
+        """Close the active segment of stream now (the next append starts a new one)."""
+        with self._locked(), ExitStack() as stack:
+            manifest = self.manifest()
+            entries = manifest["streams"][stream]
+            if entries and entries[-1].get("closed_at") is None:
+                self._close(entries[-1], stack)
+                self._write_manifest(manifest)
+
+    # ------------------------------------
+    # Compaction
+    # ------------------------------------
+    def compact(self, stream: str, fields: Optional[tuple] = None) -> Optional[Path]:
+        """
+        Merge the closed segments of stream into one segment, keeping only
+        `fields` of every record if given. The merge runs without the lock
+        (closed segments never change); only the manifest swap takes it.
+        Returns the new segment path, or None if there was nothing to do.
+        """
+        with self._locked():
+            closed = [dict(entry) for entry in self.manifest()["streams"][stream] if entry.get("closed_at") is not None]
+        if not closed or (len(closed) == 1 and (fields is None or closed[0].get("compacted"))):
+            print(f"[DEBUG] Nothing to compact in the {stream} stream")
+            return None
+
+        first, last = closed[0]["first_seq"], closed[-1]["last_seq"]
+        name = f"{stream}-{first:06d}-{last:06d}.jsonl"
+        target = self.directory / name
+        tmp = self.directory / f"{name}.tmp"
+        records = 0
+        with open(tmp, "wb") as out:
+            for entry in closed:
+                with open(self.directory / entry["name"], "rb") as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            continue
+                        if fields is not None:
+                            try:
+                                report = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            line = (json.dumps({k: report[k] for k in fields if k in report},
+                                               ensure_ascii=False) + "\n").encode("utf8")
+                        out.write(line)
+                        records += 1
+            out.flush()
+            os.fsync(out.fileno())
+
+        with self._locked():
+            manifest = self.manifest()
+            entries = manifest["streams"][stream]
+            names = [entry["name"] for entry in closed]
+            if [entry["name"] for entry in entries[:len(names)]] != names:
+                os.remove(tmp)
+                print(f"[WARNING] {stream} segments changed during compaction, nothing replaced")
+                return None
+            os.replace(tmp, target)
+            manifest["streams"][stream] = [{
+                "name": name, "first_seq": first, "last_seq": last, "created_at": closed[0]["created_at"],
+                "closed_at": time.time(), "bytes": target.stat().st_size, "compacted": True,
+                "records": records, "fields": list(fields) if fields is not None else None,
+            }] + entries[len(names):]
+            self._write_manifest(manifest)
+        for entry in closed:
+            if entry["name"] != name:
+                try:
+                    os.remove(self.directory / entry["name"])
+                except FileNotFoundError:
+                    pass
+        print(f"[DEBUG] Compacted {len(closed)} {stream} segment(s) into {name} ({records} records)")
+        return target
+
+    # ------------------------------------
+    # Migration from a single dataset.jsonl
+    # ------------------------------------
+    def import_jsonl(self, path: Path) -> dict:
+        """Append every report of a single-file dataset to the matching stream; returns counts per stream."""
+        from app.dataset import is_accepted
+        counts = {stream: 0 for stream in STREAMS}
+        files = {}
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        report = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if not line.endswith(b"\n"):
+                        line += b"\n"
+                    stream = "accepted" if isinstance(report, dict) and is_accepted(report) else "rejected"
+                    target = self.active_path(stream)
+                    if stream not in files or files[stream].name != str(target):
+                        if stream in files:
+                            files[stream].close()
+                        files[stream] = open(str(target), "ab")
+                    files[stream].write(line)
+                    files[stream].flush()
+                    counts[stream] += 1
+        finally:
+            for f in files.values():
+                os.fsync(f.fileno())
+                f.close()
+        return counts
+
+    def status(self) -> dict:
+        manifest = self.manifest()
+        status = {}
+        for stream in STREAMS:
+            entries = manifest["streams"][stream]
+            sizes = []
+            for entry in entries:
+                try:
+                    sizes.append(os.stat(self.directory / entry["name"]).st_size)
+                except FileNotFoundError:
+                    sizes.append(0)
+            status[stream] = {"segments": len(entries), "bytes": sum(sizes),
+                              "active": entries[-1]["name"] if entries and entries[-1].get("closed_at") is None else None}
+        return status
+
+
+if __name__ == "__main__":
+    from app import dataset
+
+    parser = argparse.ArgumentParser(description="Manage the segmented report log (DATASET_DIR)")
+    parser.add_argument("--dir", default=str(dataset.DATASET_DIR))
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="split a single-file dataset into accepted/rejected segments")
+    importer.add_argument("path", nargs="?", default=str(dataset.DATA_FILE))
+    commands.add_parser("status", help="segments and bytes per stream")
+    compactor = commands.add_parser("compact", help="merge closed segments of a stream")
+    compactor.add_argument("stream", choices=STREAMS)
+    compactor.add_argument("--all-fields", action="store_true",
+                           help="keep every field (default for rejected; accepted keeps only DEDUP_FIELDS)")
+    args = parser.parse_args()
+
+    log = SegmentLog(Path(args.dir), dataset.DATASET_SEGMENT_MAX_BYTES, dataset.DATASET_SEGMENT_MAX_AGE_S)
+    if args.command == "import":
+        print(f"Imported {log.import_jsonl(Path(args.path))} into {args.dir}")
+    elif args.command == "status":
+        print(json.dumps(log.status(), indent=1))
+    else:
+        keep = None if args.all_fields or args.stream == "rejected" else DEDUP_FIELDS
+        log.compact(args.stream, fields=keep)
@@ -0,0 +1,368 @@
+"""
+SQLite storage backend for reports (DATASET_BACKEND=sqlite).
+
+Every saved report is one row of a SQLite database in WAL mode
+(DATASET_SQLITE_PATH, default data/reports.db). The full report is kept as
+JSON next to the columns duplicate detection queries, each with a partial
+index over accepted reports:
+
+    reports_text       (user_key, description_key, category_key)  exact text duplicates
+    reports_phash      (phash)                                    exact image hash
+    reports_phash_a/b/c  the three pHash substrings of app.phash_index, probed
+                       with bit-flip variants for Hamming-radius searches
+    reports_image_url  (image_url_key)                            normalized image URL
+    reports_category   (category_key)
+    reports_cell       (cell_row, cell_col)                       app.geo grid cell, for radius queries
+
+SQLiteReportStore answers the same queries as app.report_index.ReportIndex
+(report_index.get_index() returns it with this backend), so every duplicate
+check in storage.py becomes an indexed query. Nothing is loaded at startup,
+and WAL lets the server's worker processes read while one of them writes.
+
+DATASET_DURABILITY maps to PRAGMA synchronous: batch -> FULL, interval ->
+NORMAL, none -> OFF.
+
+Migration of an existing JSONL dataset (single file or both segment streams):
+
+    python -m app.sqlite_store import [dataset.jsonl ...] [--db data/reports.db]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app import dataset
+from app.geo import GRID_CELL_DEGREES, cell_of, cell_ranges, distances_to
+from app.phash_index import CHUNK_WIDTHS, HASH_BITS, _variant_masks, hamming, parse_hash
+from app.report_index import IndexedReport, normalize_image_url, text_key
+
+SYNCHRONOUS = {"batch": "FULL", "interval": "NORMAL", "none": "OFF"}
+IMPORT_BATCH_SIZE = 10000
+MAX_SQL_PARAMS = 900  # stay below SQLITE_MAX_VARIABLE_NUMBER of older builds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id              INTEGER PRIMARY KEY,
+    report_id       TEXT,
+    accepted        INTEGER NOT NULL,
+    user_key        TEXT,
+    description_key TEXT,
+    category_key    TEXT,
+    description     TEXT,
+    image_hash      TEXT,
+    phash           INTEGER,
+    phash_a         INTEGER,
+    phash_b         INTEGER,
+    phash_c         INTEGER,
+    image_url       TEXT,
+    image_url_key   TEXT,
+    latitude        REAL,
+    longitude       REAL,
+    cell_row        INTEGER,
+    cell_col        INTEGER,
+    report          TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_text ON reports(user_key, description_key, category_key) WHERE accepted = 1;
+CREATE INDEX IF NOT EXISTS reports_phash ON reports(phash) WHERE accepted = 1;
+CREATE INDEX IF NOT EXISTS reports_image_hash ON reports(image_hash) WHERE accepted = 1 AND phash IS NULL;
+CREATE INDEX IF NOT EXISTS reports_phash_a ON reports(phash_a) WHERE accepted = 1;
+CREATE INDEX IF NOT EXISTS reports_phash_b ON reports(phash_b) WHERE accepted = 1;
+CREATE INDEX IF NOT EXISTS reports_phash_c ON reports(phash_c) WHERE accepted = 1;
+CREATE INDEX IF NOT EXISTS reports_image_url ON reports(image_url_key) WHERE accepted = 1;
+CREATE INDEX IF NOT EXISTS reports_category ON reports(category_key) WHERE accepted = 1;
+CREATE INDEX IF NOT EXISTS reports_cell ON reports(cell_row, cell_col) WHERE accepted = 1;
+CREATE TABLE IF NOT EXISTS counts (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO counts VALUES ('accepted', 0);
+CREATE TRIGGER IF NOT EXISTS reports_count_accepted AFTER INSERT ON reports WHEN new.accepted = 1
+BEGIN
+    UPDATE counts SET value = value + 1 WHERE name = 'accepted';
+END;
+"""
+
+INSERT = """INSERT INTO reports (report_id, accepted, user_key, description_key, category_key, description,
+    image_hash, phash, phash_a, phash_b, phash_c, image_url, image_url_key, latitude, longitude, cell_row, cell_col,
+    report) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+INDEXED_COLUMNS = "id, report_id, user_key, description, category_key, image_hash, image_url, latitude, longitude"
+
+# (shift, mask) of the pHash substrings, as in phash_index.MultiIndexHash
+_CHUNKS = []
+_shift = HASH_BITS
+for _width in CHUNK_WIDTHS:
+    _shift -= _width
+    _CHUNKS.append((_shift, (1 << _width) - 1, _width))
+
+
+def _signed64(value: int) -> int:
+    """SQLite integers are signed 64-bit."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_float(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row(report: dict, line: str) -> tuple:
+    user_key, description_key, category_key = text_key(report.get("user_id"), report.get("description"),
+                                                       report.get("category"))
+    image_hash = report.get("image_hash")
+    image_hash = str(image_hash).strip() if image_hash is not None else None
+    phash = parse_hash(image_hash)
+    bands = [(phash >> shift) & mask if phash is not None else None for shift, mask, _ in _CHUNKS]
+    image_url = report.get("image_url") or None
+    try:
+        image_url_key = normalize_image_url(image_url) if image_url else None
+    except Exception:
+        image_url_key = None
+    lat, lon = _to_float(report.get("latitude")), _to_float(report.get("longitude"))
+    row, col = cell_of(lat, lon) if lat is not None and lon is not None else (None, None)
+    return (str(report.get("report_id", "unknown")), 1 if dataset.is_accepted(report) else 0,
+            user_key, description_key, category_key, (report.get("description") or "").strip().lower(),
+            image_hash, _signed64(phash) if phash is not None else None, *bands,
+            image_url, image_url_key, lat, lon, row, col, line)
+
+
+def _indexed(row) -> IndexedReport:
+    return IndexedReport(*row[1:])
+
+
+class SQLiteReportStore:
+    """Reports in a SQLite database, with the query interface of report_index.ReportIndex."""
+
+    def __init__(self, path: Path, durability: str = "batch"):
+        self.path = Path(path)
+        self.synchronous = SYNCHRONOUS.get(durability, "FULL")
+        self._local = threading.local()
+        self._readers = []  # every reader connection, whichever thread opened it
+        self._readers_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._write_lock:
+            self._writer_connection().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    def _reader(self) -> sqlite3.Connection:
+        """One connection per thread for queries (WAL readers never block the writer)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn not in self._readers:  # closed by close() since this thread opened it
+            conn = self._local.conn = self._connect()
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def close(self):
+        """Close the writer and the reader connections of every thread."""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        self._local.conn = None
+
+    # ------------------------------------
+    # Writes
+    # ------------------------------------
+    def save(self, report: dict, line: Optional[str] = None) -> int:
+        """Insert one report (line: its JSON, if already serialized); returns the row id."""
+        row = _row(report, line if line is not None else json.dumps(report, ensure_ascii=False))
+        with self._write_lock:
+            return self._writer_connection().execute(INSERT, row).lastrowid
+
+    def save_many(self, reports) -> int:
+        """Insert reports in one transaction; returns how many were inserted."""
+        rows = [_row(report, json.dumps(report, ensure_ascii=False)) for report in reports]
+        with self._write_lock:
+            conn = self._writer_connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(INSERT, rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def import_jsonl(self, paths: list) -> int:
+        """Insert every report of the given JSONL files, in order; returns how many were imported."""
+        imported, batch = 0, []
+        for path in paths:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        report = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if not isinstance(report, dict):
+                        continue
+                    batch.append(report)
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        imported += self.save_many(batch)
+                        batch = []
+        if batch:
+            imported += self.save_many(batch)
+        return imported
+
+    def row_count(self) -> int:
+        """All stored reports, accepted or not."""
+        return self._reader().execute("SELECT count(*) FROM reports").fetchone()[0]
+
+    # ------------------------------------
+    # ReportIndex interface
+    # ------------------------------------
+    def refresh(self):
+        """Nothing to do: every query sees the rows committed so far, by any process."""
+
+    def __len__(self) -> int:
+        return self._reader().execute("SELECT value FROM counts WHERE name = 'accepted'").fetchone()[0]
+
+    def _select(self, where: str, params=()) -> list:
+        return self._reader().execute(
+            f"SELECT {INDEXED_COLUMNS} FROM reports WHERE accepted = 1 AND {where} ORDER BY id", params).fetchall()
+
+    def reports(self) -> list:
+        """All accepted reports, oldest first."""
+        return [_indexed(row) for row in self._select("1")]
+
+    def has_text_duplicate(self, user_id, description: str, category: str) -> bool:
+        return self._reader().execute(
+            "SELECT 1 FROM reports WHERE accepted = 1 AND user_key = ? AND description_key = ? AND category_key = ? "
+            "LIMIT 1", text_key(user_id, description, category)).fetchone() is not None
+
+    def find_by_image_hash(self, image_hash: str) -> list:
+        value = parse_hash(image_hash)
+        if value is None:
+            # Not a 64-bit pHash: exact string match, as the report index does
+            key = str(image_hash).strip() if image_hash is not None else ""
+            return [_indexed(row) for row in self._select("phash IS NULL AND image_hash = ?", (key,))] if key else []
+        return [_indexed(row) for row in self._select("phash = ?", (_signed64(value),))]
+
+    def find_similar_images(self, image_hash: str, max_distance: int) -> list:
+        """[(report, hamming_distance), ...] within max_distance bits, nearest first.
+
+        Probes each substring index with the variants the pigeonhole argument of
+        app.phash_index requires, then verifies candidates with an exact popcount.
+        """
+        value = parse_hash(image_hash)
+        if value is None or max_distance <= 0:
+            return [(report, 0) for report in self.find_by_image_hash(image_hash)]
+        max_flips = max_distance // len(_CHUNKS)
+        candidates = {}
+        for column, (shift, mask, width) in zip(("phash_a", "phash_b", "phash_c"), _CHUNKS):
+            chunk = (value >> shift) & mask
+            variants = [chunk ^ flip for flip in _variant_masks(width, max_flips)]
+            for start in range(0, len(variants), MAX_SQL_PARAMS):
+                part = variants[start:start + MAX_SQL_PARAMS]
+                for row in self._reader().execute(
+                        f"SELECT {INDEXED_COLUMNS}, phash FROM reports WHERE accepted = 1 "
+                        f"AND {column} IN ({','.join('?' * len(part))})", part):
+                    candidates[row[0]] = row
+        matches = []
+        for row_id, row in sorted(candidates.items()):
+            distance = hamming(value, row[-1] & ((1 << 64) - 1))
+            if distance <= max_distance:
+                matches.append((_indexed(row[:-1]), distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+    def find_by_image_url(self, image_url: str) -> list:
+        return [_indexed(row) for row in self._select("image_url_key = ?", (normalize_image_url(image_url),))]
+
+    def nearby(self, lat: float, lon: float, radius_m: float) -> list:
+        """[(report, distance_m), ...] for accepted reports within radius_m of (lat, lon), nearest first."""
+        row_lo, row_hi, col_range = cell_ranges(lat, lon, radius_m, GRID_CELL_DEGREES)
+        min_column = int(np.floor(-180.0 / GRID_CELL_DEGREES))
+        max_column = min_column + int(round(360.0 / GRID_CELL_DEGREES)) - 1
+        if col_range is not None and min_column <= col_range[0] and col_range[1] <= max_column:
+            rows = self._select("cell_row BETWEEN ? AND ? AND cell_col BETWEEN ? AND ?", (row_lo, row_hi, *col_range))
+        else:
+            # Crosses the antimeridian or reaches a pole: the row band alone bounds the candidates
+            rows = self._select("cell_row BETWEEN ? AND ?", (row_lo, row_hi))
+        if not rows:
+            return []
+        lats = np.fromiter((row[7] for row in rows), dtype=np.float64, count=len(rows))
+        lons = np.fromiter((row[8] for row in rows), dtype=np.float64, count=len(rows))
+        distances = distances_to(lat, lon, lats, lons)
+        inside = np.flatnonzero(distances <= radius_m)
+        inside = inside[np.argsort(distances[inside], kind="stable")]
+        return [(_indexed(rows[i]), float(distances[i])) for i in inside]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SQLiteReportStore:
+    """The process-wide store at dataset.DATASET_SQLITE_PATH, created on first use."""
+    global _store
+    if _store is None or _store.path != dataset.DATASET_SQLITE_PATH:
+        with _store_lock:
+            if _store is None or _store.path != dataset.DATASET_SQLITE_PATH:
+                _store = SQLiteReportStore(dataset.DATASET_SQLITE_PATH, dataset.DATASET_DURABILITY)
+                print(f"[INIT] SQLite report store {_store.path}: {len(_store)} accepted reports")
+    return _store
+
+
+def close_store():
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+
+def _reset_after_fork():
+    """SQLite connections must not cross fork(): a child opens its own on first use."""
+    global _store, _store_lock
+    _store = None
+    _store_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import JSONL reports into the SQLite report store")
+    parser.add_argument("command", choices=["import"])
+    parser.add_argument("paths", nargs="*", help="JSONL files (default: the current JSONL dataset, both streams)")
+    parser.add_argument("--db", default=str(dataset.DATASET_SQLITE_PATH))
+    parser.add_argument("--force", action="store_true", help="import even if the database already has reports")
+    args = parser.parse_args()
+
+    if args.paths:
+        paths = [Path(p) for p in args.paths]
+    elif dataset.DATASET_LAYOUT == "segmented":
+        paths = dataset.report_files("accepted") + dataset.report_files("rejected")
+    else:
+        paths = [dataset.DATA_FILE]
+    store = SQLiteReportStore(Path(args.db), dataset.DATASET_DURABILITY)
+    if store.row_count() and not args.force:
+        raise SystemExit(f"{args.db} already holds {store.row_count()} reports; use --force to import anyway")
+    imported = store.import_jsonl(paths)
+    print(f"Imported {imported} reports from {len(paths)} file(s) into {args.db} ({len(store)} accepted)")
+    store.close()
@@ -1,38 +1,13 @@
-from PIL import Image
-import imagehash
-import requests
-import io
-import json
-from pathlib import Path
-from math import radians, cos, sin, asin, sqrt
+# haversine lives in app.geo (shared with the spatial index); re-exported here for existing callers
+from app.geo import haversine
 
-# Import dataset module to access the dataset file
-from app import dataset
-
-def _load_accepted_reports():
-    """Load all accepted reports from dataset.jsonl."""
-    try:
-        if not dataset.DATA_FILE.exists():
-            return []
-        
-        accepted_reports = []
-        with dataset.DATA_FILE.open("r", encoding="utf8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    report = json.loads(line)
-                    # Only include accepted reports
-                    if report.get("status") == "accepted" and report.get("accept") is True:
-                        accepted_reports.append(report)
-                except json.JSONDecodeError:
-                    continue  # Skip invalid JSON lines
-        
-        return accepted_reports
-    except Exception as e:
-        print(f"[ERROR] Failed to load accepted reports from dataset: {str(e)}")
-        return []
+# Accepted reports are served from an in-memory index that follows dataset.jsonl
+# (or from the SQLite store with DATASET_BACKEND=sqlite)
+from app.report_index import get_index
+# With REPORT_STORE=1 the exact-text and image-hash checks scan the memory-mapped report store
+from app.report_store import get_store
+from app.report_context import ReportContext, duplicate_threshold
+from app.text_rules import analyze_text, text_similarity
 
 
 def is_duplicate(user_id: str, description: str, category: str, store: bool = True) -> bool:
@@ -44,26 +19,16 @@ def is_duplicate(user_id: str, description: str, category: str, store: bool = Tr
     Note: store parameter is kept for compatibility but doesn't do anything (data is stored via dataset.save_report).
     """
     try:
-        # Normalize the description - remove extra whitespace
-        normalized_desc = " ".join(description.strip().lower().split())
-        user_id_normalized = (user_id or "anon").lower()
-        category_normalized = category.lower()
-        
-        # Load all accepted reports from dataset
-        accepted_reports = _load_accepted_reports()
-        
-        # Check each accepted report
-        for report in accepted_reports:
-            report_user_id = (report.get("user_id") or "anon").lower()
-            report_desc = " ".join((report.get("description") or "").strip().lower().split())
-            report_category = (report.get("category") or "").lower()
-            
-            # Check for exact match
-            if (report_user_id == user_id_normalized and 
-                report_desc == normalized_desc and 
-                report_category == category_normalized):
-                print(f"[DEBUG] Text duplicate found in dataset: user_id={user_id_normalized}, category={category}")
-                return True
+        store = get_store()
+        if store is not None:
+            # Vectorized compare of the (user, description, category) fingerprints
+            duplicate = len(store.find_text(user_id, description, category)) > 0
+        else:
+            # Constant-time lookup on (normalized user, normalized description, category)
+            duplicate = get_index().has_text_duplicate(user_id, description, category)
+        if duplicate:
+            print(f"[DEBUG] Text duplicate found in dataset: user_id={(user_id or 'anon').lower()}, category={category}")
+            return True
         
         return False
     except Exception as e:
@@ -87,52 +52,23 @@ def is_duplicate_image(image_url: str, threshold: int = 0, store: bool = True) -
     try:
         # Step 1: Quick URL-based check (exact match) - check dataset for image URLs
         try:
-            from urllib.parse import urlparse, urlunparse
-            parsed = urlparse(image_url)
-            normalized_url = urlunparse((parsed.scheme, parsed.netloc, parsed.path, '', '', ''))
-            
-            # Load accepted reports and check for URL match
-            accepted_reports = _load_accepted_reports()
-            for report in accepted_reports:
-                # Check if report has image_url stored
-                report_image_url = report.get("image_url")
-                if report_image_url:
-                    try:
-                        report_parsed = urlparse(report_image_url)
-                        report_normalized = urlunparse((report_parsed.scheme, report_parsed.netloc, report_parsed.path, '', '', ''))
-                        if report_normalized == normalized_url:
-                            print(f"[DEBUG] Duplicate detected: Exact URL match in dataset for {normalized_url}")
-                            return True
-                    except Exception:
-                        continue
+            if get_index().find_by_image_url(image_url):
+                print(f"[DEBUG] Duplicate detected: Exact URL match in dataset for {image_url}")
+                return True
         except Exception as e:
             print(f"[WARNING] URL normalization failed: {str(e)}")
             # Continue with hash check
         
-        # Step 2: Hash-based check (only for exact matches with threshold=0)
+        # Step 2: Hash-based check (threshold widened for hashes stored from full-size decodes)
         try:
+            import requests  # only the deprecated URL path needs it
             resp = requests.get(image_url, timeout=10)
             resp.raise_for_status()
-            img = Image.open(io.BytesIO(resp.content)).convert('RGB')
-            img_hash = imagehash.phash(img)
-            img_hash_int = int(str(img_hash), 16)
+            img_hash = ReportContext(resp.content).phash  # same decode scale as uploaded images
 
-            # Load accepted reports and check for hash match
-            accepted_reports = _load_accepted_reports()
-            for report in accepted_reports:
-                report_hash = report.get("image_hash")
-                if report_hash is not None:
-                    try:
-                        if isinstance(report_hash, str):
-                            report_hash_int = int(report_hash, 16)
-                        else:
-                            report_hash_int = int(report_hash)
-                        
-                        if abs(img_hash_int - report_hash_int) == 0:
-                            print(f"[DEBUG] Duplicate detected: Exact hash match in dataset")
-                            return True
-                    except (ValueError, TypeError):
-                        continue
+            if get_index().find_similar_images(img_hash, duplicate_threshold(threshold)):
+                print(f"[DEBUG] Duplicate detected: Image hash match in dataset")
+                return True
             
             return False
         except Exception as e:
@@ -144,7 +80,7 @@ def is_duplicate_image(image_url: str, threshold: int = 0, store: bool = True) -
         return False
 
 
-def is_duplicate_image_from_bytes(image_bytes: bytes, threshold: int = 0, store: bool = True) -> bool:
+def is_duplicate_image_from_bytes(image_bytes: bytes, threshold: int = 0, store: bool = True, context: ReportContext = None) -> bool:
     """Check if an image is a duplicate using perceptual hash (pHash) from bytes.
     Works with image bytes directly (no URL required).
     Checks ACCEPTED reports from dataset.jsonl for image hashes.
@@ -152,55 +88,40 @@ def is_duplicate_image_from_bytes(image_bytes: bytes, threshold: int = 0, store:
     threshold=0 means EXACT hash match only (most strict).
     Set store=False to check without storing (for validation before acceptance).
     Note: store parameter is kept for compatibility but doesn't do anything (image hash is stored via dataset.save_report).
+    Pass the request's ReportContext as context to reuse its decoded image and hash.
     """
     if not image_bytes:
         return False
     
     try:
-        # Open image directly from bytes and compute hash
-        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        img_hash = imagehash.phash(img)
-        img_hash_str = str(img_hash)  # Keep as string for proper comparison
+        # Decode the image and compute its hash (or reuse the request's memoized hash)
+        img_hash_str = (context or ReportContext(image_bytes)).phash  # Keep as string for proper comparison
 
-        # Load all accepted reports from dataset
-        accepted_reports = _load_accepted_reports()
+        store = get_store()
+        if store is not None:
+            # Popcount of the XOR against every stored pHash, in one pass over the memory map
+            positions, distances = store.similar_images(img_hash_str, threshold)
+            print(f"[DEBUG] Checked image hash '{img_hash_str}' against {len(store)} stored reports")
+            if len(positions):
+                print(f"[DEBUG] Image duplicate detected: Hamming distance {int(distances[0])} <= threshold {threshold} (store record {int(positions[0])})")
+                return True
+            print(f"[DEBUG] Image hash '{img_hash_str}' is NOT a duplicate")
+            return False
+
+        index = get_index()
         
-        print(f"[DEBUG] Checking image hash '{img_hash_str}' against {len(accepted_reports)} accepted reports")
+        print(f"[DEBUG] Checking image hash '{img_hash_str}' against {len(index)} accepted reports")
         
-        # Check each accepted report for image hash
-        for report in accepted_reports:
-            # Check if report has image_hash stored
-            report_hash = report.get("image_hash")
-            if report_hash is not None:
-                try:
-                    # Convert report_hash to string for comparison
-                    report_hash_str = str(report_hash).strip()
-                    
-                    # For threshold=0, use exact string match (most reliable)
-                    if threshold == 0:
-                        if img_hash_str == report_hash_str:
-                            print(f"[DEBUG] Image duplicate detected: Exact hash match '{img_hash_str}' == '{report_hash_str}'")
-                            return True
-                    else:
-                        # For threshold > 0, use Hamming distance
-                        try:
-                            # Convert strings to ImageHash objects for Hamming distance
-                            img_hash_obj = imagehash.hex_to_hash(img_hash_str)
-                            report_hash_obj = imagehash.hex_to_hash(report_hash_str)
-                            hamming_dist = img_hash_obj - report_hash_obj  # ImageHash objects support subtraction for Hamming distance
-                            
-                            if hamming_dist <= threshold:
-                                print(f"[DEBUG] Image duplicate detected: Hamming distance {hamming_dist} <= threshold {threshold}")
-                                return True
-                        except (ValueError, TypeError) as hash_err:
-                            # If Hamming distance calculation fails, try exact match as fallback
-                            if img_hash_str == report_hash_str:
-                                print(f"[DEBUG] Image duplicate detected: Exact hash match (fallback)")
-                                return True
-                            continue
-                except (ValueError, TypeError) as e:
-                    print(f"[DEBUG] Skipping invalid hash value in report: {e}")
-                    continue  # Skip invalid hash values
+        # threshold=0 is a single dictionary lookup; threshold > 0 is a Hamming-radius
+        # search in the index's multi-index hash (only nearby hashes are ever compared)
+        matches = index.find_similar_images(img_hash_str, threshold)
+        if matches:
+            report, hamming_dist = matches[0]
+            if hamming_dist == 0:
+                print(f"[DEBUG] Image duplicate detected: Exact hash match '{img_hash_str}' == '{report.image_hash}'")
+            else:
+                print(f"[DEBUG] Image duplicate detected: Hamming distance {hamming_dist} <= threshold {threshold}")
+            return True
         
         print(f"[DEBUG] Image hash '{img_hash_str}' is NOT a duplicate")
         return False
@@ -212,55 +133,15 @@ def is_duplicate_image_from_bytes(image_bytes: bytes, threshold: int = 0, store:
         print(traceback.format_exc())
         return False
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate great-circle distance between two lat/lon points in meters."""
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    delta_lat = lat2 - lat1
-    delta_lon = lon2 - lon1
-    a = sin(delta_lat/2)**2 + cos(lat1) * cos(lat2) * sin(delta_lon/2)**2
-    c = 2 * asin(sqrt(a))
-    r = 6371000  # Earth radius in meters
-    return c * r
-
 def _calculate_text_similarity(text1: str, text2: str) -> float:
     """
     Calculate simple semantic similarity between two texts using word overlap.
     Returns a similarity score between 0.0 and 1.0.
+    Both texts go through text_rules.analyze_text, which is memoized, so the
+    tokens of a stored description are computed once however often it is compared.
     """
     try:
-        # Normalize texts
-        text1_words = set(text1.lower().strip().split())
-        text2_words = set(text2.lower().strip().split())
-        
-        # Remove common stop words for better matching
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those'}
-        text1_words = text1_words - stop_words
-        text2_words = text2_words - stop_words
-        
-        if not text1_words and not text2_words:
-            return 0.0
-        if not text1_words or not text2_words:
-            return 0.0
-        
-        # Calculate Jaccard similarity (intersection over union)
-        intersection = len(text1_words & text2_words)
-        union = len(text1_words | text2_words)
-        
-        if union == 0:
-            return 0.0
-        
-        similarity = intersection / union
-        
-        # Also check for substring matches in key phrases (for cases like "pothole" vs "big pothole")
-        text1_lower = text1.lower().strip()
-        text2_lower = text2.lower().strip()
-        
-        # If one text contains the other (for short descriptions), boost similarity
-        if len(text1_words) > 0 and len(text2_words) > 0:
-            if text1_lower in text2_lower or text2_lower in text1_lower:
-                similarity = max(similarity, 0.7)  # Boost if one contains the other
-        
-        return similarity
+        return text_similarity(analyze_text(text1), analyze_text(text2))
     except Exception as e:
         print(f"[WARNING] Text similarity calculation failed: {str(e)}")
         return 0.0
@@ -278,28 +159,14 @@ def is_duplicate_location(lat: float, lon: float, description: str, category: st
     Note: store parameter is kept for compatibility but doesn't do anything (location is stored via dataset.save_report).
     """
     try:
-        # Load all accepted reports from dataset
-        accepted_reports = _load_accepted_reports()
-        
         category_normalized = category.lower()
         
-        # Check each accepted report
-        for report in accepted_reports:
-            report_category = (report.get("category") or "").lower()
-            
-            # Check for same category
-            if report_category == category_normalized:
-                # Get location from report
-                report_lat = report.get("latitude")
-                report_lon = report.get("longitude")
-                
-                if report_lat is not None and report_lon is not None:
-                    # Calculate distance
-                    dist = haversine(lat, lon, float(report_lat), float(report_lon))
-                    # Consider duplicate if same category within threshold meters
-                    if dist <= threshold:
-                        print(f"[DEBUG] Location duplicate found in dataset: ({lat}, {lon}) is {dist:.2f}m from ({report_lat}, {report_lon}) for category '{category}'")
-                        return True
+        # Only reports in the grid cells around the point are distance-checked
+        for report, dist in get_index().nearby(lat, lon, threshold):
+            # Consider duplicate if same category within threshold meters
+            if report.category == category_normalized:
+                print(f"[DEBUG] Location duplicate found in dataset: ({lat}, {lon}) is {dist:.2f}m from ({report.latitude}, {report.longitude}) for category '{category}'")
+                return True
         
         return False
     except Exception as e:
@@ -310,7 +177,7 @@ def is_duplicate_location(lat: float, lon: float, description: str, category: st
         return False
 
 
-def is_comprehensive_duplicate(image_bytes: bytes, description: str, category: str, lat: float = None, lon: float = None, image_threshold: int = 0, text_similarity_threshold: float = 0.6, location_threshold: float = 50.0) -> bool:
+def is_comprehensive_duplicate(image_bytes: bytes, description: str, category: str, lat: float = None, lon: float = None, image_threshold: int = 0, text_similarity_threshold: float = 0.6, location_threshold: float = 50.0, context: ReportContext = None) -> bool:
     """
     Comprehensive duplicate detection that requires BOTH image similarity AND semantic description similarity.
     Location is used only as a supporting signal to filter candidates.
@@ -332,6 +199,7 @@ def is_comprehensive_duplicate(image_bytes: bytes, description: str, category: s
         image_threshold: Maximum Hamming distance for image hash (0 = exact match only)
         text_similarity_threshold: Minimum text similarity score (0.0-1.0, default 0.6)
         location_threshold: Maximum distance in meters for location filtering (default 50.0)
+        context: Optional ReportContext of the request (reuses its decoded image, hash and text analysis)
     
     Returns:
         True if duplicate detected (both image AND text similarity match), False otherwise
@@ -342,90 +210,49 @@ def is_comprehensive_duplicate(image_bytes: bytes, description: str, category: s
             print(f"[DEBUG] No image provided, skipping comprehensive duplicate check")
             return False
         
-        # Load all accepted reports from dataset
-        accepted_reports = _load_accepted_reports()
+        index = get_index()
         
-        if not accepted_reports:
+        if len(index) == 0:
             return False
         
-        # Compute image hash for the new report
-        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        img_hash = imagehash.phash(img)
-        img_hash_str = str(img_hash)
+        # Compute image hash for the new report (memoized on the request context)
+        img_hash_str = (context or ReportContext(image_bytes)).phash
         
         category_normalized = category.lower()
-        normalized_desc = description.strip().lower()
+        # Token set of the new description (shared with the rest of the pipeline via the context)
+        query_text = context.analysis if context is not None else analyze_text(description)
         
         print(f"[DEBUG] Comprehensive duplicate check: image_hash='{img_hash_str}', category='{category}', description_length={len(description)}")
         
+        # Check 1: Image similarity (PRIMARY CONDITION) - only reports with a matching
+        # image can be duplicates, so start from the (small) set of image matches
+        # (exact hash lookup for image_threshold=0, Hamming-radius multi-index hash search otherwise)
+        candidates = [report for report, _ in index.find_similar_images(img_hash_str, image_threshold)]
+        
         # Filter candidates by location if coordinates provided (supporting signal)
-        location_filtered_reports = accepted_reports
         if lat is not None and lon is not None:
-            location_filtered_reports = []
-            for report in accepted_reports:
-                report_lat = report.get("latitude")
-                report_lon = report.get("longitude")
-                if report_lat is not None and report_lon is not None:
-                    dist = haversine(lat, lon, float(report_lat), float(report_lon))
-                    if dist <= location_threshold:
-                        location_filtered_reports.append(report)
-            
-            print(f"[DEBUG] Location filter: {len(location_filtered_reports)} reports within {location_threshold}m (out of {len(accepted_reports)} total)")
+            # Compare the records themselves: the SQLite backend returns new tuples from every query
+            nearby = {report for report, _ in index.nearby(lat, lon, location_threshold)}
+            candidates = [report for report in candidates if report in nearby]
+            print(f"[DEBUG] Location filter: {len(nearby)} reports within {location_threshold}m (out of {len(index)} total), {len(candidates)} with a matching image")
         
         # Check each candidate report
-        for report in location_filtered_reports:
-            report_category = (report.get("category") or "").lower()
-            
+        for report in candidates:
             # Must have same category
-            if report_category != category_normalized:
-                continue
-            
-            # Check 1: Image similarity (PRIMARY CONDITION)
-            report_hash = report.get("image_hash")
-            image_match = False
-            if report_hash is not None:
-                try:
-                    report_hash_str = str(report_hash).strip()
-                    
-                    if image_threshold == 0:
-                        # Exact hash match
-                        if img_hash_str == report_hash_str:
-                            image_match = True
-                            print(f"[DEBUG] Image match found: exact hash match '{img_hash_str}' == '{report_hash_str}'")
-                    else:
-                        # Hamming distance match
-                        try:
-                            img_hash_obj = imagehash.hex_to_hash(img_hash_str)
-                            report_hash_obj = imagehash.hex_to_hash(report_hash_str)
-                            hamming_dist = img_hash_obj - report_hash_obj
-                            
-                            if hamming_dist <= image_threshold:
-                                image_match = True
-                                print(f"[DEBUG] Image match found: Hamming distance {hamming_dist} <= threshold {image_threshold}")
-                        except (ValueError, TypeError):
-                            # Fallback to exact match
-                            if img_hash_str == report_hash_str:
-                                image_match = True
-                except (ValueError, TypeError) as e:
-                    print(f"[DEBUG] Skipping invalid hash in report: {e}")
-                    continue
-            
-            # If image doesn't match, skip this report (image match is REQUIRED)
-            if not image_match:
+            if report.category != category_normalized:
                 continue
             
             # Check 2: Text/semantic similarity (REQUIRED CONDITION)
-            report_desc = (report.get("description") or "").strip().lower()
-            text_similarity = _calculate_text_similarity(description, report_desc)
+            similarity = text_similarity(query_text, analyze_text(report.description))
             
-            print(f"[DEBUG] Text similarity check: similarity={text_similarity:.2f}, threshold={text_similarity_threshold}, report_desc='{report_desc[:50]}...'")
+            print(f"[DEBUG] Text similarity check: similarity={similarity:.2f}, threshold={text_similarity_threshold}, report_desc='{report.description[:50]}...'")
             
             # Both image AND text must match for duplicate
-            if text_similarity >= text_similarity_threshold:
-                print(f"[DEBUG] COMPREHENSIVE DUPLICATE DETECTED: image_match=True, text_similarity={text_similarity:.2f} >= {text_similarity_threshold}")
+            if similarity >= text_similarity_threshold:
+                print(f"[DEBUG] COMPREHENSIVE DUPLICATE DETECTED: image_match=True, text_similarity={similarity:.2f} >= {text_similarity_threshold}")
                 return True
         
-        print(f"[DEBUG] No comprehensive duplicate found: checked {len(location_filtered_reports)} reports")
+        print(f"[DEBUG] No comprehensive duplicate found: checked {len(candidates)} reports")
         return False
         
     except Exception as e:
@@ -1,4 +1,10 @@
 import re
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, NamedTuple
 
 
 def normalize(text: str) -> str:
@@ -18,6 +24,60 @@ def contains(text: str, keyword: str) -> bool:
     return re.search(rf"\b{re.escape(keyword)}\b", text) is not None
 
 
+# ------------------------------------
+# Compiled keyword matcher (single pass)
+# ------------------------------------
+_WORD_RE = re.compile(r"\w+")
+
+
+class KeywordMatcher:
+    """
+    Finds every keyword of a fixed set that contains() would match, in one pass.
+
+    Keywords made of \\w+ words separated by single spaces are stored in a
+    word-level trie. Since such a keyword can only match where a \\w+ token
+    starts and must end where one ends, \\b<keyword>\\b matches exactly when
+    consecutive tokens equal its words and are separated by a single space.
+    The text is tokenized once and each token walks the trie. Any keyword of
+    another shape falls back to contains().
+    """
+
+    def __init__(self, keywords):
+        self._trie = {}  # word -> [keyword ending here or None, children]
+        self._irregular = []
+        for keyword in dict.fromkeys(keywords):
+            words = keyword.split(" ")
+            if not all(_WORD_RE.fullmatch(word) for word in words):
+                self._irregular.append(keyword)
+                continue
+            level = self._trie
+            for i, word in enumerate(words):
+                node = level.setdefault(word, [None, {}])
+                if i == len(words) - 1:
+                    node[0] = keyword
+                level = node[1]
+
+    def find(self, text: str) -> set:
+        """Set of keywords occurring in text as whole words/phrases (same semantics as contains)."""
+        tokens = [(m.group(), m.start(), m.end()) for m in _WORD_RE.finditer(text)]
+        hits = set()
+        for i, (word, _, end) in enumerate(tokens):
+            node = self._trie.get(word)
+            j = i
+            while node is not None:
+                if node[0] is not None:
+                    hits.add(node[0])
+                j += 1
+                if not node[1] or j >= len(tokens) or tokens[j][1] != end + 1 or text[end] != " ":
+                    break
+                end = tokens[j][2]
+                node = node[1].get(tokens[j][0])
+        for keyword in self._irregular:
+            if contains(text, keyword):
+                hits.add(keyword)
+        return hits
+
+
 # ------------------------------------
 # Abusive words
 # ------------------------------------
@@ -55,9 +115,11 @@ ABUSIVE_WORDS = [
 
 
 
+_ABUSIVE_SET = frozenset(ABUSIVE_WORDS)
+
+
 def is_abusive(description: str) -> bool:
-    text = normalize(description)
-    return any(contains(text, word) for word in ABUSIVE_WORDS)
+    return analyze_text(description).abusive
 
 
 # ------------------------------------
@@ -154,29 +216,49 @@ def detect_category(description: str) -> tuple[str, float]:
     - confidence >= 0.5: Medium confidence
     - confidence < 0.5: Low confidence
     """
-    text = normalize(description)
+    analysis = analyze_text(description)
+    return (analysis.category, analysis.confidence)
+
+
+# keyword -> [(category order, position in its list, keyword, category), ...]; lets scoring visit only the hits
+_KEYWORD_CATEGORIES = {}
+for _order, (_category, _keywords) in enumerate(CATEGORY_KEYWORDS.items()):
+    for _position, _keyword in enumerate(_keywords):
+        _KEYWORD_CATEGORIES.setdefault(_keyword, []).append((_order, _position, _keyword, _category))
+_CATEGORY_AVG_LENGTH = {category: sum(len(kw) for kw in keywords) / max(len(keywords), 1)
+                        for category, keywords in CATEGORY_KEYWORDS.items()}
+
 
+def _score_categories(hits: set) -> tuple:
+    """(category, confidence, category_hits) from the set of keyword hits; see detect_category."""
     best_category = "Other"
     max_score = 0
     max_keyword_length = 0
     total_keywords_matched = 0
+    category_hits = []
 
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        matches = [kw for kw in keywords if contains(text, kw)]
+    # Matched keywords per category, in CATEGORY_KEYWORDS order (categories without a match never win)
+    found = sorted(entry for kw in hits if kw in _KEYWORD_CATEGORIES for entry in _KEYWORD_CATEGORIES[kw])
+    grouped = {}
+    for _, _, keyword, category in found:
+        grouped.setdefault(category, []).append(keyword)
+
+    for category, matches in grouped.items():
         score = len(matches)
+        category_hits.append((category, tuple(matches)))
 
         if score > max_score:
             max_score = score
             best_category = category
-            max_keyword_length = max(len(kw) for kw in matches) if matches else 0
-            total_keywords_matched = sum(len(kw) for kw in matches)
+            max_keyword_length = max(map(len, matches))
+            total_keywords_matched = sum(map(len, matches))
         elif score == max_score and score > 0:
             # Tie-breaker: more specific (longer phrase) wins
-            longest = max(len(kw) for kw in matches) if matches else 0
+            longest = max(map(len, matches))
             if longest > max_keyword_length:
                 best_category = category
                 max_keyword_length = longest
-                total_keywords_matched = sum(len(kw) for kw in matches)
+                total_keywords_matched = sum(map(len, matches))
 
     # Calculate confidence: based on match score and keyword specificity
     # Higher score + longer keywords = higher confidence
@@ -189,12 +271,12 @@ def detect_category(description: str) -> tuple[str, float]:
         
         # Boost for specific keywords (longer = more specific)
         # Normalize by average keyword length in best category
-        avg_keyword_length = sum(len(kw) for kw in CATEGORY_KEYWORDS.get(best_category, [])) / max(len(CATEGORY_KEYWORDS.get(best_category, [])), 1)
+        avg_keyword_length = _CATEGORY_AVG_LENGTH[best_category]
         specificity_boost = min(max_keyword_length / (avg_keyword_length * 2), 0.3) if avg_keyword_length > 0 else 0
         
         confidence = min(base_confidence + specificity_boost, 1.0)
 
-    return (best_category, confidence)
+    return (best_category, confidence, tuple(category_hits))
 
 
 # ------------------------------------
@@ -230,19 +312,175 @@ URGENCY_KEYWORDS = {
 # ------------------------------------
 # Urgency detection (SAFE OVERRIDE)
 # ------------------------------------
+URGENCY_OVERRIDE_KEYWORDS = ["dead", "fire", "collapse", "gas leak"]
+
+
 def detect_urgency(description: str) -> str:
-    text = normalize(description)
+    return analyze_text(description).urgency
+
 
+_URGENCY_SETS = {level: frozenset(keywords) for level, keywords in URGENCY_KEYWORDS.items()}
+
+
+def _urgency(hits: set) -> str:
     # Hard safety override
-    if any(contains(text, k) for k in ["dead", "fire", "collapse", "gas leak"]):
+    if not hits.isdisjoint(URGENCY_OVERRIDE_KEYWORDS):
         return "high"
 
-    for kw in URGENCY_KEYWORDS["high"]:
-        if contains(text, kw):
-            return "high"
+    if not hits.isdisjoint(_URGENCY_SETS["high"]):
+        return "high"
 
-    for kw in URGENCY_KEYWORDS["medium"]:
-        if contains(text, kw):
-            return "medium"
+    if not hits.isdisjoint(_URGENCY_SETS["medium"]):
+        return "medium"
 
     return "low"
+
+
+# ------------------------------------
+# Shared matcher over every keyword list above
+# ------------------------------------
+_matcher = None
+
+
+def _keyword_matcher() -> KeywordMatcher:
+    """Matcher built once from ABUSIVE_WORDS, CATEGORY_KEYWORDS and URGENCY_KEYWORDS."""
+    global _matcher
+    if _matcher is None:
+        keywords = list(ABUSIVE_WORDS) + URGENCY_OVERRIDE_KEYWORDS
+        for words in list(CATEGORY_KEYWORDS.values()) + list(URGENCY_KEYWORDS.values()):
+            keywords.extend(words)
+        _matcher = KeywordMatcher(keywords)
+    return _matcher
+
+
+
+# ------------------------------------
+# Unified analysis (computed once per description)
+# ------------------------------------
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did',
+    'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those'
+})
+
+TEXT_ANALYSIS_CACHE_SIZE = 4096
+
+
+class TextAnalysis(NamedTuple):
+    """Everything the pipeline and duplicate checks derive from one description."""
+    normalized: str          # normalize(description)
+    tokens: frozenset        # whitespace tokens of normalized, stop words removed
+    keyword_hits: frozenset  # every keyword (category, abuse, urgency) found in normalized
+    category_hits: tuple     # ((category, (matched keywords, ...)), ...) in CATEGORY_KEYWORDS order
+    category: str
+    confidence: float
+    abusive: bool
+    urgency: str
+
+
+def analyze_text(description: str) -> TextAnalysis:
+    """Category, abuse flag, urgency and token set of a description, from one keyword pass.
+    Results are memoized by normalized text, so repeated descriptions are free."""
+    return _analyze_normalized(normalize(description or ""))
+
+
+def _analyze_uncached(text: str) -> TextAnalysis:
+    hits = _keyword_matcher().find(text)
+    category, confidence, category_hits = _score_categories(hits)
+    return TextAnalysis(
+        normalized=text,
+        tokens=frozenset(text.split()) - STOP_WORDS,
+        keyword_hits=frozenset(hits),
+        category_hits=category_hits,
+        category=category,
+        confidence=confidence,
+        abusive=not hits.isdisjoint(_ABUSIVE_SET),
+        urgency=_urgency(hits),
+    )
+
+
+_analyze_normalized = lru_cache(maxsize=TEXT_ANALYSIS_CACHE_SIZE)(_analyze_uncached)
+
+
+def text_similarity(first: TextAnalysis, second: TextAnalysis) -> float:
+    """
+    Word-overlap similarity between two analyzed texts (0.0 to 1.0): Jaccard
+    similarity of the stop-word-free token sets, boosted to 0.7 when one
+    normalized text contains the other.
+    """
+    if not first.tokens or not second.tokens:
+        return 0.0
+    similarity = len(first.tokens & second.tokens) / len(first.tokens | second.tokens)
+    # If one text contains the other (for short descriptions), boost similarity
+    if first.normalized in second.normalized or second.normalized in first.normalized:
+        similarity = max(similarity, 0.7)
+    return similarity
+
+
+# ------------------------------------
+# Batch analysis (bulk re-scoring)
+# ------------------------------------
+BATCH_CHUNK_SIZE = 2000
+
+
+def _analyze_chunk(descriptions: list) -> list:
+    """TextAnalysis per description; repeats within the chunk are analyzed once.
+    Bypasses the shared lru_cache so bulk runs do not evict the server's entries."""
+    seen = {}
+    results = []
+    for description in descriptions:
+        text = normalize(description or "")
+        analysis = seen.get(text)
+        if analysis is None:
+            analysis = seen[text] = _analyze_uncached(text)
+        results.append(analysis)
+    return results
+
+
+def _chunks(descriptions: Iterable, chunk_size: int) -> Iterator[list]:
+    iterator = iter(descriptions)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_analyze_batch(descriptions: Iterable[str], processes: int = 0,
+                       chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[TextAnalysis]:
+    """
+    Yield a TextAnalysis for every description of a list or iterator, in input order.
+
+    Descriptions are read lazily in chunks of chunk_size. With processes > 1
+    the chunks are analyzed in that many worker processes, keeping at most two
+    chunks per worker in flight, so arbitrarily long iterators stream in
+    bounded memory.
+    """
+    chunk_size = max(1, chunk_size)
+    if processes <= 1:
+        for chunk in _chunks(descriptions, chunk_size):
+            yield from _analyze_chunk(chunk)
+        return
+
+    # Forked workers inherit the already-built keyword matcher
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    _keyword_matcher()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        pending = deque()
+        for chunk in _chunks(descriptions, chunk_size):
+            pending.append(executor.submit(_analyze_chunk, chunk))
+            if len(pending) >= processes * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def analyze_batch(descriptions: Iterable[str], processes: int = 0,
+                  chunk_size: int = BATCH_CHUNK_SIZE) -> list:
+    """
+    TextAnalysis (category, confidence, urgency, abusive, ...) for every
+    description, in input order. Same results as calling detect_category,
+    detect_urgency and is_abusive on each; see iter_analyze_batch for
+    processes and chunk_size.
+    """
+    return list(iter_analyze_batch(descriptions, processes=processes, chunk_size=chunk_size))
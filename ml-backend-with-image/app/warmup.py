@@ -0,0 +1,92 @@
+"""
+Background warm-up of the report index and the CLIP model.
+
+The FastAPI lifespan hook starts warm-up on a daemon thread and returns right
+away, so the server accepts connections (and answers /health) while the model
+downloads and loads. Warm-up first imports the ML pipeline (kept out of
+app.main's import graph), then loads the accepted-report index (and, with
+REPORT_STORE=1, opens the binary report store), then loads
+CLIP and runs its self-check, a dummy inference. In PIPELINE_PROCESSES mode it
+instead creates the process pool, whose workers warm up before the pool is
+published. /ready answers 503 until all of that has finished.
+"""
+import threading
+import time
+
+_state = {"status": "warming", "started_at": None, "ready_at": None, "steps": {}, "errors": []}
+_ready = threading.Event()
+_thread = None
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def status() -> dict:
+    """Current warm-up state: status ("warming"/"ready"), per-step seconds and any step errors."""
+    state = dict(_state)
+    state["steps"] = dict(_state["steps"])
+    state["errors"] = list(_state["errors"])
+    if state["started_at"] is not None:
+        state["elapsed_s"] = round((state["ready_at"] or time.time()) - state["started_at"], 2)
+    return state
+
+
+def _step(name: str, fn):
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        # A failed step leaves the lazy per-request path in place; record it and carry on
+        print(f"[ERROR] Warm-up step '{name}' failed: {str(e)}")
+        _state["errors"].append(f"{name}: {str(e)}")
+    _state["steps"][name] = round(time.perf_counter() - start, 2)
+
+
+def _load_index():
+    from app.report_index import load_index
+    load_index()
+    from app import report_store
+    report_store.get_store()  # None unless REPORT_STORE=1
+
+
+def _load_model():
+    from app import pipeline
+    pipeline.initialize_models()
+
+
+def _create_process_pool():
+    from app.worker_pool import get_pool
+    get_pool()
+
+
+def _warm(load_modules, process_pool: bool):
+    available = []
+    _step("imports", lambda: available.append(load_modules()))
+    if not any(available):
+        # ML modules unavailable: the API serves default responses, nothing more to warm
+        if process_pool:
+            _step("pool", _create_process_pool)
+        _mark_ready()
+        return
+    _step("index", _load_index)
+    _step("pool" if process_pool else "model", _create_process_pool if process_pool else _load_model)
+    _mark_ready()
+
+
+def _mark_ready():
+    _state["status"] = "ready"
+    _state["ready_at"] = time.time()
+    _ready.set()
+    print(f"[INIT] Warm-up complete in {_state['ready_at'] - _state['started_at']:.1f}s: {_state['steps']}")
+
+
+def start(load_modules, process_pool: bool = False) -> threading.Thread:
+    """Start warm-up in the background (once); load_modules() imports the ML pipeline and
+    returns whether it is available. Returns the warm-up thread."""
+    global _thread
+    if _thread is None:
+        _state["started_at"] = time.time()
+        _thread = threading.Thread(target=_warm, args=(load_modules, process_pool), name="warmup", daemon=True)
+        _thread.start()
+    return _thread
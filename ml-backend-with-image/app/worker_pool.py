@@ -0,0 +1,199 @@
+"""
+Bounded worker pool that runs the blocking ML pipeline off the event loop.
+
+classify_report does image decoding, CLIP inference, fsync'd writes and index
+lookups; calling it directly from an async endpoint blocks every other
+request (health checks included) until it returns. PipelinePool runs it on a
+dedicated pool of PIPELINE_WORKERS threads and admits at most
+PIPELINE_QUEUE_SIZE requests beyond those being processed. When that limit
+is reached, submit() raises PipelineBusy immediately so the endpoint can
+answer 503 + Retry-After instead of letting requests pile up until the
+caller times out.
+
+With PIPELINE_PROCESSES=N the pool runs N worker processes instead, so
+Python-side work (decoding, preprocessing, text rules) scales past the GIL.
+The pool is created on the warm-up thread while the server is already
+handling requests, so the workers are not forked from the server: they fork
+from a multiprocessing forkserver, a fresh single-threaded process started
+with fork+exec. The forkserver imports FORKSERVER_PRELOAD first
+(app/worker_preload.py), which loads the CLIP weights once without running
+inference, so no OpenMP thread team exists at fork time, and freezes the GC,
+so the workers share those pages copy-on-write and each one only adds its
+own activations. Workers warm up in their initializer and split the cores
+between them (CLIP_NUM_THREADS overrides the per-worker thread count).
+"""
+import asyncio
+import gc
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+PIPELINE_PROCESSES = int(os.getenv("PIPELINE_PROCESSES", "0"))  # 0 = thread pool in the server process
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+PIPELINE_RETRY_AFTER = int(os.getenv("PIPELINE_RETRY_AFTER", "5"))  # seconds
+
+# Imported by the forkserver before it forks the first worker
+FORKSERVER_PRELOAD = ["app.main", "app.worker_preload"]
+
+
+class PipelineBusy(Exception):
+    """Raised when the pool already holds workers + queue_size requests."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"ML pipeline busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _init_process_worker(threads: int):
+    """Process-pool initializer: size the torch thread pool and warm the inherited model."""
+    from multiprocessing.util import Finalize
+    from app import dataset
+    from app import image_classifier as ic
+    from app import profanity
+    from app import report_store
+    # Pool workers leave through os._exit, which skips atexit: flush queued dataset writes on the way out
+    Finalize(None, dataset.close_writer, exitpriority=10)
+    # Each worker has its own CLIP result cache (loaded from CLIP_CACHE_PATH); save it the same way
+    Finalize(None, ic.get_result_cache().save, exitpriority=10)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    # One request at a time per process: nothing to batch with
+    ic.configure_batching(1, 0)
+    profanity.configure_batching(1, 0)
+    if "app.worker_preload" not in sys.modules:
+        # Before Python 3.12 the forkserver imports its preload modules from the working directory only
+        print(f"[WARNING] Pipeline worker {os.getpid()} did not inherit the preloaded model and loads its own copy; "
+              f"start the server from the project root")
+    # Open (and follow) the shared report store now rather than on the first request
+    report_store.get_store()
+    ic._ensure_clip()
+    ic.warm_up()
+    print(f"[INIT] Pipeline worker {os.getpid()} ready ({threads} inference threads)")
+
+
+def _noop():
+    return os.getpid()
+
+
+def load_shared_model():
+    """Import the pipeline and load CLIP (and the profanity-check model) in the forkserver, so the
+    workers forked from it share the weights copy-on-write. Called by app/worker_preload.py only."""
+    from app import pipeline  # noqa: F401 (imported once here instead of in every worker)
+    from app import image_classifier as ic
+    from app import profanity
+    profanity.load()
+    # ONNX Runtime sessions own native thread pools that do not survive fork; workers load their own
+    if ic.CLIP_BACKEND == "torch":
+        ic.initialize_clip(warm=False)
+        if ic._available:
+            print("[INIT] CLIP weights loaded in the forkserver; workers share them copy-on-write")
+    # Move everything allocated so far out of the GC's reach so collections in the
+    # children do not touch (and copy) the forkserver's object pages
+    gc.collect()
+    gc.freeze()
+
+
+class PipelinePool:
+    """Thread or process pool with admission control: workers running plus at most queue_size waiting."""
+
+    def __init__(self, workers: int = PIPELINE_WORKERS, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 retry_after: int = PIPELINE_RETRY_AFTER, processes: bool = False):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.retry_after = retry_after
+        self.processes = processes
+        if processes:
+            self._executor = self._start_processes()
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pipeline")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+
+    def _start_processes(self) -> ProcessPoolExecutor:
+        from app import image_classifier as ic
+        threads = ic.CLIP_NUM_THREADS or max(1, (os.cpu_count() or 1) // self.workers)
+        # Never fork this process: it runs the event loop and request threads, whose locks
+        # (logging, torch, the dataset writer) a forked child could inherit held
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(FORKSERVER_PRELOAD)
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                       initializer=_init_process_worker, initargs=(threads,))
+        # Start every worker now, so all of them have warmed up before the pool is published
+        for future in [executor.submit(_noop) for _ in range(self.workers)]:
+            future.result()
+        print(f"[INIT] Started {self.workers} pipeline worker process(es) with {threads} inference thread(s) each")
+        return executor
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def submit(self, fn, *args):
+        """Run fn(*args) on the pool and await its result; raises PipelineBusy when full."""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise PipelineBusy(self.retry_after)
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # Count the slot until the work itself finishes, even if the awaiting request is cancelled
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {"mode": "process" if self.processes else "thread", "workers": self.workers,
+                "queue_size": self.queue_size, "in_flight": self._in_flight, "rejected": self.rejected}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> PipelinePool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if PIPELINE_PROCESSES > 0:
+                    _pool = PipelinePool(workers=PIPELINE_PROCESSES, processes=True)
+                else:
+                    _pool = PipelinePool()
+                print(f"[INIT] Pipeline pool: {_pool.workers} {'process' if _pool.processes else 'thread'} "
+                      f"workers, queue {_pool.queue_size}")
+    return _pool
+
+
+def current_pool():
+    """The pool if it has been created, else None (never blocks on creating one)."""
+    return _pool
+
+
+def shutdown_pool(wait: bool = True):
+    """Finish queued work and drop the pool (a later get_pool() starts a new one)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
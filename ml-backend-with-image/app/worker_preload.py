@@ -0,0 +1,13 @@
+"""
+Preload module of the PIPELINE_PROCESSES forkserver (worker_pool.FORKSERVER_PRELOAD).
+
+Imported once by the forkserver before it forks any pipeline worker, never
+by the server: loads the models there so every worker forked from it shares
+the weights copy-on-write.
+"""
+from app import worker_pool
+
+try:
+    worker_pool.load_shared_model()
+except Exception as e:  # the forkserver survives only ImportError from a preload module
+    print(f"[ERROR] Loading the shared model in the forkserver failed, workers load their own: {str(e)}")
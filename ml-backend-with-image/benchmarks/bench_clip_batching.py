@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CLIP image classification throughput with and without micro-batching.
+
+Each of C client threads classifies preprocessed images back to back through
+image_classifier.classify_pixel_values (the path /submit uses). Runs once with
+batching disabled (max batch 1) and once with --max-batch/--max-wait-ms, for
+1, 8 and 32 concurrent clients by default.
+
+    python benchmarks/bench_clip_batching.py --clients 1 8 32 --requests-per-client 16
+"""
+import sys
+import os
+import argparse
+import statistics
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from app import image_classifier as ic
+
+
+def run(clients: int, requests_per_client: int, pixel_values) -> tuple:
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset: int):
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            ic.classify_pixel_values(pixel_values[(offset + i) % len(pixel_values)])
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / wall, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests-per-client", type=int, default=16)
+    parser.add_argument("--max-batch", type=int, default=ic.CLIP_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=ic.CLIP_MAX_BATCH_WAIT_MS)
+    args = parser.parse_args()
+
+    ic.initialize_clip()
+    if not ic._available:
+        print("CLIP is not available (transformers/torch missing or model download failed)")
+        sys.exit(1)
+
+    rng = np.random.default_rng(0)
+    pixel_values = [ic.preprocess_image(Image.fromarray((rng.random((224, 224, 3)) * 255).astype("uint8")))
+                    for _ in range(32)]
+
+    print(f"{'mode':<22} {'clients':>7} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'mean batch':>10}")
+    for label, max_batch, max_wait in (("unbatched", 1, 0), (f"batch<={args.max_batch}, {args.max_wait_ms:g}ms",
+                                                              args.max_batch, args.max_wait_ms)):
+        ic.configure_batching(max_batch, max_wait)
+        ic.classify_pixel_values(pixel_values[0])  # warm up (and start the batcher thread)
+        for clients in args.clients:
+            batcher = ic._get_batcher()
+            batches_before, items_before = batcher.batches, batcher.items
+            throughput, p50, p95 = run(clients, args.requests_per_client, pixel_values)
+            batches = batcher.batches - batches_before
+            mean_batch = (batcher.items - items_before) / batches if batches else 1.0
+            print(f"{label:<22} {clients:>7} {throughput:>8.1f} {p50:>8.1f} {p95:>8.1f} {mean_batch:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
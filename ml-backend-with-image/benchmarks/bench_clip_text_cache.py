@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request CLIP latency with and without cached label embeddings.
+
+"full forward" is the previous behaviour: processor(text=labels, images=image)
+and CLIPModel(**inputs), re-encoding every candidate label per request.
+"cached text" is image_classifier.classify_pixel_values: vision tower plus one
+matrix product against the cached, normalized label embeddings. Also reports
+how often both paths pick the same label.
+
+    python benchmarks/bench_clip_text_cache.py --requests 50
+"""
+import sys
+import os
+import argparse
+import statistics
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from app import image_classifier as ic
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    ic.initialize_clip()
+    if not ic._available:
+        print("CLIP is not available (transformers/torch missing or model download failed)")
+        sys.exit(1)
+
+    import torch
+    labels = ic.DEFAULT_CANDIDATE_LABELS
+    rng = np.random.default_rng(0)
+    images = [Image.fromarray((rng.random((224, 224, 3)) * 255).astype("uint8")) for _ in range(args.requests)]
+
+    full_ms, cached_ms, agree = [], [], 0
+    for image in images:
+        start = time.perf_counter()
+        with torch.no_grad():
+            inputs = ic._clip_processor(text=labels, images=image, return_tensors="pt", padding=True)
+            full_label = labels[int(ic._clip_model(**inputs).logits_per_image.argmax().item())]
+        full_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        cached_label = ic.classify_pixel_values(ic.preprocess_image(image), labels)
+        cached_ms.append((time.perf_counter() - start) * 1000)
+        agree += full_label == cached_label
+
+    print(f"labels: {len(labels)}  requests: {args.requests}  same label: {agree}/{args.requests}")
+    print(f"full forward: median {statistics.median(full_ms):.1f}ms")
+    print(f"cached text:  median {statistics.median(cached_ms):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
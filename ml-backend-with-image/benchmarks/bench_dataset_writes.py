@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sustained dataset appends per second, per-save fsync vs. group commit.
+
+T threads each append N report lines (about the size of a real dataset line)
+to a fresh file in --dir, using:
+
+  * the previous save_report write path: open, write, flush, fsync and fstat
+    for every line, and
+  * GroupCommitWriter in "batch", "interval" and "none" durability, with
+    every thread waiting for its own commit as save_report(wait=True) does.
+
+With --processes P it also runs P forked processes (uvicorn --workers P), each
+with its own writer and T threads, appending to one file under the writers'
+flock, and checks that no line was lost or interleaved.
+
+Run it on the disk the service writes to; fsync cost varies by orders of
+magnitude between tmpfs, SSDs and network volumes.
+
+    python benchmarks/bench_dataset_writes.py --threads 1 8 32 --per-thread 200 --dir data --processes 4
+"""
+import sys
+import os
+import argparse
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.group_commit import DURABILITY_MODES, GroupCommitWriter
+
+
+def report_line(i: int) -> bytes:
+    report = {"report_id": str(1767459631109 + i), "description": "water and drainage problem please check it",
+              "user_id": "694c03ecbf0d9a8829b75108", "latitude": 17.98246764, "longitude": 83.32154082,
+              "accept": True, "status": "accepted", "category": "Water & Drainage", "confidence": 0.97,
+              "urgency": "low", "reason": "Report accepted successfully", "image_hash": "fe2e9768b0986691"}
+    return (json.dumps(report) + "\n").encode("utf8")
+
+
+def fsync_per_save(path: Path, line: bytes):
+    with path.open("ab") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+        f.tell()
+        os.fstat(f.fileno())
+
+
+def run_threads(threads: int, per_thread: int, save) -> float:
+    lines = [report_line(i) for i in range(per_thread)]
+
+    def worker():
+        for line in lines:
+            save(line)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start
+
+
+def run_processes(processes: int, threads: int, per_thread: int, path: Path, durability: str) -> float:
+    def worker_process():
+        writer = GroupCommitWriter(lambda: path, durability=durability, lock=True)
+        run_threads(threads, per_thread, writer.submit)
+        writer.close()
+
+    ctx = multiprocessing.get_context("fork")
+    children = [ctx.Process(target=worker_process) for _ in range(processes)]
+    start = time.perf_counter()
+    for child in children:
+        child.start()
+    for child in children:
+        child.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--per-thread", type=int, default=200)
+    parser.add_argument("--dir", help="directory for the test files (default: a temporary directory)")
+    parser.add_argument("--processes", type=int, default=0, help="also append from this many processes at once")
+    args = parser.parse_args()
+
+    base = Path(args.dir) if args.dir else Path(tempfile.mkdtemp())
+    base.mkdir(parents=True, exist_ok=True)
+    print(f"Writing to {base}")
+    print(f"{'threads':>7} {'method':<20} {'writes/s':>10} {'fsyncs':>7} {'mean group':>10}")
+    for threads in args.threads:
+        total = threads * args.per_thread
+        path = base / "bench_fsync_per_save.jsonl"
+        elapsed = run_threads(threads, args.per_thread, lambda line: fsync_per_save(path, line))
+        path.unlink()
+        print(f"{threads:>7} {'fsync per save':<20} {total / elapsed:>10,.0f} {total:>7} {1:>10}")
+
+        for durability in DURABILITY_MODES:
+            path = base / f"bench_group_{durability}.jsonl"
+            writer = GroupCommitWriter(lambda: path, durability=durability)
+            elapsed = run_threads(threads, args.per_thread, writer.submit)
+            writer.close()
+            stats = writer.stats()
+            assert len(path.read_bytes().splitlines()) == total
+            path.unlink()
+            name = f"group commit {durability}"
+            print(f"{threads:>7} {name:<20} {total / elapsed:>10,.0f} {stats['fsyncs']:>7} {stats['mean_group_size']:>10}")
+
+        if args.processes:
+            for durability in DURABILITY_MODES:
+                path = base / f"bench_processes_{durability}.jsonl"
+                elapsed = run_processes(args.processes, threads, args.per_thread, path, durability)
+                lines = path.read_bytes().splitlines()
+                assert len(lines) == args.processes * total and all(json.loads(line) for line in lines)
+                path.unlink()
+                name = f"{args.processes} procs {durability}"
+                print(f"{threads:>7} {name:<20} {len(lines) / elapsed:>10,.0f} {'-':>7} {'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
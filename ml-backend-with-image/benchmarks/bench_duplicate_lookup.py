@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: same-user text duplicate lookup (storage.is_duplicate) vs. dataset size.
+
+Writes a synthetic dataset of N accepted reports to a temporary file, loads the
+report index once, then times storage.is_duplicate for lookups that hit and
+miss (its debug output is discarded while timing). Latency should stay flat
+from 1k to 1M stored reports.
+
+    python benchmarks/bench_duplicate_lookup.py --sizes 1000 10000 100000 1000000
+"""
+import sys
+import os
+import argparse
+import contextlib
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import dataset, storage
+from app.report_index import ReportIndex
+import app.report_index as report_index
+
+CATEGORIES = ["Road & Traffic", "Garbage & Sanitation", "Water & Drainage", "Electricity",
+              "Street Lighting", "Public Safety", "Parks & Recreation"]
+WORDS = ["pothole", "garbage", "drain", "water", "street", "light", "broken", "near", "school",
+         "market", "overflowing", "leaking", "pipe", "road", "park", "tree", "wire", "smell"]
+
+
+def synthetic_report(i: int, rng: random.Random) -> dict:
+    return {
+        "report_id": str(i),
+        "description": " ".join(rng.choice(WORDS) for _ in range(8)) + f" #{i}",
+        "user_id": f"user{i % 5000}",
+        "category": CATEGORIES[i % len(CATEGORIES)],
+        "latitude": 17.6 + rng.random() * 0.4,
+        "longitude": 83.1 + rng.random() * 0.4,
+        "accept": True,
+        "status": "accepted",
+        "image_hash": f"{rng.getrandbits(64):016x}",
+    }
+
+
+def write_dataset(path: Path, n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    reports = []
+    with path.open("w", encoding="utf8") as f:
+        for i in range(n):
+            report = synthetic_report(i, rng)
+            reports.append((report["user_id"], report["description"], report["category"]))
+            f.write(json.dumps(report) + "\n")
+    return reports
+
+
+def time_calls(fn, args_list) -> tuple:
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'reports':>10} {'load (s)':>9} {'hit p50 (us)':>13} {'hit p99 (us)':>13} {'miss p50 (us)':>14} {'miss p99 (us)':>14}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset.DATA_FILE = Path(tmp) / "dataset.jsonl"
+            keys = write_dataset(dataset.DATA_FILE, n)
+
+            index = ReportIndex()
+            report_index._index = index  # storage.is_duplicate queries the process-wide index
+            start = time.perf_counter()
+            index.refresh()
+            load_s = time.perf_counter() - start
+
+            rng = random.Random(n)
+            hits = [rng.choice(keys) for _ in range(args.queries)]
+            misses = [(u, d + " again", c) for u, d, c in hits]
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                hit_p50, hit_p99 = time_calls(storage.is_duplicate, hits)
+                miss_p50, miss_p99 = time_calls(storage.is_duplicate, misses)
+            print(f"{n:>10} {load_s:>9.2f} {hit_p50:>13.2f} {hit_p99:>13.2f} {miss_p50:>14.2f} {miss_p99:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark: scalar haversine loop vs. the vectorized NumPy kernel.
+
+For each size N, times the distances from one query point to N stored points
+(Python loop over storage.haversine vs. one geo.distances_to call), and from
+100 query points to N stored points (pairwise_distances, chunked).
+
+    python benchmarks/bench_haversine.py --sizes 100000 1000000
+"""
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.geo import CoordinateArray, haversine, pairwise_distances
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--query-points", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'points':>9} {'scalar loop (ms)':>17} {'numpy (ms)':>11} {'speedup':>8} "
+          f"{args.query_points:>4} x N numpy (ms)")
+    for n in args.sizes:
+        coords = CoordinateArray()
+        for lat, lon in zip(rng.uniform(17.6, 18.0, n), rng.uniform(83.1, 83.5, n)):
+            coords.append(lat, lon)
+        lats, lons = coords.lats, coords.lons
+        lat_list, lon_list = lats.tolist(), lons.tolist()
+
+        scalar_ms = best_of(lambda: [haversine(17.7, 83.2, a, b) for a, b in zip(lat_list, lon_list)], repeat=1)
+        numpy_ms = best_of(lambda: coords.distances_to(17.7, 83.2))
+
+        query_lats = rng.uniform(17.6, 18.0, args.query_points)
+        query_lons = rng.uniform(83.1, 83.5, args.query_points)
+
+        def many():
+            # Chunk the query points to bound the (queries x N) temporary matrices
+            for i in range(0, args.query_points, 8):
+                pairwise_distances(query_lats[i:i + 8], query_lons[i:i + 8], lats, lons).min(axis=1)
+
+        many_ms = best_of(many, repeat=1)
+        print(f"{n:>9} {scalar_ms:>17.1f} {numpy_ms:>11.2f} {scalar_ms / numpy_ms:>7.0f}x {many_ms:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Hamming-radius pHash search, multi-index hashing vs. linear scan.
+
+Stores N random 64-bit hashes and times radius queries for a few radii.
+
+    python benchmarks/bench_phash_search.py --sizes 100000 1000000 --radii 0 4 8
+"""
+import sys
+import os
+import argparse
+import random
+import statistics
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.phash_index import MultiIndexHash, hamming
+
+
+def linear_search(values, query, radius):
+    return [(v, d) for v in values for d in (hamming(query, v),) if d <= radius]
+
+
+def time_queries(fn, queries) -> float:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--radii", type=int, nargs="+", default=[0, 4, 8])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'hashes':>9} {'build (s)':>9} {'radius':>6} {'indexed p50 (ms)':>17} {'linear p50 (ms)':>16}")
+    for n in args.sizes:
+        rng = random.Random(n)
+        values = [rng.getrandbits(64) for _ in range(n)]
+        start = time.perf_counter()
+        index = MultiIndexHash()
+        for v in values:
+            index.add(v)
+        build_s = time.perf_counter() - start
+
+        # Half the queries are perturbed copies of stored hashes, half are unrelated
+        queries = [rng.choice(values) ^ (1 << rng.randrange(64)) for _ in range(args.queries // 2)]
+        queries += [rng.getrandbits(64) for _ in range(args.queries - len(queries))]
+        for radius in args.radii:
+            bk_ms = time_queries(lambda q: index.search(q, radius), queries)
+            linear_ms = time_queries(lambda q: linear_search(values, q, radius), queries[:5])
+            print(f"{n:>9} {build_s:>9.2f} {radius:>6} {bk_ms:>17.3f} {linear_ms:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
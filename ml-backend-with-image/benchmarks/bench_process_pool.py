@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: image classification throughput and memory, thread pool vs. process pool.
+
+Submits --requests image classifications (decode + CLIP, the CPU-heavy part
+of classify_report) through PipelinePool in thread mode and in process mode
+with --workers workers. For process mode it reports the proportional set
+size (PSS, shared pages split between sharers) of the parent, the forkserver
+and the workers, which shows how much of the CLIP weights the workers kept
+sharing copy-on-write with the forkserver. Run it from the project root (the
+forkserver imports its preload modules from there).
+
+    python benchmarks/bench_process_pool.py --workers 4 --requests 64
+"""
+import sys
+import os
+import argparse
+import asyncio
+import io
+import time
+from multiprocessing import forkserver
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from app import image_classifier as ic
+from app.worker_pool import PipelinePool
+
+
+def pss_mb(pid: int) -> float:
+    """Proportional set size from /proc/<pid>/smaps_rollup (Linux)."""
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def jpeg(seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    img = Image.fromarray((rng.random((12, 16, 3)) * 255).astype("uint8")).resize((1600, 1200))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def clip_available() -> bool:
+    return ic._available
+
+
+async def run(pool: PipelinePool, images: list) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.submit(ic.classify_image_from_bytes, image) for image in images))
+    return len(images) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--requests", type=int, default=64)
+    args = parser.parse_args()
+
+    images = [jpeg(i) for i in range(args.requests)]
+
+    pool = PipelinePool(workers=args.workers, queue_size=args.requests, processes=True)
+    if not asyncio.run(pool.submit(clip_available)):
+        print("CLIP is not available (transformers/torch missing or model download failed)")
+        sys.exit(1)
+    asyncio.run(run(pool, images[:args.workers]))  # warm every worker
+    process_rate = asyncio.run(run(pool, images))
+    children = [p.pid for p in pool._executor._processes.values()]
+    parent_pss = pss_mb(os.getpid()) + pss_mb(forkserver._forkserver._forkserver_pid)
+    child_pss = [pss_mb(pid) for pid in children]
+    pool.shutdown()
+
+    ic.load_clip()  # the process pool loaded CLIP in its forkserver, not here
+    pool = PipelinePool(workers=args.workers, queue_size=args.requests)
+    asyncio.run(run(pool, images[:args.workers]))
+    thread_rate = asyncio.run(run(pool, images))
+    thread_pss = pss_mb(os.getpid())
+    pool.shutdown()
+
+    print(f"{'mode':<10} {'workers':>7} {'img/s':>8} {'PSS total MB':>13}")
+    print(f"{'thread':<10} {args.workers:>7} {thread_rate:>8.1f} {thread_pss:>13.0f}")
+    print(f"{'process':<10} {args.workers:>7} {process_rate:>8.1f} {parent_pss + sum(child_pss):>13.0f}"
+          f"   (parent + forkserver {parent_pss:.0f} MB, per worker {min(child_pss):.0f}-{max(child_pss):.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
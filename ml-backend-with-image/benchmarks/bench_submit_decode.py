@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /submit latency and peak memory with and without draft-scale image decoding.
+
+Starts the app (lifespan and warm-up included) in a fresh subprocess per
+mode, IMAGE_REDUCED_DECODE=1 (draft decode shared by the pHash and CLIP) and
+IMAGE_REDUCED_DECODE=0 (full-size decode), against a temporary dataset, and
+posts --requests distinct 12 MP phone-style JPEGs as base64 through
+TestClient, one at a time. Prints median / p90 request latency and how far
+the process's peak RSS rose above its RSS before the first request (Linux:
+the peak is reset through /proc/self/clear_refs). Without torch the
+pipeline skips CLIP inference, so the difference is then the decode and
+hash work alone.
+
+    python benchmarks/bench_submit_decode.py --requests 20
+"""
+import sys
+import os
+import argparse
+import base64
+import gc
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def vm_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(requests: int) -> dict:
+    """Runs in the child process."""
+    from fastapi.testclient import TestClient
+    from app import dataset, main, warmup
+    from check_reduced_decode import synthetic_photo
+
+    dataset.DATA_FILE = Path(tempfile.mkdtemp()) / "dataset.jsonl"
+    images = [base64.b64encode(synthetic_photo(seed)).decode("ascii") for seed in range(requests)]
+    latencies, statuses = [], {}
+    with TestClient(main.app) as client:
+        warmup._ready.wait(600)
+        gc.collect()
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # reset the peak RSS to the current RSS
+        baseline_kb = vm_kb("VmRSS")
+        for i, image in enumerate(images):
+            report = {"report_id": f"bench-{i}", "description": f"Big pothole number {i} on the main road near the school",
+                      "user_id": f"bench-user-{i}", "latitude": 17.6 + i * 0.01, "longitude": 83.1,
+                      "image_base64": image}
+            start = time.perf_counter()
+            response = client.post("/submit", json=report)
+            latencies.append((time.perf_counter() - start) * 1000)
+            status = response.json().get("status", str(response.status_code))
+            statuses[status] = statuses.get(status, 0) + 1
+        peak_kb = vm_kb("VmHWM")
+    latencies.sort()
+    return {"p50_ms": statistics.median(latencies), "p90_ms": latencies[int(len(latencies) * 0.9) - 1],
+            "peak_rss_mb": (peak_kb - baseline_kb) / 1024, "statuses": statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.requests)))
+        return
+
+    print(f"{'IMAGE_REDUCED_DECODE':<21} {'p50 ms':>8} {'p90 ms':>8} {'peak RSS +MB':>13}  statuses")
+    for mode in ("1", "0"):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--requests", str(args.requests)],
+                             check=True, capture_output=True, text=True,
+                             env={**os.environ, "IMAGE_REDUCED_DECODE": mode}).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:<21} {result['p50_ms']:>8.0f} {result['p90_ms']:>8.0f} {result['peak_rss_mb']:>13.0f}  "
+              f"{result['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bulk text scoring throughput.
+
+Generates N distinct synthetic descriptions (report-like sentences built from
+the category, urgency and abuse keywords plus filler words) and times:
+
+  * a per-description loop over detect_category / detect_urgency / is_abusive
+    through the cached single-text path, and
+  * text_rules.analyze_batch in this process and with --processes workers.
+
+    python benchmarks/bench_text_batch.py --count 200000 --processes 2 4
+"""
+import sys
+import os
+import argparse
+import random
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import text_rules
+from app.text_rules import (
+    ABUSIVE_WORDS, CATEGORY_KEYWORDS, URGENCY_KEYWORDS, analyze_batch, detect_category, detect_urgency, is_abusive
+)
+
+FILLER = ["the", "near", "school", "please", "check", "since", "two", "days", "our", "street", "is",
+          "very", "bad", "there", "a", "big", "in", "front", "of", "house", "number", "main", "colony"]
+KEYWORDS = sorted({kw for kws in CATEGORY_KEYWORDS.values() for kw in kws}
+                  | {kw for kws in URGENCY_KEYWORDS.values() for kw in kws} | set(ABUSIVE_WORDS))
+
+
+def make_descriptions(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    descriptions = []
+    for i in range(count):
+        words = [rng.choice(KEYWORDS) if rng.random() < 0.25 else rng.choice(FILLER)
+                 for _ in range(rng.randint(4, 20))]
+        words.append(str(i))  # keep every description distinct so no cache helps
+        descriptions.append(" ".join(words).capitalize())
+    return descriptions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--processes", type=int, nargs="*", default=[2, 4])
+    args = parser.parse_args()
+
+    descriptions = make_descriptions(args.count)
+    print(f"{'method':<28} {'seconds':>8} {'descriptions/s':>15}")
+
+    start = time.perf_counter()
+    loop = [(detect_category(d), detect_urgency(d), is_abusive(d)) for d in descriptions]
+    elapsed = time.perf_counter() - start
+    print(f"{'per-description calls':<28} {elapsed:>8.2f} {args.count / elapsed:>15,.0f}")
+    text_rules._analyze_normalized.cache_clear()
+
+    for processes in [0] + args.processes:
+        start = time.perf_counter()
+        batch = analyze_batch(descriptions, processes=processes)
+        elapsed = time.perf_counter() - start
+        assert [((a.category, a.confidence), a.urgency, a.abusive) for a in batch] == loop
+        name = f"analyze_batch processes={processes}"
+        print(f"{name:<28} {elapsed:>8.2f} {args.count / elapsed:>15,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Check: import-time budget for app.main and time until the server answers.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+prints the modules with the largest cumulative import time, then verifies:
+
+  * importing app.main takes at most --budget-ms (best of --repeat runs),
+  * none of the heavy ML modules (torch, transformers, imagehash, numpy, PIL,
+    requests, sklearn) are imported by it, and
+  * with --serve, uvicorn answers GET /health within --serve-budget-ms of
+    process start.
+
+Exits non-zero if any check fails.
+
+    python benchmarks/check_import_time.py --budget-ms 1000 --serve
+"""
+import sys
+import os
+import argparse
+import json
+import socket
+import subprocess
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["torch", "transformers", "imagehash", "numpy", "PIL", "requests", "sklearn", "profanity_check"]
+
+
+def import_times() -> list:
+    """[(cumulative_us, self_us, module), ...] for one fresh `import app.main`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT,
+                          capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def heavy_imports() -> list:
+    code = ("import sys, json, app.main; "
+            f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def time_to_first_response(timeout: float = 60.0) -> float:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.02)
+        return float("inf")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--serve", action="store_true", help="also time uvicorn start until /health answers")
+    parser.add_argument("--serve-budget-ms", type=float, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.repeat)]
+    totals = [next(cum for cum, _, name in rows if name.strip() == "app.main") / 1000 for rows in runs]
+    best = min(range(len(runs)), key=lambda i: totals[i])
+
+    print(f"Top {args.top} modules by cumulative import time (best run):")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for cumulative, self_time, name in sorted(runs[best], reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>14.1f} {self_time / 1000:>8.1f}  {name}")
+
+    failures = []
+    print(f"\nimport app.main: {totals[best]:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if totals[best] > args.budget_ms:
+        failures.append("import budget exceeded")
+
+    heavy = heavy_imports()
+    print(f"heavy modules imported by app.main: {', '.join(heavy) or 'none'}")
+    if heavy:
+        failures.append("heavy modules imported eagerly")
+
+    if args.serve:
+        ready_ms = time_to_first_response()
+        print(f"uvicorn start -> first /health response: {ready_ms:.0f} ms (budget {args.serve_budget_ms:.0f} ms)")
+        if ready_ms > args.serve_budget_ms:
+            failures.append("serve budget exceeded")
+
+    if failures:
+        print(f"\nFAILED: {'; '.join(failures)}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
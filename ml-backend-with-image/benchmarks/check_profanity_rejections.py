@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Check: how many civic-complaint descriptions the profanity-check stage would newly reject.
+
+Runs every description the ABUSIVE_WORDS keyword stage lets through (the
+only texts the second stage ever sees) through profanity_check.predict_prob
+and counts those at or above each threshold. Every one of them is a report
+that was not rejected before PROFANITY_CHECK was turned on.
+
+Descriptions come from the dataset (accepted and rejected reports; pass more
+JSONL or plain-text files with --texts) plus a synthetic corpus of blunt but
+clean civic complaints ("this damn pothole ...", "dead dog rotting ...").
+
+    python benchmarks/check_profanity_rejections.py
+    python benchmarks/check_profanity_rejections.py --texts complaints.txt --thresholds 0.5 0.8 0.95
+"""
+import sys
+import os
+import argparse
+import itertools
+import json
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import dataset, text_rules
+
+SUBJECTS = ["pothole", "garbage heap", "drain", "street light", "water pipe", "stray dog", "dead dog",
+            "open manhole", "sewage", "fallen tree", "electric wire", "bus stop"]
+PROBLEMS = ["has been there for two weeks", "is overflowing and stinking", "is broken again",
+            "is killing the whole street", "is rotting near the school", "nearly caused an accident",
+            "is blocking the road", "is leaking dirty water everywhere"]
+TONES = ["{s} {p}", "This damn {s} {p}, fix it now", "Useless officials, the {s} {p}",
+         "Why is nobody doing anything? The {s} {p}", "Hell of a mess here, the {s} {p}",
+         "The bloody {s} {p}, shame on the corporation"]
+
+
+def synthetic_complaints() -> list:
+    return [tone.format(s=s, p=p) for tone, s, p in itertools.product(TONES, SUBJECTS, PROBLEMS)]
+
+
+def read_texts(path: Path) -> list:
+    texts = []
+    with open(path, encoding="utf8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                report = json.loads(line)
+            except json.JSONDecodeError:
+                texts.append(line)
+                continue
+            if isinstance(report, dict) and report.get("description"):
+                texts.append(report["description"])
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", nargs="*", default=[], help="JSONL reports or one description per line")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.7, 0.9])
+    parser.add_argument("--examples", type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        from profanity_check import predict_prob
+    except Exception as e:
+        sys.exit(f"profanity-check does not load here: {e}")
+
+    sources = {"dataset": []}
+    for path in dict.fromkeys(dataset.report_files("accepted") + dataset.report_files("rejected")):
+        if Path(path).exists():
+            sources["dataset"] += read_texts(Path(path))
+    for path in args.texts:
+        sources[Path(path).name] = read_texts(Path(path))
+    sources["synthetic"] = synthetic_complaints()
+
+    print(f"{'source':<12} {'texts':>6} {'to model':>9}  " + "  ".join(f"{'>= ' + str(t):>9}" for t in args.thresholds))
+    for name, texts in sources.items():
+        # Unique texts the keyword stage does not flag: the ones the model decides
+        candidates = sorted({text_rules.normalize(t) for t in texts if not text_rules.is_abusive(t)} - {""})
+        probs = [float(p) for p in predict_prob(candidates)] if candidates else []
+        flagged = {t: sum(p >= t for p in probs) for t in args.thresholds}
+        print(f"{name:<12} {len(texts):>6} {len(candidates):>9}  " +
+              "  ".join(f"{n:>4} {n / len(candidates) if candidates else 0:>4.0%}" for n in flagged.values()))
+        worst = sorted(zip(probs, candidates), reverse=True)[:args.examples]
+        for prob, text in worst:
+            if prob >= min(args.thresholds):
+                print(f"    {prob:.3f}  {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Check: pHash drift and decode time of the draft-scale request decode.
+
+For every image in the corpus:
+
+  * ReportContext(data).phash (draft-scale decode, shared with CLIP) is
+    compared with imagehash.phash of a full-resolution decode, the hash that
+    reports stored before draft decoding. The largest distance is the
+    tolerance report_context.PHASH_TOLERANCE (IMAGE_PHASH_TOLERANCE) must
+    cover; exits non-zero if any image exceeds it,
+  * full decode + hash and ReportContext decode + hash times are printed.
+
+The synthetic corpus mixes smooth phone-style photos with high-detail
+textures (the worst case for drift).
+
+    python benchmarks/check_reduced_decode.py                 # synthetic photos
+    python benchmarks/check_reduced_decode.py --images ~/photos
+"""
+import sys
+import os
+import argparse
+import io
+import statistics
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw
+import imagehash
+
+from app.report_context import ReportContext, PHASH_TOLERANCE, draft_decode
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def synthetic_photo(seed: int, width: int = 4000, height: int = 3000) -> bytes:
+    """Photo-like 12 MP JPEG: smooth colour field, shapes and sensor noise."""
+    rng = np.random.default_rng(seed)
+    base = Image.fromarray((rng.random((12, 16, 3)) * 255).astype("uint8"))
+    img = base.resize((width, height), Image.Resampling.BICUBIC)
+    draw = ImageDraw.Draw(img)
+    for _ in range(30):
+        x, y, size = int(rng.integers(0, width)), int(rng.integers(0, height)), int(rng.integers(50, 800))
+        draw.ellipse([x, y, x + size, y + size // 2], fill=tuple(int(v) for v in rng.integers(0, 255, 3)))
+    noisy = np.asarray(img).astype(np.int16) + rng.normal(0, 12, (height, width, 3)).astype(np.int16)
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(noisy, 0, 255).astype("uint8")).save(buf, format="JPEG", quality=88)
+    return buf.getvalue()
+
+
+def detailed_photo(seed: int, width: int = 3200, height: int = 2400) -> bytes:
+    """High-detail JPEG (fine random texture, like foliage or gravel up close)."""
+    rng = np.random.default_rng(seed)
+    texture = (rng.random((height // 2, width // 2, 3)) > 0.5).astype("uint8") * 255
+    buf = io.BytesIO()
+    Image.fromarray(texture).resize((width, height), Image.Resampling.NEAREST).save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+def load_corpus(args) -> list:
+    if args.images:
+        paths = sorted(p for p in Path(args.images).expanduser().rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+        return [(p.name, p.read_bytes()) for p in paths]
+    return ([(f"synthetic-{seed}.jpg", synthetic_photo(seed)) for seed in range(args.count)]
+            + [(f"detailed-{seed}.jpg", detailed_photo(seed)) for seed in range(args.count)])
+
+
+def timed(fn) -> tuple:
+    start = time.perf_counter()
+    value = fn()
+    return value, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory of images to use as the corpus")
+    parser.add_argument("--count", type=int, default=10, help="synthetic photos of each kind when --images is not given")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    drifts, full_ms, draft_ms = {}, [], []
+    for name, data in corpus:
+        full_hash, full_time = timed(lambda: imagehash.phash(draft_decode(data, reduced=False)))
+        context = ReportContext(data)
+        draft_hash, draft_time = timed(lambda: context.phash)
+        drift = int(full_hash - imagehash.hex_to_hash(draft_hash))
+        drifts.setdefault(name.split("-")[0] if not args.images else "images", []).append(drift)
+        full_ms.append(full_time)
+        draft_ms.append(draft_time)
+        print(f"{name:<32} drift={drift:>2}  full={full_time:.0f}ms draft={draft_time:.0f}ms "
+              f"({context.decoded_image.size[0]}x{context.decoded_image.size[1]})")
+
+    print(f"\nimages: {len(corpus)}  tolerance (IMAGE_PHASH_TOLERANCE): {PHASH_TOLERANCE} bits")
+    for kind, values in drifts.items():
+        print(f"  {kind:<12} drift: {sum(d > 0 for d in values)}/{len(values)} images differ, max {max(values)} bits")
+    print(f"median: full decode+hash {statistics.median(full_ms):.0f}ms, draft decode+hash {statistics.median(draft_ms):.0f}ms")
+    sys.exit(1 if max(max(v) for v in drifts.values()) > PHASH_TOLERANCE else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare: PyTorch CLIP vs. the ONNX Runtime backend (fp32 and int8).
+
+Classifies the same images with each backend against the default candidate
+labels and reports, per ONNX variant, how often it picks the same label as
+PyTorch, plus median single-image latency and process RSS for each backend.
+Exports the ONNX models first if they are missing.
+
+    python benchmarks/compare_clip_backends.py --images ~/report-photos
+    python benchmarks/compare_clip_backends.py --count 50          # synthetic images
+"""
+import sys
+import os
+import argparse
+import resource
+import statistics
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from app import clip_onnx
+from app import image_classifier as ic
+from app.report_context import decode_image
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def load_images(args) -> list:
+    if args.images:
+        paths = sorted(p for p in Path(args.images).expanduser().rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+        return [decode_image(p.read_bytes()) for p in paths]
+    rng = np.random.default_rng(0)
+    return [Image.fromarray((rng.random((224, 224, 3)) * 255).astype("uint8")) for _ in range(args.count)]
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed_labels(classify, pixel_values) -> tuple:
+    labels, times = [], []
+    for pv in pixel_values:
+        start = time.perf_counter()
+        labels.append(classify(pv))
+        times.append((time.perf_counter() - start) * 1000)
+    return labels, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory of report photos")
+    parser.add_argument("--count", type=int, default=50, help="synthetic images when --images is not given")
+    args = parser.parse_args()
+
+    labels = ic.DEFAULT_CANDIDATE_LABELS
+    images = load_images(args)
+    rss_start = max_rss_mb()
+
+    ic.CLIP_BACKEND = "torch"
+    ic.configure_batching(1, 0)
+    ic.initialize_clip()
+    if not ic._available:
+        print("PyTorch CLIP is not available (transformers/torch missing or model download failed)")
+        sys.exit(1)
+    torch_pixels = [ic.preprocess_image(image) for image in images]
+    reference, torch_ms = timed_labels(lambda pv: ic._classify_batch([pv], labels)[0][0], torch_pixels)
+    print(f"{'backend':<14} {'agreement':>10} {'median ms':>10}")
+    print(f"{'torch fp32':<14} {'-':>10} {torch_ms:>10.1f}   (max RSS after load +{max_rss_mb() - rss_start:.0f} MB)")
+
+    np_pixels = [pv.numpy() for pv in torch_pixels]
+    for quantized in (False, True):
+        if not clip_onnx.is_exported(quantized=quantized):
+            clip_onnx.export(quantize=quantized)
+        backend = clip_onnx.OnnxClipBackend(quantized=quantized, num_threads=ic.CLIP_NUM_THREADS)
+        predicted, onnx_ms = timed_labels(lambda pv: backend.classify_batch(pv, labels)[0], np_pixels)
+        agreement = sum(a == b for a, b in zip(reference, predicted)) / len(reference)
+        name = "onnx int8" if quantized else "onnx fp32"
+        print(f"{name:<14} {agreement:>9.1%} {onnx_ms:>10.1f}")
+    print("\nRun the server with CLIP_BACKEND=onnx [CLIP_ONNX_QUANTIZED=1] to compare serving RSS in isolation.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compare: JSONL + in-memory report index vs. the SQLite backend, by dataset size.
+
+For each size N, writes N synthetic accepted reports to a temporary
+dataset.jsonl and imports the same reports into a SQLite database
+(python -m app.sqlite_store import does the same), then times, per backend:
+
+  * startup      loading the report index (JSONL) / opening the database (SQLite)
+  * text         has_text_duplicate, half hits and half misses
+  * image r=0    exact pHash lookup
+  * image r=8    Hamming-radius search
+  * nearby 50m   radius query
+  * save         one save_report, committed (DATASET_DURABILITY=batch)
+
+and prints median / p99 in microseconds.
+
+    python benchmarks/compare_storage_backends.py --sizes 10000 100000 1000000
+"""
+import sys
+import os
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import dataset
+from app.report_index import ReportIndex
+from app.sqlite_store import SQLiteReportStore
+from bench_duplicate_lookup import synthetic_report, time_calls, write_dataset
+
+
+def run_queries(index, keys: list, hashes: list, points: list) -> dict:
+    misses = [(u, d + " again", c) for u, d, c in keys]
+    near_hashes = [f"{int(h, 16) ^ 0b1011:016x}" for h in hashes]
+    return {
+        "text": time_calls(index.has_text_duplicate, keys + misses),
+        "image r=0": time_calls(lambda h: index.find_similar_images(h, 0), [(h,) for h in hashes]),
+        "image r=8": time_calls(lambda h: index.find_similar_images(h, 8), [(h,) for h in near_hashes]),
+        "nearby 50m": time_calls(lambda lat, lon: index.nearby(lat, lon, 50), points),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'reports':>9} {'backend':<7} {'startup s':>9} {'disk MB':>8}  " +
+          "  ".join(f"{name + ' p50/p99':>22}" for name in ("text", "image r=0", "image r=8", "nearby 50m", "save")))
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset.DATA_FILE = Path(tmp) / "dataset.jsonl"
+            keys = write_dataset(dataset.DATA_FILE, n)
+            db_path = Path(tmp) / "reports.db"
+            start = time.perf_counter()
+            SQLiteReportStore(db_path).import_jsonl([dataset.DATA_FILE])
+            import_s = time.perf_counter() - start
+
+            rng = random.Random(n)
+            sample = [rng.randrange(n) for _ in range(args.queries)]
+            replay = random.Random(7)
+            stored = [synthetic_report(i, replay) for i in range(max(sample) + 1)]
+            query_keys = [keys[i] for i in sample]
+            hashes = [stored[i]["image_hash"] for i in sample]
+            points = [(stored[i]["latitude"], stored[i]["longitude"]) for i in sample]
+            new_reports = [(synthetic_report(n + i, rng),) for i in range(min(args.queries, 200))]
+
+            for backend in ("jsonl", "sqlite"):
+                start = time.perf_counter()
+                if backend == "jsonl":
+                    dataset.DATASET_BACKEND = "jsonl"
+                    index = ReportIndex()
+                    dataset.add_save_listener(index.on_report_saved)
+                    index.refresh()
+                    disk = dataset.DATA_FILE.stat().st_size
+                else:
+                    dataset.DATASET_BACKEND, dataset.DATASET_SQLITE_PATH = "sqlite", db_path
+                    from app.sqlite_store import get_store
+                    index = get_store()
+                    len(index)
+                    disk = db_path.stat().st_size
+                startup_s = time.perf_counter() - start
+
+                results = run_queries(index, query_keys, hashes, points)
+                results["save"] = time_calls(dataset.save_report, new_reports)
+                if backend == "jsonl":
+                    dataset._save_listeners.remove(index.on_report_saved)
+                    dataset.close_writer()
+                print(f"{n:>9} {backend:<7} {startup_s:>9.2f} {disk / 2 ** 20:>8.1f}  " +
+                      "  ".join(f"{p50:>10.1f} / {p99:>9.1f}" for p50, p99 in results.values()))
+            print(f"{n:>9} sqlite import from JSONL: {import_s:.2f}s")
+            dataset.close_writer()
+            dataset.DATASET_BACKEND = "jsonl"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Compare: resident memory and scan time of accepted reports held as
+
+  * dicts     every dataset line parsed into a dict (what a naive loader keeps),
+  * index     the ReportIndex (trimmed NamedTuples plus its lookup structures),
+  * store     the memory-mapped ReportStore (48-byte records, NumPy scans).
+
+Writes N synthetic accepted reports to a temporary dataset.jsonl, converts it
+to a report store once, then loads each representation in a fresh
+subprocess and reports the RSS growth (from /proc/self/statm, Linux only) and
+the time of a near-duplicate image query and a radius query. For the store
+the RSS includes the mapped pages the scans touched; those are page cache
+shared by every process that maps the file.
+
+    python benchmarks/compare_store_memory.py --count 100000 1000000
+"""
+import sys
+import os
+import argparse
+import json
+import random
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("dicts", "index", "store")
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def write_dataset(path: Path, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf8") as f:
+        for i in range(count):
+            report = {"report_id": str(1767459631109 + i), "user_id": f"{rng.getrandbits(96):024x}",
+                      "description": f"water and drainage problem near house {i} please check it",
+                      "category": rng.choice(["Water & Drainage", "Road & Traffic", "Garbage & Sanitation"]),
+                      "latitude": 17.9 + rng.uniform(-0.2, 0.2), "longitude": 83.3 + rng.uniform(-0.2, 0.2),
+                      "image_hash": f"{rng.getrandbits(64):016x}", "image_url": f"https://cdn.example.com/r/{i}.jpg",
+                      "accept": True, "status": "accepted", "confidence": 0.97, "urgency": "low",
+                      "reason": "Report accepted successfully"}
+            f.write(json.dumps(report) + "\n")
+
+
+def measure(mode: str, dataset_path: str, store_path: str) -> dict:
+    """Runs in the child process."""
+    from app.report_index import ReportIndex
+    from app.report_store import ReportStore
+    from app.geo import haversine
+    from app.phash_index import hamming, parse_hash
+    query_hash, lat, lon = "fe2e9768b0986691", 17.9, 83.3
+
+    before = rss_bytes()
+    start = time.perf_counter()
+    if mode == "dicts":
+        with open(dataset_path, encoding="utf8") as f:
+            data = [json.loads(line) for line in f]
+    elif mode == "index":
+        data = ReportIndex(Path(dataset_path))
+        data.refresh()
+    else:
+        data = ReportStore(Path(store_path))
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if mode == "dicts":
+        value = parse_hash(query_hash)
+        images = [r for r in data if hamming(parse_hash(r["image_hash"]), value) <= 10]
+        nearby = [r for r in data if haversine(lat, lon, r["latitude"], r["longitude"]) <= 500]
+    elif mode == "index":
+        images = data.find_similar_images(query_hash, 10)
+        nearby = data.nearby(lat, lon, 500)
+    else:
+        images = data.similar_images(query_hash, 10)[0]
+        nearby = data.nearby(lat, lon, 500)[0]
+    query_ms = (time.perf_counter() - start) * 1000
+    return {"rss_mb": (rss_bytes() - before) / 2 ** 20, "load_s": load_s, "query_ms": query_ms,
+            "matches": (len(images), len(nearby))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "DATASET", "STORE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child)))
+        return
+
+    from app.report_store import ReportStore
+    print(f"{'reports':>9} {'form':<6} {'file MB':>8} {'RSS MB':>8} {'load s':>7} {'query ms':>9}  matches")
+    for count in args.count:
+        base = Path(tempfile.mkdtemp())
+        dataset_path, store_path = base / "dataset.jsonl", base / "reports.bin"
+        write_dataset(dataset_path, count)
+        ReportStore(store_path).sync([dataset_path])
+        sizes = {"dicts": dataset_path.stat().st_size, "index": dataset_path.stat().st_size,
+                 "store": store_path.stat().st_size}
+        for mode in MODES:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, str(dataset_path),
+                                  str(store_path)], check=True, capture_output=True, text=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            print(f"{count:>9} {mode:<6} {sizes[mode] / 2 ** 20:>8.1f} {result['rss_mb']:>8.1f} "
+                  f"{result['load_s']:>7.2f} {result['query_ms']:>9.1f}  {tuple(result['matches'])}")
+        dataset_path.unlink()
+        store_path.unlink()
+
+
+if __name__ == "__main__":
+    main()
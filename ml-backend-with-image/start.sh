@@ -5,8 +5,9 @@
 set -e  # Exit on error
 
 PORT=${PORT:-7860}
+WORKERS=${WEB_CONCURRENCY:-1}
 echo "=========================================="
-echo "Starting ML Backend on port $PORT"
+echo "Starting ML Backend on port $PORT ($WORKERS worker(s))"
 echo "CORS_ORIGINS: ${CORS_ORIGINS:-not set}"
 echo "Working directory: $(pwd)"
 echo "Python: $(python --version)"
@@ -14,8 +15,8 @@ echo "=========================================="
 
 # Use uvicorn to start the FastAPI app with proper settings for Render
 # --timeout-keep-alive 75: Keep connections alive for Render's load balancer
-# --workers 1: Single worker for free tier
+# --workers: WEB_CONCURRENCY (default 1 for free tier); workers share the dataset safely
 # --access-log: Enable access logging for debugging
 # --log-level info: Better logging
-exec uvicorn app.main:app --host 0.0.0.0 --port $PORT --workers 1 --timeout-keep-alive 75 --access-log --log-level info
+exec uvicorn app.main:app --host 0.0.0.0 --port $PORT --workers $WORKERS --timeout-keep-alive 75 --access-log --log-level info
 
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for the /submit endpoint's worker pool and backpressure
+"""
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+from app import main, worker_pool, warmup, pipeline
+from app.worker_pool import PipelinePool
+
+REPORT = {"report_id": "api_test_001", "description": "street light is not working near the school",
+          "user_id": "api_tester"}
+
+
+def test_submit_returns_503_when_pool_is_full():
+    """A full pool answers 503 + Retry-After at once while the event loop keeps serving /health"""
+    release = threading.Event()
+
+    def slow_classify(report):
+        release.wait(5)
+        return {"report_id": report["report_id"], "accept": True, "status": "accepted",
+                "category": "Street Lighting", "confidence": 0.9}
+
+    original_pool, original_classify = worker_pool._pool, main.classify_report
+    worker_pool._pool = PipelinePool(workers=1, queue_size=0, retry_after=7)
+    main.classify_report = slow_classify
+    try:
+        with TestClient(main.app) as client:
+            first = {}
+            worker = threading.Thread(target=lambda: first.update(response=client.post("/submit", json=REPORT)))
+            worker.start()
+            deadline = time.time() + 5
+            while worker_pool._pool.in_flight == 0 and time.time() < deadline:
+                time.sleep(0.01)
+
+            start = time.perf_counter()
+            assert client.get("/health").status_code == 200
+            busy = client.post("/submit", json=REPORT)
+            assert time.perf_counter() - start < 1.0
+            assert busy.status_code == 503
+            assert busy.headers["Retry-After"] == "7"
+            assert busy.json()["status"] == "busy"
+
+            release.set()
+            worker.join(5)
+            assert first["response"].status_code == 200
+            assert first["response"].json()["status"] == "accepted"
+            assert worker_pool._pool.in_flight == 0
+            assert worker_pool._pool.rejected == 1
+    finally:
+        release.set()
+        worker_pool._pool, main.classify_report = original_pool, original_classify
+    print("✅ Backpressure PASSED")
+
+
+def test_ready_is_503_until_warmup_finishes():
+    """/health reports warming and /ready answers 503 until the model warm-up has run"""
+    release = threading.Event()
+    original = pipeline.initialize_models, warmup._thread
+    pipeline.initialize_models = lambda: release.wait(5)
+    warmup._thread = None
+    warmup._ready.clear()
+    warmup._state.update(status="warming", ready_at=None, steps={}, errors=[])
+    try:
+        with TestClient(main.app) as client:
+            assert client.get("/health").json()["model"] == "warming"
+            not_ready = client.get("/ready")
+            assert not_ready.status_code == 503 and "Retry-After" in not_ready.headers
+
+            release.set()
+            warmup._thread.join(5)
+            ready = client.get("/ready")
+            assert ready.status_code == 200 and ready.json()["status"] == "ready"
+            assert set(ready.json()["steps"]) == {"imports", "index", "model"}
+            assert client.get("/health").json()["model"] == "ready"
+    finally:
+        release.set()
+        pipeline.initialize_models, warmup._thread = original
+    print("✅ Readiness gating PASSED")
+
+
+def test_process_pool_runs_in_forked_workers():
+    """PIPELINE_PROCESSES mode runs submitted work in separate worker processes"""
+    import asyncio
+    pool = PipelinePool(workers=2, queue_size=2, processes=True)
+    try:
+        async def run_all():
+            return await asyncio.gather(*(pool.submit(os.getpid) for _ in range(4)))
+
+        pids = asyncio.run(run_all())
+        assert os.getpid() not in pids
+        assert pool.in_flight == 0
+        assert pool.stats()["mode"] == "process"
+    finally:
+        pool.shutdown()
+    print("✅ Process pool PASSED")
+
+
+if __name__ == "__main__":
+    test_submit_returns_503_when_pool_is_full()
+    test_ready_is_503_until_warmup_finishes()
+    test_process_pool_runs_in_forked_workers()
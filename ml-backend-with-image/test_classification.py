@@ -6,7 +6,17 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import tempfile
+import threading
+import time
+from pathlib import Path
+
 from app.pipeline import classify_report
+from app.micro_batcher import MicroBatcher
+from app.result_cache import ResultCache
+from app import image_classifier as ic
+from app import profanity
+from app import dataset
 
 def test_park_water_classification():
     """Test park filled with water classification"""
@@ -74,6 +84,138 @@ def test_without_image():
     
     return result["status"] == "accepted"
 
+def test_micro_batcher_batches_concurrent_calls():
+    """Concurrent submits share batches and each caller gets its own result"""
+    print("\nTesting CLIP micro-batching scheduler...")
+
+    def slow_double(items):
+        time.sleep(0.02)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(slow_double, max_batch_size=8, max_wait_ms=20)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, batcher.submit(i))) for i in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"Batches: {batcher.batches}, mean batch size: {batcher.mean_batch_size:.1f}")
+    assert results == {i: i * 2 for i in range(32)}
+    assert batcher.batches < 32 and batcher.mean_batch_size > 1
+
+    failing = MicroBatcher(lambda items: 1 / 0, max_batch_size=4, max_wait_ms=1)
+    try:
+        failing.submit(1)
+        assert False, "batch exception was not propagated"
+    except ZeroDivisionError:
+        pass
+
+    short = MicroBatcher(lambda items: items[:-1], max_batch_size=4, max_wait_ms=50)
+    errors = []
+    threads = [threading.Thread(target=lambda: errors.append(_submit_error(short))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    assert not any(t.is_alive() for t in threads), "callers left waiting on a short batch result"
+    assert all(isinstance(e, RuntimeError) for e in errors), errors
+
+    batcher.close()
+    batcher._thread.join(timeout=5)
+    assert not batcher._thread.is_alive(), "closed batcher kept its worker thread"
+    assert batcher.submit(5) == 10
+    print("✅ Micro-batching PASSED")
+
+
+def _submit_error(batcher):
+    try:
+        batcher.submit(1)
+    except Exception as e:
+        return e
+
+def test_result_cache_lru_ttl_and_persistence():
+    """CLIP result cache evicts least recently used, expires by TTL and reloads from disk"""
+    import tempfile
+    from pathlib import Path
+    print("\nTesting CLIP result cache...")
+
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", {"label": "pothole", "scores": [0.9, 0.1]})
+    cache.put("b", {"label": "garbage", "scores": [0.2, 0.8]})
+    assert cache.get("a")["label"] == "pothole"
+    cache.put("c", {"label": "fire", "scores": [0.5, 0.5]})  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["hits"] == 1
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get("a") is None and cache.stats()["expirations"] == 1
+
+    path = Path(tempfile.mkdtemp()) / "clip_cache.json"
+    saved = ResultCache(max_entries=10, ttl_seconds=60, path=path)
+    saved.put("digest", {"label": "pothole", "scores": [0.9, 0.1]})
+    saved.save()
+    assert ResultCache(max_entries=10, ttl_seconds=60, path=path).get("digest")["scores"] == [0.9, 0.1]
+
+    # classify_image_cached only runs the model on a miss
+    calls = []
+    original = ic._available, ic._classify_with_scores, ic._result_cache
+    ic._available, ic._result_cache = True, ResultCache(max_entries=10)
+    ic._classify_with_scores = lambda pv, labels: calls.append(pv) or (labels[1], [0.0, 1.0])
+    try:
+        labels = ["road", "pothole"]
+        assert ic.classify_image_cached("abc", lambda: "pixels", labels) == "pothole"
+        assert ic.classify_image_cached("abc", lambda: "pixels", labels) == "pothole"
+        assert calls == ["pixels"]
+        assert ic.get_result_cache().stats()["hits"] == 1
+    finally:
+        ic._available, ic._classify_with_scores, ic._result_cache = original
+    print("✅ Result cache PASSED")
+
+def test_profanity_stage_batches_and_caches():
+    """Second-stage abuse check batches concurrent texts into one model call and caches verdicts"""
+    print("\nTesting profanity-check stage...")
+    calls = []
+
+    def fake_predict_prob(texts):
+        time.sleep(0.02)
+        calls.append(list(texts))
+        return [0.9 if "crap" in text else 0.1 for text in texts]
+
+    original = profanity._available, profanity._predict_prob, profanity._cache, profanity._batcher
+    limits = profanity.PROFANITY_MAX_BATCH_SIZE, profanity.PROFANITY_MAX_BATCH_WAIT_MS
+    data_file = dataset.DATA_FILE
+    dataset.DATA_FILE = Path(tempfile.mkdtemp()) / "dataset.jsonl"  # rejected reports below are saved here
+    profanity._available, profanity._predict_prob, profanity._cache = True, fake_predict_prob, None
+    profanity.configure_batching(16, 20)
+    try:
+        texts = [f"pothole number {i}" for i in range(15)] + ["this crap road"]
+        results = {}
+        threads = [threading.Thread(target=lambda t=t: results.__setitem__(t, profanity.is_profane(t))) for t in texts]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == {t: "crap" in t for t in texts}
+        assert len(calls) < len(texts)
+        model_calls = len(calls)
+        assert profanity.is_profane("this crap road") is True and profanity.is_profane("pothole number 3") is False
+        assert len(calls) == model_calls  # served from the verdict cache
+        assert profanity.is_profane("") is None
+
+        # Texts the keyword stage already flagged never reach the model
+        result = classify_report({"report_id": "p1", "description": "fucking pothole on the road", "user_id": "t"})
+        assert result["status"] == "rejected" and len(calls) == model_calls
+        result = classify_report({"report_id": "p2", "description": "this crap road has a pothole", "user_id": "t"})
+        assert result["status"] == "rejected" and result["reason"] == "Abusive language detected"
+    finally:
+        profanity._available, profanity._predict_prob, profanity._cache, profanity._batcher = original
+        profanity.configure_batching(*limits)
+        dataset.flush()
+        dataset.DATA_FILE = data_file
+    print("✅ Profanity stage PASSED")
+
 if __name__ == "__main__":
     print("🧪 Testing improved image classification...")
     print("=" * 50)
@@ -82,6 +224,9 @@ if __name__ == "__main__":
     park_test = test_park_water_classification()
     light_test = test_streetlight_classification()
     text_test = test_without_image()
+    test_micro_batcher_batches_concurrent_calls()
+    test_result_cache_lru_ttl_and_persistence()
+    test_profanity_stage_batches_and_caches()
     
     print("\n" + "=" * 50)
     print("📊 Test Results:")
@@ -0,0 +1,642 @@
+#!/usr/bin/env python3
+"""
+Test script for the accepted-report index and the storage duplicate checks
+"""
+import sys
+import os
+import io
+import json
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image, ImageDraw
+import imagehash
+
+from app import dataset, storage, pipeline
+from app.report_context import ReportContext
+import app.report_context as report_context
+from app.report_index import ReportIndex
+from app.group_commit import GroupCommitWriter
+from app.segment_log import SegmentLog, DEDUP_FIELDS
+from app.report_store import ReportStore, HEADER_SIZE, RECORD_DTYPE
+from app import sqlite_store, report_store, warmup
+from app.phash_index import MultiIndexHash, hamming
+from app.geo import SpatialGrid, haversine, haversine_np, pairwise_distances
+import numpy as np
+
+
+@contextmanager
+def _temp_dataset():
+    """Point dataset.DATA_FILE at an empty temporary file for the block (keeps data/dataset.jsonl untouched)"""
+    data_file = dataset.DATA_FILE
+    tmp_dir = Path(tempfile.mkdtemp())
+    dataset.DATA_FILE = tmp_dir / "dataset.jsonl"
+    try:
+        yield dataset.DATA_FILE
+    finally:
+        dataset.close_writer()
+        dataset.DATA_FILE = data_file
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _image_bytes(seed: int) -> bytes:
+    img = Image.new("RGB", (320, 240), (seed * 37 % 256, 90, 160))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([20 + seed * 7, 30, 180, 200 - seed * 3], fill=(250, 250, 10))
+    draw.ellipse([150, 40 + seed * 5, 300, 220], fill=(10, 40 + seed * 9 % 200, 20))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _phash(image_bytes: bytes) -> str:
+    return str(imagehash.phash(Image.open(io.BytesIO(image_bytes)).convert("RGB")))
+
+
+def _accepted(report_id, **fields):
+    report = {
+        "report_id": report_id,
+        "description": "Big pothole on the main road",
+        "user_id": "user-1",
+        "category": "Road & Traffic",
+        "latitude": 17.6860,
+        "longitude": 83.1595,
+        "accept": True,
+        "status": "accepted",
+    }
+    report.update(fields)
+    return report
+
+
+def test_index_follows_appends():
+    """The index loads once, then only picks up newly appended lines"""
+    with _temp_dataset() as path:
+        index = ReportIndex()
+        assert len(index) == 0
+
+        dataset.save_report(_accepted("r1"))
+        dataset.save_report({**_accepted("r2"), "accept": False, "status": "rejected"})
+        assert [r.report_id for r in index.reports()] == ["r1"]
+
+        # A partially written line is not consumed until it is complete
+        with path.open("a", encoding="utf8") as f:
+            f.write(json.dumps(_accepted("r3"))[:20])
+        assert len(index) == 1
+        with path.open("a", encoding="utf8") as f:
+            f.write(json.dumps(_accepted("r3"))[20:] + "\n")
+        assert [r.report_id for r in index.reports()] == ["r1", "r3"]
+
+        # Replacing the file rebuilds the index
+        path.write_text(json.dumps(_accepted("r4")) + "\n", encoding="utf8")
+        assert [r.report_id for r in index.reports()] == ["r4"]
+
+
+def test_index_applies_own_saves():
+    """save_report pushes new records into the index; foreign appends are still tail-read"""
+    with _temp_dataset() as path:
+        index = ReportIndex()
+        dataset.add_save_listener(index.on_report_saved)
+        try:
+            dataset.save_report(_accepted("r1"))
+            assert index.has_text_duplicate("user-1", "big pothole on the main road", "road & traffic")
+
+            with path.open("a", encoding="utf8") as f:
+                f.write(json.dumps(_accepted("r2", user_id="user-2")) + "\n")
+            dataset.save_report(_accepted("r3", user_id="user-3"))
+            assert [r.report_id for r in index.reports()] == ["r1", "r2", "r3"]
+            assert index.has_text_duplicate("user-2", "Big pothole on the main road", "Road & Traffic")
+        finally:
+            dataset._save_listeners.remove(index.on_report_saved)
+
+
+def test_text_duplicate():
+    with _temp_dataset():
+        dataset.save_report(_accepted("r1", description="  Big   pothole on the MAIN road "))
+        assert storage.is_duplicate("USER-1", "big pothole on the main road", "Road & Traffic")
+        assert not storage.is_duplicate("user-2", "big pothole on the main road", "Road & Traffic")
+        assert not storage.is_duplicate("user-1", "big pothole on the main road", "Electricity")
+
+
+def test_image_duplicate():
+    with _temp_dataset():
+        image = _image_bytes(1)
+        assert not storage.is_duplicate_image_from_bytes(image)
+        dataset.save_report(_accepted("r1", image_hash=_phash(image)))
+        assert storage.is_duplicate_image_from_bytes(image)
+        assert not storage.is_duplicate_image_from_bytes(_image_bytes(9))
+
+
+def test_irregular_image_hash_matches_exactly():
+    """Stored hashes that are not 64-bit pHashes still match the same string, in both backends"""
+    with _temp_dataset() as source:
+        legacy = "8f373714acfcf4d0" * 4  # 256-bit hash (hash_size=16)
+        source.write_text("".join(json.dumps(r) + "\n" for r in [
+            _accepted("r1", image_hash=legacy), _accepted("r2", image_hash="ff00ff00ff00ff00"), _accepted("r3", image_hash=" abc ")]))
+        index = ReportIndex()
+        assert [r.report_id for r in index.find_by_image_hash(legacy)] == ["r1"]
+        assert [(r.report_id, d) for r, d in index.find_similar_images(legacy, 8)] == [("r1", 0)]
+        assert [r.report_id for r in index.find_by_image_hash("abc")] == ["r3"]
+        assert index.find_by_image_hash(legacy[:-1]) == [] and index.find_by_image_hash(None) == []
+        assert [r.report_id for r, _ in index.find_similar_images("ff00ff00ff00ff01", 2)] == ["r2"]
+
+        db = sqlite_store.SQLiteReportStore(Path(tempfile.mkdtemp()) / "reports.db")
+        db.import_jsonl([source])
+        for query in (legacy, "abc", legacy[:-1], "ff00ff00ff00ff00"):
+            assert db.find_by_image_hash(query) == index.find_by_image_hash(query)
+            assert db.find_similar_images(query, 8) == index.find_similar_images(query, 8)
+
+
+def test_phash_index_matches_brute_force():
+    """Multi-index hash radius search returns exactly the hashes a linear scan would"""
+    rng = random.Random(3)
+    base = [rng.getrandbits(64) for _ in range(300)]
+    # Add near neighbours so small radii have something to find
+    values = base + [v ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for v in base[:100]]
+    index = MultiIndexHash()
+    for v in values:
+        index.add(v)
+    assert len(index) == len(set(values))
+    for query in rng.sample(values, 20) + [rng.getrandbits(64) for _ in range(5)]:
+        for radius in (0, 2, 6, 12):
+            expected = {(v, hamming(query, v)) for v in set(values) if hamming(query, v) <= radius}
+            assert set(index.search(query, radius)) == expected
+
+
+def test_vectorized_haversine_matches_scalar():
+    rng = random.Random(11)
+    lats = np.array([rng.uniform(-90, 90) for _ in range(500)] + [17.686, 17.686])
+    lons = np.array([rng.uniform(-180, 180) for _ in range(500)] + [83.159, 83.159])
+    scalar = np.array([haversine(17.686, 83.159, la, lo) for la, lo in zip(lats, lons)])
+    vectorized = haversine_np(17.686, 83.159, lats, lons)
+    assert np.allclose(vectorized, scalar, rtol=1e-12, atol=1e-6)
+    assert vectorized[-1] == 0.0
+    matrix = pairwise_distances(lats[:3], lons[:3], lats, lons)
+    assert matrix.shape == (3, len(lats))
+    assert np.allclose(matrix[2], [haversine(lats[2], lons[2], la, lo) for la, lo in zip(lats, lons)],
+                       rtol=1e-12, atol=1e-6)
+
+
+def test_spatial_grid_matches_brute_force():
+    """Grid radius queries agree with checking every point, including near the poles and the antimeridian"""
+    rng = random.Random(5)
+    centres = [(17.686, 83.159), (0.0, 179.9995), (0.0, -179.9995), (89.9996, 10.0), (-60.0, 45.0)]
+    points = []
+    for lat, lon in centres:
+        for _ in range(150):
+            points.append((max(-90.0, min(90.0, lat + rng.uniform(-0.002, 0.002))),
+                           ((lon + rng.uniform(-0.002, 0.002) + 180) % 360) - 180))
+    grid = SpatialGrid()
+    for i, (lat, lon) in enumerate(points):
+        grid.add(lat, lon, i)
+    for lat, lon in centres + rng.sample(points, 20):
+        for radius in (10.0, 50.0, 300.0):
+            expected = {i for i, (plat, plon) in enumerate(points) if haversine(lat, lon, plat, plon) <= radius}
+            assert {i for i, _ in grid.within(lat, lon, radius)} == expected
+
+
+def test_near_duplicate_image():
+    """A slightly cropped, re-compressed copy is caught with threshold > 0 but not with exact matching"""
+    with _temp_dataset():
+        original = _image_bytes(4)
+        dataset.save_report(_accepted("r1", image_hash=_phash(original)))
+
+        img = Image.open(io.BytesIO(original)).convert("RGB").crop((4, 4, 316, 240)).resize((300, 225))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=40)
+        recompressed = buf.getvalue()
+        distance = imagehash.hex_to_hash(_phash(original)) - imagehash.hex_to_hash(_phash(recompressed))
+        assert 0 < distance <= 8, distance
+
+        assert not storage.is_duplicate_image_from_bytes(recompressed, threshold=0)
+        assert storage.is_duplicate_image_from_bytes(recompressed, threshold=8)
+        assert storage.is_comprehensive_duplicate(recompressed, "big pothole on main road", "Road & Traffic",
+                                                  17.6861, 83.1595, image_threshold=8)
+
+
+def test_comprehensive_duplicate():
+    with _temp_dataset():
+        image = _image_bytes(2)
+        dataset.save_report(_accepted("r1", image_hash=_phash(image)))
+
+        def check(**overrides):
+            args = dict(image_bytes=image, description="big pothole on main road", category="Road & Traffic",
+                        lat=17.6861, lon=83.1595)
+            args.update(overrides)
+            return storage.is_comprehensive_duplicate(**args)
+
+        assert check()
+        assert not check(lat=17.6960)  # ~1.1 km away
+        assert not check(category="Electricity")
+        assert not check(description="street light flickering near the park")
+        assert not check(image_bytes=_image_bytes(9))
+        assert check(lat=None, lon=None)
+
+
+def test_report_context_phash_matches_imagehash():
+    """The memoized hash is exactly imagehash.phash of the decoded image"""
+    for seed in range(5):
+        for fmt in ("PNG", "JPEG"):
+            img = Image.open(io.BytesIO(_image_bytes(seed))).convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, format=fmt)
+            assert ReportContext(buf.getvalue()).phash == _phash(buf.getvalue())
+
+
+def _detailed_jpeg(seed: int, width: int = 3200, height: int = 2400) -> bytes:
+    """High-detail photo stand-in (fine random texture): reduced decodes shift its pHash by several bits"""
+    rng = np.random.default_rng(seed)
+    texture = (rng.random((height // 2, width // 2, 3)) > 0.5).astype("uint8") * 255
+    buf = io.BytesIO()
+    Image.fromarray(texture).resize((width, height), Image.Resampling.NEAREST).save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+def test_phash_uses_draft_decode():
+    """pHash and CLIP share one draft-scale decode; full-decode hashes still match within the tolerance"""
+    with _temp_dataset():
+        data = _detailed_jpeg(0)
+        context = ReportContext(data)
+        assert context.decoded_image.size == (400, 300)  # 1/8 DCT scale, not 3200x2400
+        assert context.phash == str(imagehash.phash(report_context.draft_decode(data)))
+        assert context.image.size == (400, 300) and "decoded_image" in context.__dict__
+
+        # A report stored with a full-decode hash (the old behaviour) is still a duplicate
+        full_hash = _phash(data)
+        assert hamming(int(full_hash, 16), int(context.phash, 16)) <= report_context.PHASH_TOLERANCE
+        dataset.save_report(_accepted("old", image_hash=full_hash))
+        assert storage.is_duplicate_image_from_bytes(data, threshold=report_context.duplicate_threshold(0))
+
+        # Formats without DCT scaling decode and hash at full size, exactly as before
+        png = _image_bytes(2)
+        assert ReportContext(png).phash == _phash(png)
+
+
+def test_pipeline_decodes_image_once():
+    """One submission decodes its image a single time across all pipeline stages"""
+    with _temp_dataset():
+        calls = []
+        original_open = report_context.Image.open
+
+        def counting_open(*args, **kwargs):
+            calls.append(1)
+            return original_open(*args, **kwargs)
+
+        report_context.Image.open = counting_open
+        try:
+            result = pipeline.classify_report({
+                "report_id": "ctx-1",
+                "description": "Big pothole on the main road near the school",
+                "user_id": "user-1",
+                "latitude": 17.686,
+                "longitude": 83.1595,
+                "image_bytes": _image_bytes(6),
+            })
+        finally:
+            report_context.Image.open = original_open
+        assert result["status"] == "accepted", result
+        assert result["image_hash"] == _phash(_image_bytes(6))
+        assert len(calls) == 1
+
+
+def test_location_duplicate():
+    with _temp_dataset():
+        dataset.save_report(_accepted("r1"))
+        assert storage.is_duplicate_location(17.68605, 83.1595, "", "Road & Traffic", threshold=10.0)
+        assert not storage.is_duplicate_location(17.6870, 83.1595, "", "Road & Traffic", threshold=10.0)
+        assert not storage.is_duplicate_location(17.68605, 83.1595, "", "Electricity", threshold=10.0)
+
+
+def test_group_commit_writer():
+    """Concurrent saves share fsyncs, land as whole lines in order, and queued lines survive close()"""
+    with _temp_dataset() as path:
+        written = []
+        writer = GroupCommitWriter(lambda: path, lambda item, p, st, start, end: written.append((item, start, end)),
+                                   durability="batch")
+        lines = {i: (json.dumps({"report_id": f"r{i}"}) + "\n").encode("utf8") for i in range(200)}
+        threads = [threading.Thread(target=writer.submit, args=(lines[i], i)) for i in range(200)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        data = path.read_bytes()
+        assert sorted(json.loads(line)["report_id"] for line in data.splitlines()) == sorted(f"r{i}" for i in range(200))
+        assert all(data[start:end] == lines[item] for item, start, end in written)
+        assert writer.fsyncs == writer.groups <= 200 and writer.lines == 200
+
+        # interval/none: fire-and-forget submits are on disk after close()
+        for durability in ("interval", "none"):
+            other = Path(tempfile.mkdtemp()) / "dataset.jsonl"
+            lazy = GroupCommitWriter(lambda: other, durability=durability, fsync_interval_ms=10000)
+            for i in range(50):
+                lazy.submit(lines[i], wait=False)
+            lazy.close()
+            assert len(other.read_bytes().splitlines()) == 50
+            assert durability == "none" or lazy.fsyncs >= 1
+            try:
+                lazy.submit(lines[0])
+                assert False, "closed writer accepted a line"
+            except RuntimeError:
+                pass
+
+        # dataset.save_report(wait=False) is visible to the index after flush()
+        index = ReportIndex()
+        dataset.add_save_listener(index.on_report_saved)
+        try:
+            dataset.save_report(_accepted("q1"), wait=False)
+            dataset.flush()
+            assert [r.report_id for r in index.reports()] == ["q1"]
+        finally:
+            dataset._save_listeners.remove(index.on_report_saved)
+
+
+def test_segmented_layout_rotation_and_compaction():
+    """Accepted/rejected streams rotate by size, the index reads only accepted segments, compaction keeps results"""
+    original = dataset.DATASET_LAYOUT, dataset.DATASET_DIR, dataset.DATASET_SEGMENT_MAX_BYTES
+    dataset.close_writer()
+    dataset.DATASET_LAYOUT, dataset.DATASET_DIR = "segmented", Path(tempfile.mkdtemp()) / "segments"
+    dataset.DATASET_SEGMENT_MAX_BYTES = 1000
+    try:
+        index = ReportIndex()
+        dataset.add_save_listener(index.on_report_saved)
+        try:
+            for i in range(20):
+                dataset.save_report(_accepted(f"a{i}", user_id=f"user-{i}", reason="Report accepted successfully"))
+                dataset.save_report({**_accepted(f"x{i}"), "accept": False, "status": "rejected"})
+            dataset.flush()
+            log = dataset.get_segment_log()
+            accepted, rejected = log.segments("accepted"), log.segments("rejected")
+            assert len(accepted) > 2 and len(rejected) > 2
+            assert all(json.loads(line)["status"] == "accepted" for p in accepted for line in p.read_text().splitlines())
+            assert [r.report_id for r in index.reports()] == [f"a{i}" for i in range(20)]
+            assert index.has_text_duplicate("user-7", "big pothole on the main road", "road & traffic")
+
+            # A fresh index (server restart) reads only the accepted stream and gets the same reports
+            assert [r.report_id for r in ReportIndex().reports()] == [f"a{i}" for i in range(20)]
+
+            merged = log.compact("accepted", fields=DEDUP_FIELDS)
+            assert merged is not None and len(log.segments("accepted")) == 2
+            assert all(p.exists() for p in log.segments("accepted")) and not accepted[0].exists()
+            assert "reason" not in json.loads(merged.read_text().splitlines()[0])
+            dataset.save_report(_accepted("a20", user_id="user-20"))
+            assert [r.report_id for r in index.reports()] == [f"a{i}" for i in range(21)]
+            assert log.compact("rejected") is not None and len(log.segments("rejected")) == 2
+        finally:
+            dataset._save_listeners.remove(index.on_report_saved)
+
+        # One-time split of a single-file dataset
+        with _temp_dataset() as source:
+            source.write_text("".join(json.dumps(r) + "\n" for r in [
+                _accepted("s1"), {**_accepted("s2"), "accept": False, "status": "rejected"}, _accepted("s3")]))
+            imported = SegmentLog(Path(tempfile.mkdtemp()))
+            assert imported.import_jsonl(source) == {"accepted": 2, "rejected": 1}
+            assert [json.loads(line)["report_id"] for line in imported.segments("accepted")[0].read_text().splitlines()] == ["s1", "s3"]
+    finally:
+        dataset.close_writer()
+        dataset.DATASET_LAYOUT, dataset.DATASET_DIR, dataset.DATASET_SEGMENT_MAX_BYTES = original
+
+
+def test_report_store_mirrors_index():
+    """The binary store follows saves, survives a torn append and answers like the report index"""
+    with _temp_dataset():
+        rng = random.Random(7)
+        hashes = [f"{rng.getrandbits(64):016x}" for _ in range(5)]
+        for i in range(40):
+            dataset.save_report(_accepted(f"r{i}", user_id=f"user-{i % 4}", description=f"Pothole number {i % 10}",
+                                          latitude=17.68 + rng.uniform(-0.01, 0.01), longitude=83.15 + rng.uniform(-0.01, 0.01),
+                                          image_hash=hashes[i % 5] if i % 3 else None))
+            if i % 7 == 0:
+                dataset.save_report({**_accepted(f"x{i}"), "accept": False, "status": "rejected"})
+        dataset.flush()
+
+        path = Path(tempfile.mkdtemp()) / "reports.bin"
+        store = ReportStore(path)
+        assert store.sync() == 40 and path.stat().st_size == HEADER_SIZE + 40 * RECORD_DTYPE.itemsize
+        index = ReportIndex()
+        reports = index.reports()
+
+        dataset.add_save_listener(store.on_report_saved)
+        try:
+            dataset.save_report(_accepted("r40", user_id="user-new", image_hash=hashes[0]))
+            dataset.save_report({**_accepted("x40"), "accept": False, "status": "rejected"})
+            dataset.flush()
+        finally:
+            dataset._save_listeners.remove(store.on_report_saved)
+        reports = index.reports()
+        assert len(store) == len(reports) == 41
+        assert store.sync() == 0
+
+        for user, text, category in [("user-1", "pothole  number 5", "road & traffic"), ("user-new", "Big pothole on the main road", "Road & Traffic"),
+                                     ("user-1", "pothole number 4", "road & traffic")]:
+            assert (len(store.find_text(user, text, category)) > 0) == index.has_text_duplicate(user, text, category)
+        for max_distance in (0, 10, 32):
+            query = f"{int(hashes[1], 16) ^ 0b1011:016x}"
+            positions, distances = store.similar_images(query, max_distance)
+            expected = index.find_similar_images(query, max_distance)
+            assert sorted(zip((reports[p].report_id for p in positions), distances.tolist())) == \
+                sorted((r.report_id, d) for r, d in expected)
+        positions, distances = store.nearby(17.68, 83.15, 800)
+        expected = index.nearby(17.68, 83.15, 800)
+        assert [reports[p].report_id for p in positions] == [r.report_id for r, _ in expected]
+        assert np.allclose(distances, [d for _, d in expected])
+
+        # A record written without its header update (crash) is dropped on open and read again
+        with open(path, "ab") as f:
+            f.write(b"\1" * RECORD_DTYPE.itemsize)
+        dataset.save_report(_accepted("r41"))
+        dataset.flush()
+        reopened = ReportStore(path)
+        assert len(reopened) == 41 and reopened.sync() == 1
+        assert np.array_equal(reopened.records()[:41], store.records()[:41])
+
+        # A replaced dataset file rebuilds the store
+        dataset.DATA_FILE.write_text(json.dumps(_accepted("only")) + "\n")
+        assert reopened.sync() == 1 and len(reopened) == 1
+
+
+
+def test_report_store_serves_duplicate_checks():
+    """With REPORT_STORE=1 warm-up opens the store and the text and image checks read it, including new saves"""
+    original = (report_store.REPORT_STORE, report_store.REPORT_STORE_PATH, report_store._store)
+    original_get_index = storage.get_index
+    store_dir = Path(tempfile.mkdtemp())
+    with _temp_dataset():
+        report_store.REPORT_STORE, report_store.REPORT_STORE_PATH, report_store._store = True, store_dir / "reports.bin", None
+        try:
+            image = _image_bytes(3)
+            dataset.save_report(_accepted("s1", user_id="user-a", description="Broken streetlight on 5th Avenue"))
+            dataset.flush()
+            warmup._load_index()
+            store = report_store._store
+            assert store is not None and len(store) == 1
+
+            def no_index():
+                raise AssertionError("the report index was queried")
+            storage.get_index = no_index
+            assert storage.is_duplicate("USER-A", "broken  streetlight on 5th avenue", "Road & Traffic", store=False)
+            assert not storage.is_duplicate("user-b", "Broken streetlight on 5th Avenue", "Road & Traffic", store=False)
+            assert not storage.is_duplicate_image_from_bytes(image, threshold=0, store=False)
+
+            # Saved after the store was opened: reaches it through the save listener
+            dataset.save_report(_accepted("s2", user_id="user-b", description="Garbage pile", image_hash=ReportContext(image).phash))
+            dataset.flush()
+            assert len(store) == 2 and report_store.get_store() is store
+            assert storage.is_duplicate_image_from_bytes(image, threshold=0, store=False)
+            assert storage.is_duplicate("user-b", "Garbage pile", "road & traffic", store=False)
+        finally:
+            storage.get_index = original_get_index
+            if report_store._store is not None and report_store._store.on_report_saved in dataset._save_listeners:
+                dataset._save_listeners.remove(report_store._store.on_report_saved)
+            report_store.REPORT_STORE, report_store.REPORT_STORE_PATH, report_store._store = original
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+def test_sqlite_backend_matches_index():
+    """DATASET_BACKEND=sqlite answers every duplicate query like the JSONL report index"""
+    with _temp_dataset() as source:
+        rng = random.Random(11)
+        hashes = [f"{rng.getrandbits(64):016x}" for _ in range(6)]
+        reports = []
+        for i in range(60):
+            report = _accepted(f"r{i}", user_id=f"User-{i % 5}", description=f"  Pothole number {i % 12} ",
+                               category=["Road & Traffic", "Water & Drainage"][i % 2],
+                               latitude=17.686 + rng.uniform(-0.002, 0.002), longitude=83.1595 + rng.uniform(-0.002, 0.002),
+                               image_hash=hashes[i % 6] if i % 4 else None, image_url=f"https://cdn.example.com/{i % 9}.jpg?sig={i}")
+            if i % 10 == 3:
+                report.update(accept=False, status="rejected")
+            reports.append(report)
+        source.write_text("".join(json.dumps(r) + "\n" for r in reports))
+        index = ReportIndex()
+
+        original = dataset.DATASET_BACKEND, dataset.DATASET_SQLITE_PATH
+        dataset.DATASET_BACKEND, dataset.DATASET_SQLITE_PATH = "sqlite", Path(tempfile.mkdtemp()) / "reports.db"
+        try:
+            db = sqlite_store.get_store()
+            assert db.import_jsonl([source]) == 60 and db.row_count() == 60
+            assert len(db) == len(index) == 54
+            assert [r.report_id for r in db.reports()] == [r.report_id for r in index.reports()]
+            assert db.reports() == index.reports()
+
+            for user, text, category in [("user-1", "pothole  number 6", "water & drainage"), ("USER-3", "pothole number 3", "water & drainage"),
+                                         ("user-2", "pothole number 2", "Road & Traffic"), (None, "pothole number 2", "road & traffic")]:
+                assert db.has_text_duplicate(user, text, category) == index.has_text_duplicate(user, text, category)
+            query = f"{int(hashes[2], 16) ^ 0b110101:016x}"
+            for max_distance in (0, 4, 8, 20):
+                assert sorted(db.find_similar_images(query, max_distance)) == sorted(index.find_similar_images(query, max_distance))
+            assert db.find_by_image_hash(hashes[1]) == index.find_by_image_hash(hashes[1])
+            assert db.find_by_image_url("https://cdn.example.com/4.jpg") == index.find_by_image_url("https://cdn.example.com/4.jpg")
+            for radius in (50, 200, 1000):
+                got, expected = db.nearby(17.686, 83.1595, radius), index.nearby(17.686, 83.1595, radius)
+                assert [r for r, _ in got] == [r for r, _ in expected]
+                assert np.allclose([d for _, d in got], [d for _, d in expected])
+
+            # Saves go to the database; storage's duplicate checks query it
+            dataset.save_report(_accepted("new", user_id="user-new", description="Fallen tree blocking lane"))
+            assert db.row_count() == 61 and len(db) == 55
+            assert storage.is_duplicate("USER-NEW", "fallen tree  blocking lane", "road & traffic")
+            assert not storage.is_duplicate("user-new", "fallen tree", "road & traffic")
+
+            # close() closes the reader connections other threads opened, not just this thread's
+            threads = [threading.Thread(target=len, args=(db,)) for _ in range(3)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            readers = list(db._readers)
+            assert len(readers) == 4
+            db.close()
+            for conn in readers:
+                try:
+                    conn.execute("SELECT 1")
+                    assert False, "reader connection left open"
+                except sqlite3.ProgrammingError:
+                    pass
+            assert len(db) == 55  # the store reopens connections on use
+        finally:
+            sqlite_store.close_store()
+            dataset.DATASET_BACKEND, dataset.DATASET_SQLITE_PATH = original
+
+
+def _save_from_worker(worker: int, count: int, store_path=None):
+    """Body of one simulated server process: save `count` accepted reports (mirrored to a shared report store)"""
+    if store_path is not None:
+        dataset.add_save_listener(ReportStore(store_path).on_report_saved)
+    for i in range(count):
+        dataset.save_report(_accepted(f"w{worker}-{i}", user_id=f"user-{worker}", description=f"Report {i} from worker {worker}"))
+    dataset.close_writer()
+
+
+def _run_workers(workers: int, count: int, store_path=None):
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=_save_from_worker, args=(w, count, store_path)) for w in range(workers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+        assert p.exitcode == 0
+
+
+def test_multiprocess_appends_and_index_sharing():
+    """Several processes append to one dataset safely; every index sees all of their reports"""
+    dataset.close_writer()
+    with _temp_dataset() as source:
+        index = ReportIndex()
+        stale = ReportIndex(max_staleness_ms=60000)
+        assert len(index) == len(stale) == 0
+        store_path = Path(tempfile.mkdtemp()) / "reports.bin"
+        _run_workers(4, 50, store_path)
+        lines = source.read_bytes().splitlines()
+        ids = [json.loads(line)["report_id"] for line in lines]
+        assert len(ids) == len(set(ids)) == 200
+        assert len(index) == 200 and index.has_text_duplicate("user-3", "report 49 from worker 3", "road & traffic")
+        assert len(stale) == 0  # checked less than max_staleness ago
+        stale.refresh(force=True)
+        assert len(stale) == 200
+        # The processes kept one binary store between them: nothing missing, nothing twice
+        store = ReportStore(store_path)
+        assert len(store) == 200 and store.sync() == 0 and len(set(store.records()["text"].tolist())) == 200
+
+        # Segmented layout: concurrent rotations never leave a report in a segment after it was closed
+        original = dataset.DATASET_LAYOUT, dataset.DATASET_DIR, dataset.DATASET_SEGMENT_MAX_BYTES
+        dataset.DATASET_LAYOUT, dataset.DATASET_DIR = "segmented", Path(tempfile.mkdtemp()) / "segments"
+        dataset.DATASET_SEGMENT_MAX_BYTES = 2000
+        try:
+            _run_workers(4, 40)
+            log = dataset.get_segment_log()
+            entries = log.manifest()["streams"]["accepted"]
+            assert len(entries) > 4
+            for entry in entries[:-1]:
+                assert entry["closed_at"] is not None and entry["bytes"] == (log.directory / entry["name"]).stat().st_size
+            ids = [json.loads(line)["report_id"] for path in log.segments("accepted") for line in path.read_bytes().splitlines()]
+            assert sorted(ids) == sorted(f"w{w}-{i}" for w in range(4) for i in range(40))
+            assert len(ReportIndex()) == 160
+        finally:
+            dataset.close_writer()
+            dataset.DATASET_LAYOUT, dataset.DATASET_DIR, dataset.DATASET_SEGMENT_MAX_BYTES = original
+
+
+if __name__ == "__main__":
+    tests = [test_index_follows_appends, test_index_applies_own_saves, test_text_duplicate, test_image_duplicate,
+             test_irregular_image_hash_matches_exactly,
+             test_phash_index_matches_brute_force, test_vectorized_haversine_matches_scalar,
+             test_spatial_grid_matches_brute_force,
+             test_near_duplicate_image, test_comprehensive_duplicate, test_report_context_phash_matches_imagehash,
+             test_phash_uses_draft_decode,
+             test_pipeline_decodes_image_once, test_location_duplicate, test_group_commit_writer,
+             test_segmented_layout_rotation_and_compaction, test_report_store_mirrors_index,
+             test_report_store_serves_duplicate_checks,
+             test_sqlite_backend_matches_index, test_multiprocess_appends_and_index_sharing]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} PASSED")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__} FAILED {e}")
+    sys.exit(1 if failed else 0)
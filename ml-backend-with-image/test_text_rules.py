@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test script for the compiled keyword matcher in text_rules
+"""
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.text_rules import (
+    contains, normalize, detect_category, detect_urgency, is_abusive,
+    CATEGORY_KEYWORDS, ABUSIVE_WORDS, URGENCY_KEYWORDS, KeywordMatcher,
+    analyze_text, analyze_batch, text_similarity, STOP_WORDS
+)
+from app import text_rules
+
+ALL_KEYWORDS = sorted({kw for kws in CATEGORY_KEYWORDS.values() for kw in kws}
+                      | set(ABUSIVE_WORDS) | {kw for kws in URGENCY_KEYWORDS.values() for kw in kws})
+
+
+def _reference_category(description):
+    """detect_category as it was written with one contains() per keyword"""
+    text = normalize(description)
+    best, max_score, max_len = "Other", 0, 0
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        matches = [kw for kw in keywords if contains(text, kw)]
+        longest = max((len(kw) for kw in matches), default=0)
+        if len(matches) > max_score or (len(matches) == max_score and matches and longest > max_len):
+            best, max_score, max_len = category, len(matches), longest
+    if max_score == 0:
+        return ("Other", 0.0)
+    keywords = CATEGORY_KEYWORDS[best]
+    avg = sum(len(kw) for kw in keywords) / len(keywords)
+    return (best, min(min(max_score / 3.0, 1.0) + min(max_len / (avg * 2), 0.3), 1.0))
+
+
+def _reference_urgency(description):
+    text = normalize(description)
+    if any(contains(text, k) for k in ["dead", "fire", "collapse", "gas leak"]):
+        return "high"
+    for level in ("high", "medium"):
+        if any(contains(text, kw) for kw in URGENCY_KEYWORDS[level]):
+            return level
+    return "low"
+
+
+def _random_description(rng):
+    filler = ["the", "near", "school", "Road", "is", "very", "ROADS", "gasoline", "broad", "2", "x_y", "café"]
+    separators = [" ", " ", " ", "  ", ", ", "-", "_", "'s ", ".", "\n", "1"]
+    parts = []
+    for _ in range(rng.randint(1, 12)):
+        word = rng.choice(ALL_KEYWORDS) if rng.random() < 0.5 else rng.choice(filler)
+        if rng.random() < 0.2:
+            word = word.upper()
+        parts.append(word)
+        parts.append(rng.choice(separators))
+    return "".join(parts)
+
+
+def test_matcher_matches_contains():
+    """The single-pass matcher finds exactly the keywords contains() finds"""
+    rng = random.Random(7)
+    matcher = KeywordMatcher(ALL_KEYWORDS + ["wi-fi"])
+    for _ in range(1500):
+        text = normalize(_random_description(rng))
+        expected = {kw for kw in ALL_KEYWORDS + ["wi-fi"] if contains(text, kw)}
+        assert matcher.find(text) == expected, text
+    print("✅ Keyword matcher PASSED")
+
+
+def test_rules_unchanged():
+    """Categories, confidences, urgencies and abuse flags are identical to the per-keyword regex version"""
+    rng = random.Random(11)
+    for _ in range(1500):
+        description = _random_description(rng)
+        assert detect_category(description) == _reference_category(description), description
+        assert detect_urgency(description) == _reference_urgency(description), description
+        text = normalize(description)
+        assert is_abusive(description) == any(contains(text, w) for w in ABUSIVE_WORDS), description
+    print("✅ Text rules unchanged PASSED")
+
+
+def _reference_similarity(text1, text2):
+    """storage._calculate_text_similarity as it was written before analyze_text"""
+    words1 = set(text1.lower().strip().split()) - STOP_WORDS
+    words2 = set(text2.lower().strip().split()) - STOP_WORDS
+    if not words1 or not words2:
+        return 0.0
+    similarity = len(words1 & words2) / len(words1 | words2)
+    lower1, lower2 = text1.lower().strip(), text2.lower().strip()
+    if lower1 in lower2 or lower2 in lower1:
+        similarity = max(similarity, 0.7)
+    return similarity
+
+
+def test_analyze_text_is_memoized_and_consistent():
+    """analyze_text agrees with the individual rules, is immutable and memoized by normalized text"""
+    rng = random.Random(3)
+    descriptions = [_random_description(rng) for _ in range(300)]
+    for description in descriptions:
+        analysis = analyze_text(description)
+        assert (analysis.category, analysis.confidence) == _reference_category(description)
+        assert analysis.urgency == _reference_urgency(description)
+        assert analysis.normalized == normalize(description)
+    for first, second in zip(descriptions, reversed(descriptions)):
+        assert text_similarity(analyze_text(first), analyze_text(second)) == _reference_similarity(first, second)
+
+    analysis = analyze_text("  Big POTHOLE near the school  ")
+    assert analysis is analyze_text("big pothole near the school")
+    assert analysis.tokens == {"big", "pothole", "near", "school"}
+    assert ("Road & Traffic", ("pothole",)) in analysis.category_hits
+    try:
+        analysis.category = "Other"
+        assert False, "TextAnalysis should be immutable"
+    except AttributeError:
+        pass
+    assert text_rules._analyze_normalized.cache_info().hits > 0
+    print("✅ analyze_text PASSED")
+
+
+def test_analyze_batch_matches_single_calls():
+    """analyze_batch over a list, an iterator and a process pool gives the per-description results in order"""
+    rng = random.Random(5)
+    descriptions = [_random_description(rng) for _ in range(500)] + ["", None, "garbage"] * 3
+    expected = [analyze_text(d) for d in descriptions]
+    assert analyze_batch(descriptions) == expected
+    assert analyze_batch(iter(descriptions), chunk_size=7) == expected
+    assert analyze_batch(descriptions, processes=2, chunk_size=50) == expected
+    assert analyze_batch([]) == []
+    print("✅ analyze_batch PASSED")
+
+
+if __name__ == "__main__":
+    test_matcher_matches_contains()
+    test_rules_unchanged()
+    test_analyze_text_is_memoized_and_consistent()
+    test_analyze_batch_matches_single_calls()